@@ -1,34 +1,161 @@
+import argparse
+import functools
+import logging
 import threading
 import time
+from tasks import metrics, serving
 from tasks.task3_interest import get_interest_points
-from flask import Flask, jsonify, render_template
+from tasks.frame_source import FileSource
+from tasks.live_frame import MJPEG_BOUNDARY, FramePublisher, mjpeg_stream
+from tasks.points_cache import PointsCache
+from tasks.push_stream import event_stream
+from tasks.shared_state import CAPACITIES, SharedState, mirror_topics
+from tasks.telemetry_hub import INTEREST_POINTS, VTX_FRAME, TelemetryHub
+from flask import Flask, Response, render_template, request
 from dotenv import load_dotenv
 import os
 
 load_dotenv()  # load variables from .env
 
+# Επίπεδο καταγραφής από τη μεταβλητή LOG_LEVEL (π.χ. DEBUG για κάθε πακέτο)
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+)
+logger = logging.getLogger(__name__)
+
 google_api_key = os.getenv('GOOGLE_API_KEY')
 if google_api_key is None:
     raise ValueError("Δεν βρέθηκε μεταβλητή GOOGLE_API_KEY στο αρχείο .env")
 
 app = Flask(__name__)
 
-# Global μεταβλητή για τα σημεία ενδιαφέροντος (dump data)
-interest_points = []
+# Hub για τα δεδομένα του σταθμού βάσης (telemetry, σημεία ενδιαφέροντος).
+# Οι καταναλωτές παίρνουν την τελευταία τιμή ή ξυπνούν όταν υπάρχει νέα (χωρίς polling).
+hub = TelemetryHub()
+
+# Όταν την κατάσταση την κρατά ξεχωριστή διεργασία (python app.py --producer), οι workers
+# ενός WSGI server (π.χ. gunicorn) τη διαβάζουν από κοινή μνήμη
+shared_state_name = os.getenv(serving.SHARED_STATE_ENV)
+if shared_state_name and __name__ != '__main__':
+    mirror_topics(hub, shared_state_name)
+
+# Τα interest points σειριοποιούνται μία φορά ανά ενημέρωση (με ETag / version)
+points_cache = PointsCache(hub)
+
+# Η τελευταία εικόνα VTX κωδικοποιείται σε JPEG μία φορά ανά λήψη και κρατιέται στη μνήμη
+frame_publisher = FramePublisher(hub)
+
+# Μετρικές που μετριούνται ήδη αλλού διαβάζονται τη στιγμή του /metrics
+metrics.REGISTRY.callback(
+    'voyager_points_serialized_total', 'Interest point updates serialized for /points.',
+    lambda: points_cache.stats()['serialized'], kind='counter',
+)
+metrics.REGISTRY.callback(
+    'voyager_web_frames_published_total', 'VTX frames encoded to JPEG for the web view.',
+    lambda: frame_publisher.stats()['published'], kind='counter',
+)
 
 def background_task():
     """Background task που ενημερώνει τα σημεία ενδιαφέροντος κάθε 5 δευτερόλεπτα."""
-    global interest_points
     while True:
-        # Ενημερώνουμε τα interest points με νέα dump data
+        # Δημοσιεύουμε τα interest points με νέα dump data
         interest_points = get_interest_points()
-        print("Ενημερώθηκαν τα interest points:", interest_points)
+        hub.publish(INTEREST_POINTS, interest_points)
+        logger.debug("Ενημερώθηκαν τα interest points: %s", interest_points)
         time.sleep(5)
 
-# Endpoint για την απόδοση των interest points ως JSON (για χρήση από το Google Maps view)
+def frame_file_task(path, interval=0.2):
+    """Δημοσιεύει την εικόνα του αρχείου latest.jpg κάθε φορά που αλλάζει (όσο δεν
+    τρέχει VTXPipeline με frame_publisher που δημοσιεύει τις λήψεις απευθείας)."""
+    source = FileSource(path)
+    last_image = None
+    while True:
+        captured = source.read()
+        # Το FileSource αποκωδικοποιεί ξανά μόνο όταν αλλάξει το αρχείο
+        if captured is not None and captured[0] is not last_image:
+            last_image = captured[0]
+            frame_publisher.publish(*captured)
+        time.sleep(interval)
+
+# Endpoint για την απόδοση των interest points ως JSON (για χρήση από το Google Maps view).
+# Με ?since=<version> επιστρέφει μόνο τις αλλαγές από εκείνη την έκδοση. Αν ο client
+# έχει ήδη την τρέχουσα έκδοση (If-None-Match), απαντάμε 304 χωρίς σώμα.
 @app.route('/points')
 def points_endpoint():
-    return jsonify(interest_points)
+    since = request.args.get('since', type=int)
+    cached = points_cache.full() if since is None else points_cache.since(since)
+    headers = {'X-Points-Version': str(cached.version), 'Vary': 'Accept-Encoding'}
+    # Το συμπιεσμένο σώμα είναι άλλη αναπαράσταση, άρα έχει και δικό του ETag
+    body, etag, encoding = cached.body, cached.etag, None
+    if 'gzip' in request.accept_encodings:
+        gzipped = cached.gzipped()
+        if gzipped is not None:
+            body, etag, encoding = gzipped, cached.gzip_etag, 'gzip'
+    if etag in request.if_none_match:
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    response = Response(body, mimetype='application/json', headers=headers)
+    response.set_etag(etag)
+    return response
+
+# Endpoint Server-Sent Events: στέλνει τις αλλαγές (deltas) στα interest points και στο
+# telemetry τη στιγμή που δημοσιεύονται, χωρίς polling
+@app.route('/stream')
+def stream_endpoint():
+    return Response(
+        event_stream(hub),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+# Η τελευταία εικόνα VTX από τη μνήμη (με ETag, ώστε μια αμετάβλητη εικόνα να μη
+# ξαναστέλνεται)
+@app.route('/frame.jpg')
+def frame_endpoint():
+    snapshot = hub.latest(VTX_FRAME)
+    if snapshot is None:
+        return Response(status=503, headers={'Retry-After': '1'})
+    etag = f'frame-{snapshot.seq}'
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(snapshot.value.jpeg, mimetype='image/jpeg')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# MJPEG stream: ο browser παίρνει κάθε νέα εικόνα τη στιγμή που δημοσιεύεται
+@app.route('/stream.mjpg')
+def mjpeg_endpoint():
+    return Response(
+        mjpeg_stream(hub),
+        mimetype=f'multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+# Μετρικές σε μορφή κειμένου Prometheus (χρόνοι ανά στάδιο, πακέτα, frames, απώλειες)
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(
+        metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+# Sampling profiler: POST /profile?enabled=1 τον ξεκινά, ?enabled=0 τον σταματά.
+# Το GET επιστρέφει τα stacks σε collapsed μορφή (για flame graph).
+@app.route('/profile', methods=['GET', 'POST'])
+def profile_endpoint():
+    profiler = metrics.PROFILER
+    if request.method == 'POST':
+        if request.args.get('enabled', '1') not in ('0', 'false'):
+            profiler.start()
+        else:
+            profiler.stop()
+        return profiler.stats()
+    return Response(profiler.collapsed(), mimetype='text/plain')
 
 # Endpoint για την προβολή του Google Maps view
 @app.route('/map')
@@ -40,10 +167,43 @@ def map_view():
 def index():
     return render_template('index.html', google_api_key=os.getenv('GOOGLE_API_KEY'))
 
+def producers():
+    """Οι εργασίες που δημοσιεύουν στο hub (σημεία ενδιαφέροντος, εικόνα VTX)."""
+    frame_path = os.path.join(app.root_path, 'static', 'images', 'latest.jpg')
+    return [background_task, functools.partial(frame_file_task, frame_path)]
+
 if __name__ == '__main__':
-    # Ξεκινάμε το background task σε ξεχωριστό thread
-    thread = threading.Thread(target=background_task, daemon=True)
-    thread.start()
-    
-    # Ξεκινάμε τον Flask server (προσβάσιμος από localhost)
-    app.run(debug=True, host='0.0.0.0', port=3000)
+    parser = argparse.ArgumentParser(description='Ground station web server')
+    _ = parser.add_argument('--host', default='0.0.0.0')
+    _ = parser.add_argument('--port', type=int, default=3000)
+    _ = parser.add_argument(
+        '--workers', type=int, default=0,
+        help='serve with a producer process and this many worker processes '
+             '(0: Flask development server)',
+    )
+    _ = parser.add_argument(
+        '--producer', action='store_true',
+        help='only run the producer, sharing its state with the workers of another '
+             f'WSGI server (${serving.SHARED_STATE_ENV})',
+    )
+    args = parser.parse_args()
+
+    if args.producer:
+        # Η κατάσταση μοιράζεται με το όνομα της VOYAGER_SHARED_STATE (ή "voyager")
+        state = SharedState(
+            shared_state_name or serving.DEFAULT_STATE_NAME, capacities=CAPACITIES
+        )
+        try:
+            serving.run_producer(hub, producers(), state)
+        finally:
+            state.close(unlink=True)
+    elif args.workers > 0:
+        # Λειτουργία παραγωγής: μία διεργασία producer και πολλοί workers
+        serving.serve(app, hub, producers(), args.host, args.port, args.workers)
+    else:
+        # Ξεκινάμε τις background εργασίες σε ξεχωριστά threads
+        for task in producers():
+            threading.Thread(target=task, daemon=True).start()
+
+        # Ξεκινάμε τον Flask server (προσβάσιμος από localhost)
+        app.run(debug=True, host=args.host, port=args.port)
@@ -1,9 +1,26 @@
+import ast
 import time
 import random
 from dataclasses import dataclass, field
 
 type Hotspot = tuple[float, float]
 
+# Column order of the telemetry CSV log written by ESP32Task
+CSV_HEADER = [
+    "altitude",
+    "temperature",
+    "pressure",
+    "gps_time",
+    "latitude",
+    "longitude",
+    "pitch",
+    "roll",
+    "yaw",
+    "is_vtx_on",
+    "hotspots",
+    "timestamp",
+]
+
 
 @dataclass(slots=True)
 class CanSatData:
@@ -138,6 +155,51 @@ class CanSatData:
             final_str = f"{main_str},{self.timestamp}"
         return f"#{final_str}#"
 
+    def to_csv_row(self) -> list[object]:
+        """
+        Converts the object to a row of the telemetry CSV log (see CSV_HEADER).
+        """
+        return [
+            self.altitude,
+            self.temperature,
+            self.pressure,
+            self.gps_time,
+            self.latitude,
+            self.longitude,
+            self.pitch,
+            self.roll,
+            self.yaw,
+            self.is_vtx_on,
+            self.hotspots,
+            self.timestamp,
+        ]
+
+    @staticmethod
+    def parse_from_csv_row(row: list[str]):
+        """
+        Parses a row of the telemetry CSV log (see CSV_HEADER).
+        The hotspots column is stored as the repr of a list of tuples.
+
+        Returns a CanSatData object or None if parsing fails.
+        """
+        try:
+            return CanSatData(
+                altitude=float(row[0]),
+                temperature=float(row[1]),
+                pressure=float(row[2]),
+                gps_time=row[3],
+                latitude=float(row[4]),
+                longitude=float(row[5]),
+                pitch=float(row[6]),
+                roll=float(row[7]),
+                yaw=float(row[8]),
+                is_vtx_on=int(row[9]),
+                hotspots=ast.literal_eval(row[10]),
+                timestamp=float(row[11]),
+            )
+        except (ValueError, IndexError, SyntaxError):
+            return None
+
     def update_from_string(self, data_str: str):
         """
         Updates the properties of the object using a telemetry string in the above format.
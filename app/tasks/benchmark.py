@@ -0,0 +1,602 @@
+"""
+Offline benchmarks of the ground-station hot paths.
+
+Runs against the images in assets/ and synthetic CanSatData.create_dump() streams,
+and writes the results as JSON so that runs can be compared:
+
+    python -m tasks.benchmark -o before.json
+    python -m tasks.benchmark -o after.json --compare before.json
+
+Every timing is reported in seconds per operation (median and minimum over several
+repeats), together with the corresponding rate.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+import cv2
+import numpy as np
+from tasks.CanSatData import CSV_HEADER, CanSatData
+from tasks.csv_writer import CSVTelemetryWriter
+from tasks.cv_detection import BlobDetector, CVDetectionConfig, match_recall
+from tasks.detection import DetectionMethod, DetectionPoint
+from tasks.ml_detector import MLDetector, MLDetectorProcess, StubDetector
+from tasks.projection import get_ray_table, ray_table_error
+from tasks.task1_vtx import VTXProcessor
+from tasks.task2_esp32 import ESP32Task
+from tasks.telemetry_parser import parse_frames
+from tasks.thermal import (
+    THERMAL_HEIGHT,
+    THERMAL_RECORD_DTYPE,
+    THERMAL_WIDTH,
+    ThermalConfig,
+    ThermalDetector,
+    process_log,
+)
+from tasks import wire_format
+from tasks.live_frame import FramePublisher
+from tasks.shared_state import CAPACITIES, SharedState, StateExporter, StateMirror
+from tasks.telemetry_hub import INTEREST_POINTS, VTX_FRAME, TelemetryHub
+
+ASSETS_DIR = Path(__file__).resolve().parents[2] / "assets"
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+# Detection pyramid configurations compared with the full-resolution detection
+PYRAMID_CONFIGS = {
+    "full": CVDetectionConfig(),
+    "half": CVDetectionConfig(scale=0.5),
+    "half_no_refine": CVDetectionConfig(scale=0.5, refine=False),
+    "quarter": CVDetectionConfig(scale=0.25),
+    "rois": CVDetectionConfig(use_rois=True),
+    "half_rois": CVDetectionConfig(scale=0.5, use_rois=True),
+    # Recall is measured at the blob centres, which are centroids in this mode
+    "components": CVDetectionConfig(mode="components"),
+    "half_components": CVDetectionConfig(scale=0.5, mode="components"),
+}
+SEED = 1234
+FORMAT_VERSION = 1
+
+type Result = dict[str, object]
+
+
+def measure(
+    fn: Callable[[], object], number: int = 1, repeat: int = 5
+) -> dict[str, float]:
+    """
+    Times fn: `repeat` rounds of `number` calls each.
+
+    :return: The median and minimum time per call and the median calls per second.
+    """
+    per_call: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            _ = fn()
+        per_call.append((time.perf_counter() - start) / number)
+    median = statistics.median(per_call)
+    return {
+        "median_s": median,
+        "min_s": min(per_call),
+        "per_s": 1 / median if median > 0 else float("inf"),
+        "calls": number * repeat,
+    }
+
+
+def dump_stream(count: int, start: float = 1_700_000_000.0, interval: float = 0.1):
+    """
+    Returns `count` dummy packets with increasing timestamps.
+    """
+    packets: list[CanSatData] = []
+    for i in range(count):
+        packet = CanSatData.create_dump()
+        packet.timestamp = start + i * interval
+        packets.append(packet)
+    return packets
+
+
+def random_points(count: int, center: tuple[float, float], spread: float = 0.002):
+    methods = [
+        DetectionMethod.COMPUTER_VISION,
+        DetectionMethod.MACHINE_LEARNING,
+        DetectionMethod.CANSAT_HOTSPOTS,
+    ]
+    return [
+        DetectionPoint(
+            latitude=center[0] + random.uniform(-spread, spread),
+            longitude=center[1] + random.uniform(-spread, spread),
+            score=random.uniform(0, 1),
+            methods=random.choice(methods),
+        )
+        for _ in range(count)
+    ]
+
+
+def load_frames():
+    """
+    Returns the asset images (name, BGR image) used as VTX frames.
+
+    :raises FileNotFoundError: If there are no images in ASSETS_DIR.
+    """
+    frames: list[tuple[str, cv2.typing.MatLike]] = []
+    for path in sorted(ASSETS_DIR.glob("*")):
+        if path.suffix.lower() not in (".png", ".jpg", ".jpeg"):
+            continue
+        # cv2.imread does not handle non-ASCII paths on every platform
+        image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is not None:
+            frames.append((path.name, image))
+    if not frames:
+        raise FileNotFoundError(f"No benchmark images found in {ASSETS_DIR}")
+    return frames
+
+
+def bench_parse(packets: int) -> Result:
+    data = dump_stream(packets)
+    lines = [packet.to_string() for packet in data]
+    buffer = "".join(lines)
+    binary = [wire_format.encode(packet) for packet in data]
+    binary_buffer = b"".join(binary)
+    return {
+        "packets": packets,
+        "text_bytes_per_packet": len(buffer) / packets,
+        "binary_bytes_per_packet": len(binary_buffer) / packets,
+        "to_string": measure(lambda: [p.to_string() for p in data], repeat=3),
+        "parse_from_string": measure(
+            lambda: [CanSatData.parse_from_string(line) for line in lines], repeat=3
+        ),
+        "parse_frames_bulk": measure(lambda: parse_frames(buffer), repeat=3),
+        "binary_encode": measure(
+            lambda: [wire_format.encode(p) for p in data], repeat=3
+        ),
+        "binary_decode": measure(
+            lambda: [wire_format.decode(packet) for packet in binary], repeat=3
+        ),
+        "binary_parse_frames_bulk": measure(
+            lambda: parse_frames(binary_buffer), repeat=3
+        ),
+        "unit": "seconds per batch of packets",
+    }
+
+
+def bench_save_to_csv(rows: int) -> Result:
+    data = dump_stream(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "bench.csv")
+        writer = CSVTelemetryWriter(filename, max_queue=rows)
+        task = ESP32Task(csv_filename=filename, csv_writer=writer)
+        writer.start()
+        start = time.perf_counter()
+        for packet in data:
+            _ = task.save_to_csv(packet)
+        enqueued = time.perf_counter() - start
+        writer.close()
+        written = time.perf_counter() - start
+        stats = writer.stats()
+    return {
+        "rows": rows,
+        "enqueue_rows_per_s": rows / enqueued,
+        "written_rows_per_s": stats["written_rows"] / written,
+        "dropped_rows": stats["dropped_rows"],
+    }
+
+
+def bench_closest(sizes: list[int], lookups: int) -> Result:
+    results: list[Result] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            filename = os.path.join(tmp, f"log-{size}.csv")
+            data = dump_stream(size)
+            with open(filename, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(CSV_HEADER)
+                writer.writerows(packet.to_csv_row() for packet in data)
+            first, last = data[0].timestamp, data[-1].timestamp
+            queries = [random.uniform(first, last) for _ in range(lookups)]
+
+            processor = VTXProcessor(debug=True)
+            start = time.perf_counter()
+            _ = processor.get_closest_cansat_data(queries[0], filename)
+            cold = time.perf_counter() - start
+
+            def lookup():
+                for query in queries:
+                    _ = processor.get_closest_cansat_data(query, filename)
+
+            warm = measure(lookup, repeat=3)
+            results.append(
+                {
+                    "log_rows": size,
+                    "first_call_s": cold,
+                    "lookup_median_s": warm["median_s"] / lookups,
+                }
+            )
+    return {"sizes": results}
+
+
+def bench_image_point_to_world(points: int) -> Result:
+    processor = VTXProcessor(debug=True)
+    cansat_data = CanSatData.create_dump()
+    resolution = (1280, 720)
+    pixels = [
+        (random.randrange(resolution[0]), random.randrange(resolution[1]))
+        for _ in range(points)
+    ]
+
+    def scalar():
+        for pixel in pixels:
+            _ = processor.image_point_to_world(cansat_data, pixel, resolution)
+
+    scalar_time = measure(scalar, repeat=3)
+    batch_time = measure(
+        lambda: processor.image_points_to_world(cansat_data, pixels, resolution)
+    )
+    pose = (cansat_data.pitch, cansat_data.roll, cansat_data.yaw)
+
+    def build_table():
+        get_ray_table.cache_clear()
+        _ = get_ray_table(*pose, resolution)
+
+    build_time = measure(build_table, repeat=3)
+    table_processor = VTXProcessor(debug=True, use_ray_table=True)
+    table_time = measure(
+        lambda: table_processor.image_points_to_world(cansat_data, pixels, resolution)
+    )
+    return {
+        "points": points,
+        "scalar_per_point_s": scalar_time["median_s"] / points,
+        "batch_per_point_s": batch_time["median_s"] / points,
+        "ray_table_build_s": build_time["median_s"],
+        "ray_table_per_point_s": table_time["median_s"] / points,
+        "ray_table_max_relative_error": ray_table_error(cansat_data, resolution),
+    }
+
+
+def bench_detect_cv(frames: list[tuple[str, cv2.typing.MatLike]], repeat: int) -> Result:
+    processor = VTXProcessor(debug=True)
+    cansat_data = CanSatData.create_dump()
+    results: list[Result] = []
+    for width, height in RESOLUTIONS:
+        resized = [
+            cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+            for _, image in frames
+        ]
+        counts: list[int] = []
+
+        def detect():
+            counts.clear()
+            for image in resized:
+                counts.append(len(processor.detect_cv_points(cansat_data, image)))
+
+        timing = measure(detect, repeat=repeat)
+        results.append(
+            {
+                "resolution": [width, height],
+                "frames": len(resized),
+                "per_frame_s": timing["median_s"] / len(resized),
+                "points_per_frame": sum(counts) / len(counts),
+            }
+        )
+    return {"images": [name for name, _ in frames], "resolutions": results}
+
+
+def bench_detect_cv_pyramid(
+    frames: list[tuple[str, cv2.typing.MatLike]],
+    frames_per_image: int,
+    resolution: tuple[int, int] = (1920, 1080),
+) -> Result:
+    """
+    Speed and recall of the detection pyramid configurations. Each image is shown
+    for frames_per_image consecutive frames (a static scene, so ROIs predicted from
+    the previous frame stay valid); recall is measured against the full-resolution
+    detection of the same frame.
+    """
+    images = [
+        cv2.resize(image, resolution, interpolation=cv2.INTER_AREA)
+        for _, image in frames
+    ]
+    references = [BlobDetector().detect(image) for image in images]
+    results: dict[str, Result] = {}
+    for name, config in PYRAMID_CONFIGS.items():
+        detector = BlobDetector(config)
+        recalls: list[float] = []
+        elapsed = 0.0
+        for image, reference in zip(images, references):
+            detector.reset()
+            for _ in range(frames_per_image):
+                start = time.perf_counter()
+                blobs = detector.detect(image)
+                elapsed += time.perf_counter() - start
+                recalls.append(match_recall(reference, blobs))
+        stats = detector.stats()
+        results[name] = {
+            "per_frame_s": elapsed / len(recalls),
+            "recall": sum(recalls) / len(recalls),
+            "searched_fraction": stats["searched_fraction"],
+            "full_frame_passes": stats["full_frame_passes"],
+            "roi_passes": stats["roi_passes"],
+        }
+    return {"resolution": list(resolution), "configs": results}
+
+
+def bench_ml_detector(
+    frames: list[tuple[str, cv2.typing.MatLike]], repeat: int
+) -> Result:
+    """
+    Per-frame cost of the deterministic stub model in-process and in a worker
+    process, one frame at a time and in batches, and with the frames downscaled
+    before they are sent (the worker startup is reported separately).
+
+    The stub model is so cheap that the worker's cost is mostly sending the frames;
+    all of them are submitted at once, so the latency includes their queueing.
+    """
+    images = [image for _, image in frames] * repeat
+    results: dict[str, Result] = {}
+    detector = MLDetector(StubDetector())
+    start = time.perf_counter()
+    for image in images:
+        _ = detector.detect(image)
+    results["in_process"] = {"per_frame_s": (time.perf_counter() - start) / len(images)}
+    for batch_size, max_side in ((1, None), (4, None), (4, 640)):
+        worker = MLDetectorProcess("stub", batch_size=batch_size, max_side=max_side)
+        try:
+            start = time.perf_counter()
+            _ = worker.detect_batch(images)
+            elapsed = time.perf_counter() - start
+            stats = worker.stats()
+        finally:
+            worker.close()
+        name = f"process_batch_{batch_size}"
+        if max_side is not None:
+            name += f"_max_side_{max_side}"
+        results[name] = {
+            "per_frame_s": elapsed / len(images),
+            "startup_s": stats["startup_time"],
+            "batch_size_avg": stats["batch_size_avg"],
+            "latency_p95_s": stats["latency_p95"],
+        }
+    return {"frames": len(images), "modes": results}
+
+
+def bench_merge(counts: list[int]) -> Result:
+    processor = VTXProcessor(debug=True)
+    center = (37.94, 23.70)
+    results: list[Result] = []
+    for count in counts:
+        points = random_points(count, center)
+        timing = measure(lambda: processor.merge_points(points), repeat=3)
+        results.append(
+            {
+                "points": count,
+                "merge_s": timing["median_s"],
+                "merged_points": len(processor.merge_points(points)),
+            }
+        )
+    return {"counts": results}
+
+
+def bench_score_and_sort(count: int) -> Result:
+    processor = VTXProcessor(max_spots=50, debug=True)
+    cansat_data = CanSatData.create_dump()
+    center = (cansat_data.latitude, cansat_data.longitude)
+    cv_points = random_points(count, center)
+    ml_points = random_points(count, center)
+    ch_points = random_points(count // 10 or 1, center)
+    timing = measure(
+        lambda: processor.score_and_sort_points(
+            cv_points, ml_points, ch_points, cansat_data
+        ),
+        repeat=5,
+    )
+    return {"points_per_method": count, "score_and_sort_s": timing["median_s"]}
+
+
+def bench_thermal(frames: int) -> Result:
+    """
+    Hotspots of synthetic thermal frames (a warm blob on a noisy background),
+    detected and projected in batches as in a thermal log replay.
+    """
+    rng = np.random.default_rng(SEED)
+    ys, xs = np.mgrid[0:THERMAL_HEIGHT, 0:THERMAL_WIDTH]
+    images = rng.normal(22.0, 0.3, (frames, THERMAL_HEIGHT, THERMAL_WIDTH))
+    centers = rng.uniform((3, 3), (THERMAL_WIDTH - 3, THERMAL_HEIGHT - 3), (frames, 2))
+    distance2 = (xs[None] - centers[:, 0, None, None]) ** 2 + (
+        ys[None] - centers[:, 1, None, None]
+    ) ** 2
+    images += 20.0 * np.exp(-distance2 / 3.0)
+    packets = dump_stream(max(frames // 10, 1))
+    telemetry = parse_frames("".join(packet.to_string() for packet in packets))
+    start = telemetry.records["timestamp"].min()
+    log = np.zeros(frames, dtype=THERMAL_RECORD_DTYPE)
+    log["timestamp"] = start + np.arange(frames) * 0.1
+    log["pixels"] = images
+
+    detector = ThermalDetector(ThermalConfig(min_temp=30.0))
+    detect = measure(lambda: detector.detect(log["pixels"]), repeat=3)
+    process = measure(lambda: process_log(log, telemetry, detector), repeat=3)
+    hotspots = detector.detect(log["pixels"])
+    first = np.searchsorted(hotspots.frame, np.arange(frames))
+    found = first < len(hotspots)
+    error = np.abs(hotspots.points[first[found]] - centers[found]).mean()
+    return {
+        "frames": frames,
+        "detect_s": detect["median_s"],
+        "process_log_s": process["median_s"],
+        "frames_per_s": frames / process["median_s"],
+        "hotspots": len(hotspots),
+        "mean_position_error_px": float(error),
+    }
+
+
+def bench_shared_state(points: int) -> Result:
+    """
+    Sharing the hub between processes: a producer write and a worker read of a VTX
+    frame and of the interest points, and a worker poll with nothing new.
+    """
+    center = (37.94, 23.70)
+    interest_points = [
+        {"lat": point.latitude, "lng": point.longitude, "score": point.score}
+        for point in random_points(points, center)
+    ]
+    _, image = load_frames()[0]
+    hub = TelemetryHub()
+    frame = FramePublisher(hub).encode(image, time.time())  # as for the web view
+    assert frame is not None
+
+    state = SharedState(f"bench-{os.getpid()}", capacities=CAPACITIES)
+    try:
+        exporter = StateExporter(hub, state)
+        mirror = StateMirror(TelemetryHub(), state)
+        seq = 0
+
+        def share(topic: str, value: object):
+            nonlocal seq
+            seq += 1
+            exporter._export(seq, topic, value, 0.0)  # pyright: ignore
+            return mirror.poll()
+
+        frame_timing = measure(lambda: share(VTX_FRAME, frame), number=100)
+        points_timing = measure(lambda: share(INTEREST_POINTS, interest_points), 100)
+        poll = measure(mirror.poll, number=10_000)
+    finally:
+        state.close(unlink=True)
+    return {
+        "frame_bytes": len(frame.jpeg),
+        "frame_s": frame_timing["median_s"],
+        "points": points,
+        "points_s": points_timing["median_s"],
+        "idle_poll_s": poll["median_s"],
+    }
+
+
+def run(quick: bool = False, only: str | None = None) -> dict[str, object]:
+    """
+    Runs the benchmarks (all, or those whose name contains `only`) and returns the
+    JSON-serializable report.
+    """
+    random.seed(SEED)
+    np.random.seed(SEED)
+    # Quick runs use smaller streams and skip the largest sizes
+    scale = 10 if quick else 1
+    sizes = slice(-1 if quick else None)
+    benchmarks: dict[str, Callable[[], Result]] = {
+        "parse": lambda: bench_parse(100_000 // scale),
+        "save_to_csv": lambda: bench_save_to_csv(100_000 // scale),
+        "get_closest_cansat_data": lambda: bench_closest(
+            [1_000, 10_000, 100_000][sizes], lookups=1_000
+        ),
+        "image_point_to_world": lambda: bench_image_point_to_world(10_000 // scale),
+        "detect_cv_points": lambda: bench_detect_cv(
+            load_frames(), repeat=1 if quick else 3
+        ),
+        "detect_cv_pyramid": lambda: bench_detect_cv_pyramid(
+            load_frames(), frames_per_image=5 if quick else 10
+        ),
+        "ml_detector": lambda: bench_ml_detector(
+            load_frames(), repeat=2 if quick else 5
+        ),
+        "merge_points": lambda: bench_merge([100, 1_000, 10_000][sizes]),
+        "score_and_sort_points": lambda: bench_score_and_sort(1_000 // scale),
+        "thermal": lambda: bench_thermal(10_000 // scale),
+        "shared_state": lambda: bench_shared_state(1_000 // scale),
+    }
+    results: dict[str, Result] = {}
+    for name, benchmark in benchmarks.items():
+        if only is not None and only not in name:
+            continue
+        print(f"Running {name}...", file=sys.stderr)
+        start = time.perf_counter()
+        results[name] = benchmark()
+        results[name]["wall_s"] = time.perf_counter() - start
+    return {
+        "format_version": FORMAT_VERSION,
+        "created": time.time(),
+        "quick": quick,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def _timings(value: object, path: str = "") -> dict[str, float]:
+    """
+    Flattens a report to {path: seconds} for the fields ending in "_s".
+    List items are keyed by their first field (e.g. the resolution or size).
+    """
+    timings: dict[str, float] = {}
+    if isinstance(value, dict):
+        for key, item in value.items():  # pyright: ignore[reportUnknownVariableType]
+            child = f"{path}.{key}" if path else str(key)  # pyright: ignore[reportUnknownArgumentType]
+            if isinstance(item, (int, float)) and str(key).endswith("_s"):  # pyright: ignore[reportUnknownArgumentType]
+                timings[child] = float(item)
+            else:
+                timings.update(_timings(item, child))
+    elif isinstance(value, list):
+        for item in value:  # pyright: ignore[reportUnknownVariableType]
+            if isinstance(item, dict) and item:
+                label = next(iter(item.values()))  # pyright: ignore[reportUnknownArgumentType, reportUnknownVariableType]
+                timings.update(_timings(item, f"{path}[{label}]"))
+    return timings
+
+
+def compare(baseline: dict[str, object], current: dict[str, object], threshold: float):
+    """
+    Prints the change of every timing against a baseline report and returns the
+    names of the timings that got slower by more than `threshold` (e.g. 0.2 = 20%).
+    """
+    old = _timings(baseline["results"])
+    new = _timings(current["results"])
+    regressions: list[str] = []
+    for name in sorted(new.keys() & old.keys()):
+        if name.endswith("wall_s") or old[name] <= 0:
+            continue
+        change = new[name] / old[name] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  <-- slower"
+            regressions.append(name)
+        print(f"{name:70s} {old[name]:12.3e} -> {new[name]:12.3e} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    _ = parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    _ = parser.add_argument("--quick", action="store_true", help="smaller workloads")
+    _ = parser.add_argument("--only", help="run only the benchmarks containing this name")
+    _ = parser.add_argument("--compare", help="baseline JSON report to compare with")
+    _ = parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="slowdown reported as a regression (default 0.2 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    report = run(quick=args.quick, only=args.only)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        _ = Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(baseline, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import csv
+import os
+import queue
+import threading
+import time
+from typing import TextIO
+from tasks import metrics
+from tasks.CanSatData import CanSatData, CSV_HEADER
+
+_STOP = object()  # queue sentinel that stops the writer thread
+
+_WRITE_TIME = metrics.stage_timer("csv_write")  # per batch
+_DROPPED = metrics.counter(
+    "voyager_csv_rows_dropped_total", "Telemetry rows dropped (CSV queue full)."
+)
+
+
+class CSVTelemetryWriter(threading.Thread):
+    """
+    Background writer stage for the telemetry CSV log.
+
+    The reader thread hands packets over with write(), which never blocks: packets go
+    into a bounded queue and are counted as dropped if the queue is full. The writer
+    thread keeps the file open, writes the rows in batches, flushes when a batch is
+    full or flush_interval has passed, and fsyncs every fsync_interval seconds.
+    The log is rotated when it grows past max_bytes, or on request (e.g. per flight).
+    """
+
+    csv_filename: str
+    batch_size: int
+    flush_interval: float
+    fsync_interval: float | None
+    max_bytes: int | None
+
+    def __init__(
+        self,
+        csv_filename: str = "esp32_data.csv",
+        max_queue: int = 10_000,
+        batch_size: int = 64,
+        flush_interval: float = 0.5,
+        fsync_interval: float | None = 5.0,
+        max_bytes: int | None = None,
+    ):
+        """
+        :param csv_filename: The path to the CSV log.
+        :param max_queue: Maximum number of rows waiting to be written.
+        :param batch_size: Rows are flushed as soon as this many are pending.
+        :param flush_interval: Maximum time (seconds) a row waits before being flushed.
+        :param fsync_interval: Seconds between fsync calls, or None to never fsync.
+        :param max_bytes: Rotate the log when it grows past this size, or None.
+        """
+        super().__init__(daemon=True)
+        self.csv_filename = csv_filename
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+
+        self._queue: queue.Queue[object] = queue.Queue(maxsize=max_queue)
+        self._file: TextIO | None = None
+        self._writer = None
+        self._last_fsync = time.monotonic()
+        self._rotate_requested = threading.Event()
+        self._closing = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._written_rows = 0
+        self._dropped_rows = 0
+        self._batches = 0
+        self._fsyncs = 0
+        self._rotations = 0
+
+    def write(self, data: CanSatData):
+        """
+        Queues a packet for writing. Never blocks.
+
+        :return: True if the packet was queued, False if it was dropped.
+        """
+        try:
+            self._queue.put_nowait(data)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped_rows += 1
+            _DROPPED.inc()
+            return False
+
+    def rotate(self):
+        """
+        Requests the log to be rotated before the next batch is written
+        (e.g. at the start of a new flight).
+        """
+        self._rotate_requested.set()
+
+    def close(self, timeout: float | None = None):
+        """
+        Writes the remaining queued rows, flushes, fsyncs and stops the writer thread.
+        Never blocks on a full queue: the writer then stops once it has drained it.
+        """
+        self._closing.set()
+        try:
+            self._queue.put_nowait(_STOP)  # wakes up the writer right away
+        except queue.Full:
+            pass
+        if self.ident is None:
+            # Never started: drain the queue in the calling thread
+            self.run()
+        elif self.is_alive():
+            self.join(timeout)
+
+    def stats(self):
+        """
+        Returns the writer counters: queue depth, written/dropped rows, batches,
+        fsyncs and rotations.
+        """
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "written_rows": self._written_rows,
+                "dropped_rows": self._dropped_rows,
+                "batches": self._batches,
+                "fsyncs": self._fsyncs,
+                "rotations": self._rotations,
+            }
+
+    def run(self):
+        """
+        Main loop: collects rows into batches and writes them to the CSV log.
+        """
+        stopping = False
+        while not stopping:
+            batch: list[CanSatData] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(timeout, 0.0))
+                except queue.Empty:
+                    stopping = self._closing.is_set()
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)  # pyright: ignore[reportArgumentType]
+
+            if batch:
+                with _WRITE_TIME.time():
+                    self._write_batch(batch)
+            elif self._rotate_requested.is_set():
+                self._rotate()
+            self._maybe_fsync()
+        self._close_file()
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.csv_filename, "a", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            if self._file.tell() == 0:
+                # Write headers including gps_time and timestamp
+                self._writer.writerow(CSV_HEADER)
+        return self._writer
+
+    def _write_batch(self, batch: list[CanSatData]):
+        if self._rotate_requested.is_set():
+            self._rotate()
+        writer = self._open()
+        assert writer is not None and self._file is not None
+        writer.writerows(data.to_csv_row() for data in batch)
+        self._file.flush()
+        with self._stats_lock:
+            self._written_rows += len(batch)
+            self._batches += 1
+        if self.max_bytes is not None and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _maybe_fsync(self):
+        if self._file is None or self.fsync_interval is None:
+            return
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+            with self._stats_lock:
+                self._fsyncs += 1
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync_interval is not None:
+                os.fsync(self._file.fileno())
+                self._last_fsync = time.monotonic()
+                with self._stats_lock:
+                    self._fsyncs += 1
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def _rotate(self):
+        """
+        Closes the current log and moves it aside with a timestamp suffix,
+        so the next row starts a new log (with headers).
+        """
+        self._rotate_requested.clear()
+        self._close_file()
+        if not os.path.exists(self.csv_filename):
+            return
+        root, ext = os.path.splitext(self.csv_filename)
+        rotated = f"{root}-{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+        suffix = 1
+        while os.path.exists(rotated):
+            rotated = f"{root}-{time.strftime('%Y%m%d-%H%M%S')}-{suffix}{ext}"
+            suffix += 1
+        os.replace(self.csv_filename, rotated)
+        with self._stats_lock:
+            self._rotations += 1
@@ -0,0 +1,452 @@
+import threading
+import time
+from dataclasses import dataclass
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+type Rect = tuple[int, int, int, int]  # x, y, width, height
+
+
+@dataclass(slots=True)
+class CVDetectionConfig:
+    """
+    Settings of the blob detection pyramid used by VTXProcessor.detect_cv_points.
+
+    The defaults detect on the full-resolution frame, exactly as a single pass of
+    blur, threshold and findContours over the whole image.
+    """
+
+    scale: float = 1.0  # scale of the full-frame pass (0.5 = half width and height)
+    refine: bool = True  # re-detect the blobs of a downscaled pass at full resolution
+    use_rois: bool = False  # between full-frame passes, only search predicted ROIs
+    full_frame_interval: int = 10  # with ROIs: a full-frame pass every N frames
+    roi_margin: int = 24  # pixels added around a predicted blob
+    hotspot_roi_size: int = 96  # side in pixels of the ROI around a CanSat hotspot
+    blur_kernel: int = 23  # Gaussian blur kernel at full resolution
+    threshold: int = 230  # brightness above which a blurred pixel belongs to a blob
+    # The downscaled pass uses a lower threshold, so that blobs that shrink or fade
+    # when downscaling are still found; refining then applies the exact threshold.
+    coarse_threshold_offset: int = 20
+    # "contours": findContours, with the contour area and the bounding box corner as
+    # the point. "components": connectedComponentsWithStats, which gets the pixel
+    # area, bounding box and centroid of all blobs in one native call; the centroid
+    # is the point.
+    mode: str = "contours"
+    min_area: float = 0.0  # smaller blobs (full-resolution pixels²) are ignored
+
+
+@dataclass(slots=True)
+class Blob:
+    """
+    A bright blob in full-resolution pixel coordinates.
+    """
+
+    x: int  # top-left corner of the bounding box
+    y: int
+    width: int
+    height: int
+    area: float  # contour area (or pixel count, in "components" mode) in pixels²
+    centroid: tuple[float, float] | None = None  # in "components" mode
+
+    @property
+    def center(self):
+        if self.centroid is not None:
+            return self.centroid
+        return (self.x + self.width / 2, self.y + self.height / 2)
+
+
+@dataclass(slots=True)
+class BlobArrays:
+    """
+    The blobs of a frame as arrays (one row per blob), in full-resolution pixel
+    coordinates.
+    """
+
+    boxes: NDArray[np.int64]  # N×4: x, y, width, height
+    areas: NDArray[np.float64]  # N
+    centroids: NDArray[np.float64] | None  # N×2, in "components" mode
+
+    def __len__(self):
+        return len(self.areas)
+
+    @classmethod
+    def empty(cls, with_centroids: bool = False):
+        return cls(
+            np.empty((0, 4), dtype=np.int64),
+            np.empty(0),
+            np.empty((0, 2)) if with_centroids else None,
+        )
+
+    @classmethod
+    def concatenate(cls, parts: "list[BlobArrays]", with_centroids: bool = False):
+        if not parts:
+            return cls.empty(with_centroids)
+        return cls(
+            np.concatenate([part.boxes for part in parts]),
+            np.concatenate([part.areas for part in parts]),
+            (
+                np.concatenate([part.centroids for part in parts])  # pyright: ignore
+                if with_centroids
+                else None
+            ),
+        )
+
+    def select(self, mask: NDArray[np.bool_]):
+        return BlobArrays(
+            self.boxes[mask],
+            self.areas[mask],
+            self.centroids[mask] if self.centroids is not None else None,
+        )
+
+    def points(self) -> NDArray[np.float64]:
+        """
+        Returns the N×2 pixel of each blob used as its interest point: the centroid
+        in "components" mode, otherwise the top-left corner of the bounding box.
+        """
+        if self.centroids is not None:
+            return self.centroids
+        return self.boxes[:, :2].astype(np.float64)
+
+    def to_blobs(self):
+        centroids = (
+            [tuple(c) for c in self.centroids.tolist()]
+            if self.centroids is not None
+            else [None] * len(self)
+        )
+        return [
+            Blob(x, y, w, h, area, centroid)  # pyright: ignore[reportArgumentType]
+            for (x, y, w, h), area, centroid in zip(
+                self.boxes.tolist(), self.areas.tolist(), centroids
+            )
+        ]
+
+
+def score_from_area(
+    areas: NDArray[np.float64], image_size: tuple[int, int]
+) -> NDArray[np.float64]:
+    """
+    Scores blobs (0-1) by their area relative to the frame: small blobs are boosted
+    more than large ones, piecewise linearly.
+
+    :param areas: The blob areas in pixels².
+    :param image_size: (width, height) of the frame.
+    :return: The scores, one per area.
+    """
+    w, h = image_size
+    score = np.asarray(areas, dtype=np.float64) / (w * h) * 8192
+    factor = np.select(
+        [score > 0.5, score > 0.2, score > 0.1, score > 0.01],
+        [2.0, 3.0, 5.0, 10.0],
+        default=30.0,
+    )
+    return np.clip(score * factor, 0.0, 1.0)
+
+
+def _odd_kernel(size: float):
+    return max(3, int(round(size)) | 1)
+
+
+def _find_blobs(
+    thresholded: cv2.typing.MatLike,
+    mode: str,
+    offset: tuple[int, int] = (0, 0),
+    scale: float = 1.0,
+) -> BlobArrays:
+    """
+    Extracts the blobs of a thresholded (possibly downscaled or cropped) frame.
+    Coordinates and areas are mapped back to the full-resolution frame.
+
+    :param offset: (x, y) of the crop in the full-resolution frame.
+    :param scale: Scale of the frame relative to the full-resolution frame.
+    """
+    if mode == "components":
+        # 16-bit labels are much faster to write, but only safe while the frame
+        # cannot hold more than 65535 components (at most one per 2×2 pixels)
+        small = thresholded.shape[0] * thresholded.shape[1] <= 4 * 65535
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(
+            thresholded, connectivity=8, ltype=cv2.CV_16U if small else cv2.CV_32S
+        )
+        # Label 0 is the background
+        boxes = stats[1:count, :4].astype(np.int64)
+        areas = stats[1:count, cv2.CC_STAT_AREA].astype(np.float64)
+        centroids = centroids[1:count].astype(np.float64)
+    elif mode == "contours":
+        contours, _ = cv2.findContours(
+            thresholded, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+        )
+        boxes = np.array(
+            [cv2.boundingRect(contour) for contour in contours], dtype=np.int64
+        ).reshape(-1, 4)
+        areas = np.array(
+            [cv2.contourArea(contour) for contour in contours], dtype=np.float64
+        )
+        centroids = None
+    else:
+        raise ValueError(f"Unknown detection mode: {mode}")
+
+    if scale != 1.0:
+        boxes[:, :2] = (boxes[:, :2] / scale).astype(np.int64)
+        boxes[:, 2:] = np.ceil(boxes[:, 2:] / scale).astype(np.int64)
+        areas /= scale * scale
+        if centroids is not None:
+            centroids = (centroids + 0.5) / scale - 0.5
+    if offset != (0, 0):
+        boxes[:, :2] += offset
+        if centroids is not None:
+            centroids += offset
+    return BlobArrays(boxes, areas, centroids)
+
+
+def _threshold_blobs(
+    gray: cv2.typing.MatLike,
+    kernel: int,
+    threshold: int,
+    mode: str,
+    scale: float = 1.0,
+):
+    """
+    Blur, threshold and blob extraction on a (possibly downscaled) gray frame.
+    """
+    blurred = cv2.GaussianBlur(gray, (kernel, kernel), 0)
+    _, thresholded = cv2.threshold(blurred, threshold, 255, cv2.THRESH_BINARY)
+    return _find_blobs(thresholded, mode, scale=scale)
+
+
+def merge_rects(rects: list[Rect]) -> list[Rect]:
+    """
+    Merges overlapping rectangles into their bounding rectangles, so that no pixel is
+    searched twice.
+    """
+    merged = list(rects)
+    changed = True
+    while changed:
+        changed = False
+        result: list[Rect] = []
+        for x, y, w, h in merged:
+            for i, (rx, ry, rw, rh) in enumerate(result):
+                if x < rx + rw and rx < x + w and y < ry + rh and ry < y + h:
+                    x0, y0 = min(x, rx), min(y, ry)
+                    x1, y1 = max(x + w, rx + rw), max(y + h, ry + rh)
+                    result[i] = (x0, y0, x1 - x0, y1 - y0)
+                    changed = True
+                    break
+            else:
+                result.append((x, y, w, h))
+        merged = result
+    return merged
+
+
+def _clip_rect(rect: Rect, width: int, height: int) -> Rect | None:
+    x, y, w, h = rect
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(width, x + w), min(height, y + h)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+def match_recall(
+    reference: list[Blob], blobs: list[Blob], tolerance: float = 8.0
+) -> float:
+    """
+    Fraction of the reference blobs that have a detected blob centre within
+    `tolerance` pixels (1.0 if there are no reference blobs).
+    """
+    if not reference:
+        return 1.0
+    if not blobs:
+        return 0.0
+    ref = np.array([blob.center for blob in reference])
+    found = np.array([blob.center for blob in blobs])
+    distances = np.linalg.norm(ref[:, None, :] - found[None, :, :], axis=2)
+    return float(np.mean(distances.min(axis=1) <= tolerance))
+
+
+class BlobDetector:
+    """
+    Bright-blob detection pyramid for VTX frames.
+
+    A full-frame pass runs on the frame downscaled by config.scale, with the blur
+    kernel scaled to match; with config.refine, only the regions around the blobs it
+    found are then processed again at full resolution, to get exact contours. With
+    config.use_rois, the frames between full-frame passes are only searched in
+    regions of interest: around the previous frame's blobs and around the CanSat
+    hotspots projected into the image. ROI crops are padded by half the blur kernel,
+    so their blur matches the full-frame blur, and detected coordinates are mapped
+    back to the full-resolution frame.
+
+    Blobs far from any ROI are only found on the next full-frame pass, and small
+    blobs can disappear when downscaling: the speed/recall trade-off of a
+    configuration can be measured with match_recall() against the default one
+    (see the detect_cv_pyramid benchmark).
+    """
+
+    config: CVDetectionConfig
+
+    def __init__(self, config: CVDetectionConfig | None = None):
+        self.config = config if config is not None else CVDetectionConfig()
+        self._lock = threading.Lock()
+        self._previous = BlobArrays.empty()
+        self._frames_since_full: int | None = None  # None: no full-frame pass yet
+        self._counters = {
+            "frames": 0,
+            "full_frame_passes": 0,
+            "roi_passes": 0,
+            "searched_pixels": 0,
+            "frame_pixels": 0,
+            "seconds": 0.0,
+        }
+
+    def reset(self):
+        """
+        Forgets the previous detections, so the next frame gets a full-frame pass.
+        """
+        with self._lock:
+            self._previous = BlobArrays.empty()
+            self._frames_since_full = None
+
+    def _search_rois(
+        self, gray: cv2.typing.MatLike, rois: list[Rect]
+    ) -> tuple[BlobArrays, int]:
+        """
+        Detects blobs at full resolution inside the given ROIs.
+        Returns the blobs and the number of pixels searched.
+        """
+        config = self.config
+        height, width = gray.shape[:2]
+        kernel = _odd_kernel(config.blur_kernel)
+        pad = kernel // 2
+        parts: list[BlobArrays] = []
+        searched = 0
+        for roi in merge_rects(rois):
+            clipped = _clip_rect(roi, width, height)
+            if clipped is None:
+                continue
+            x, y, w, h = clipped
+            # Pad the crop so that the blur near the ROI border sees the same pixels
+            # as on the full frame, then keep only the contours inside the ROI.
+            px0, py0 = max(0, x - pad), max(0, y - pad)
+            px1, py1 = min(width, x + w + pad), min(height, y + h + pad)
+            blurred = cv2.GaussianBlur(gray[py0:py1, px0:px1], (kernel, kernel), 0)
+            roi_blurred = blurred[y - py0 : y - py0 + h, x - px0 : x - px0 + w]
+            _, thresholded = cv2.threshold(
+                roi_blurred, config.threshold, 255, cv2.THRESH_BINARY
+            )
+            parts.append(_find_blobs(thresholded, config.mode, offset=(x, y)))
+            searched += (px1 - px0) * (py1 - py0)
+        return BlobArrays.concatenate(parts, config.mode == "components"), searched
+
+    def _blob_rois(self, blobs: BlobArrays) -> list[Rect]:
+        margin = self.config.roi_margin
+        return [
+            (x - margin, y - margin, w + 2 * margin, h + 2 * margin)
+            for x, y, w, h in blobs.boxes.tolist()
+        ]
+
+    def detect(
+        self,
+        image: cv2.typing.MatLike,
+        hotspot_pixels: NDArray[np.float64] | None = None,
+    ) -> list[Blob]:
+        """
+        Detects the bright blobs of a BGR frame.
+
+        :param image: The frame.
+        :param hotspot_pixels: Optional N×2 array of (x, y) pixels where the CanSat
+                               hotspots are expected (NaN rows are ignored); used as
+                               ROIs when config.use_rois is set.
+        :return: The blobs, in full-resolution coordinates.
+        """
+        return self.detect_arrays(image, hotspot_pixels).to_blobs()
+
+    def detect_arrays(
+        self,
+        image: cv2.typing.MatLike,
+        hotspot_pixels: NDArray[np.float64] | None = None,
+    ) -> BlobArrays:
+        """
+        Like detect(), but returns the blobs as arrays, without a Python object per
+        blob.
+        """
+        started = time.perf_counter()
+        config = self.config
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape[:2]
+
+        with self._lock:
+            previous = self._previous
+            full_frame = (
+                not config.use_rois
+                or self._frames_since_full is None
+                or self._frames_since_full + 1 >= config.full_frame_interval
+            )
+
+        if full_frame:
+            if config.scale >= 1.0:
+                blobs = _threshold_blobs(
+                    gray, _odd_kernel(config.blur_kernel), config.threshold, config.mode
+                )
+                searched = width * height
+            else:
+                small_size = (
+                    max(1, round(width * config.scale)),
+                    max(1, round(height * config.scale)),
+                )
+                small = cv2.resize(gray, small_size, interpolation=cv2.INTER_AREA)
+                coarse_threshold = config.threshold
+                if config.refine:
+                    coarse_threshold -= config.coarse_threshold_offset
+                blobs = _threshold_blobs(
+                    small,
+                    _odd_kernel(config.blur_kernel * config.scale),
+                    coarse_threshold,
+                    config.mode,
+                    scale=config.scale,
+                )
+                searched = small.shape[0] * small.shape[1]
+                if config.refine and len(blobs):
+                    blobs, refined = self._search_rois(gray, self._blob_rois(blobs))
+                    searched += refined
+        else:
+            rois = self._blob_rois(previous)
+            if hotspot_pixels is not None and len(hotspot_pixels):
+                half = config.hotspot_roi_size // 2
+                for x, y in hotspot_pixels[~np.isnan(hotspot_pixels).any(axis=1)]:
+                    rois.append((int(x) - half, int(y) - half, 2 * half, 2 * half))
+            blobs, searched = self._search_rois(gray, rois)
+
+        if config.min_area > 0:
+            blobs = blobs.select(blobs.areas >= config.min_area)
+
+        with self._lock:
+            self._previous = blobs
+            if full_frame or self._frames_since_full is None:
+                self._frames_since_full = 0
+            else:
+                self._frames_since_full += 1
+            counters = self._counters
+            counters["frames"] += 1
+            counters["full_frame_passes" if full_frame else "roi_passes"] += 1
+            counters["searched_pixels"] += searched
+            counters["frame_pixels"] += width * height
+            counters["seconds"] += time.perf_counter() - started
+        return blobs
+
+    def stats(self):
+        """
+        Returns the number of frames and passes, the average fraction of each frame
+        that was searched (at full-resolution pixel cost) and the average time per frame.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        frames = counters["frames"]
+        return {
+            "frames": frames,
+            "full_frame_passes": counters["full_frame_passes"],
+            "roi_passes": counters["roi_passes"],
+            "searched_fraction": (
+                counters["searched_pixels"] / counters["frame_pixels"] if frames else 0.0
+            ),
+            "seconds_per_frame": counters["seconds"] / frames if frames else 0.0,
+        }
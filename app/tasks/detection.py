@@ -0,0 +1,52 @@
+import enum
+from enum import Flag
+from dataclasses import dataclass
+
+
+class DetectionMethod(Flag):
+    COMPUTER_VISION = enum.auto()
+    MACHINE_LEARNING = enum.auto()
+    CANSAT_HOTSPOTS = enum.auto()
+    THE_CANSAT = enum.auto()
+
+
+@dataclass(slots=True)
+class DetectionPoint:
+    latitude: float
+    longitude: float
+    score: float
+    methods: DetectionMethod
+
+
+@dataclass(slots=True)
+class RatedDetectionPoint:
+    detection_point: DetectionPoint
+    rating: int
+
+    @property
+    def latitude(self):
+        return self.detection_point.latitude
+
+    @property
+    def longitude(self):
+        return self.detection_point.longitude
+
+    @property
+    def score(self):
+        return self.detection_point.score
+
+    @property
+    def methods(self):
+        return self.detection_point.methods
+
+    def to_dict(self):
+        """
+        Returns the point as a JSON-serializable dictionary, as served by /points.
+        """
+        return {
+            "lat": self.latitude,
+            "lng": self.longitude,
+            "score": self.score,
+            "methods": [method.name for method in self.methods],
+            "rating": self.rating,
+        }
@@ -0,0 +1,354 @@
+import csv
+import os
+import struct
+from collections.abc import Iterable
+from typing import BinaryIO
+import numpy as np
+from numpy.typing import NDArray
+from tasks.CanSatData import CanSatData, CSV_HEADER, Hotspot
+from tasks.telemetry_store import interpolate_cansat_data
+
+# Fixed-width record for the scalar CanSatData fields. Hotspots live in a separate
+# section and are referenced by (hotspot_offset, hotspot_count).
+RECORD_DTYPE = np.dtype(
+    [
+        ("timestamp", "<f8"),
+        ("altitude", "<f8"),
+        ("temperature", "<f8"),
+        ("pressure", "<f8"),
+        ("gps_time", "S8"),
+        ("latitude", "<f8"),
+        ("longitude", "<f8"),
+        ("pitch", "<f8"),
+        ("roll", "<f8"),
+        ("yaw", "<f8"),
+        ("is_vtx_on", "u1"),
+        ("hotspot_count", "<u2"),
+        ("hotspot_offset", "<u8"),
+    ]
+)
+HOTSPOT_DTYPE = np.dtype("<f8")  # (lat, lng) pairs
+
+RECORDS_MAGIC = b"VGLOGREC"
+HOTSPOTS_MAGIC = b"VGLOGHOT"
+VERSION = 1
+# magic, version, item size
+_HEADER = struct.Struct("<8sHH4x")
+HEADER_SIZE = _HEADER.size
+HOTSPOTS_SUFFIX = ".hotspots"
+
+
+def _hotspots_path(path: str):
+    return path + HOTSPOTS_SUFFIX
+
+
+def _open_section(path: str, magic: bytes, item_size: int) -> BinaryIO:
+    """
+    Opens a section for appending, positioned after its last whole item: a partial
+    trailing item (e.g. a write torn by a crash) is truncated, so that the items
+    appended next stay aligned.
+    """
+    f = open(path, "r+b" if os.path.exists(path) else "w+b")
+    try:
+        size = f.seek(0, os.SEEK_END)
+        if size < HEADER_SIZE:
+            # New, or crashed before its header was complete
+            _ = f.truncate(0)
+            _ = f.seek(0)
+            _ = f.write(_HEADER.pack(magic, VERSION, item_size))
+        else:
+            _check_header(path, magic, item_size)
+            _truncate_section(f, (size - HEADER_SIZE) // item_size, item_size)
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def _truncate_section(f: BinaryIO, count: int, item_size: int):
+    """
+    Cuts a section open for appending to its first `count` items.
+    """
+    end = HEADER_SIZE + count * item_size
+    if f.seek(0, os.SEEK_END) != end:
+        _ = f.truncate(end)
+    _ = f.seek(end)
+
+
+def _complete_records(records: NDArray[np.void], hotspot_count: int):
+    """
+    Returns how many of the first records have all their hotspots in a hotspots
+    section of `hotspot_count` pairs (records are appended with increasing offsets,
+    so they are a prefix).
+    """
+    if len(records) == 0:
+        return 0
+    last = records[-1]
+    if int(last["hotspot_offset"]) + int(last["hotspot_count"]) <= hotspot_count:
+        return len(records)  # the common case, without reading every record
+    ends = records["hotspot_offset"] + records["hotspot_count"]
+    return int(np.searchsorted(ends, hotspot_count, side="right"))
+
+
+def _check_header(path: str, magic: bytes, item_size: int):
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise ValueError(f"Truncated flight log header: {path}")
+    file_magic, version, file_item_size = _HEADER.unpack(header)
+    if file_magic != magic or version != VERSION or file_item_size != item_size:
+        raise ValueError(f"Not a version {VERSION} flight log section: {path}")
+
+
+def record_to_cansat_data(record: np.void, hotspots: NDArray[np.float64]):
+    """
+    Converts a RECORD_DTYPE record and its N×2 hotspots array to a CanSatData object.
+    """
+    return CanSatData(
+        altitude=float(record["altitude"]),
+        temperature=float(record["temperature"]),
+        pressure=float(record["pressure"]),
+        gps_time=bytes(record["gps_time"]).decode("ascii", errors="replace"),
+        latitude=float(record["latitude"]),
+        longitude=float(record["longitude"]),
+        pitch=float(record["pitch"]),
+        roll=float(record["roll"]),
+        yaw=float(record["yaw"]),
+        is_vtx_on=int(record["is_vtx_on"]),
+        hotspots=[(lat, lng) for lat, lng in hotspots.tolist()],
+        timestamp=float(record["timestamp"]),
+    )
+
+
+class FlightLogWriter:
+    """
+    Append-only writer of the binary flight log.
+
+    A flight log consists of two files: `path` holds fixed-width records
+    (RECORD_DTYPE) with the scalar fields of each packet, and `path + ".hotspots"`
+    holds all hotspots as consecutive (lat, lng) float64 pairs. Each file starts with
+    a small header (magic, version, item size). Hotspots are flushed before the
+    records that reference them are written, so a crash of the process never leaves
+    a record pointing at missing data. When a log is reopened, a partial trailing
+    item and records whose hotspots are missing (e.g. after a power loss) are cut
+    off before appending.
+    """
+
+    path: str
+
+    def __init__(self, path: str):
+        """
+        :param path: The path of the records file. Existing logs are appended to.
+        """
+        self.path = path
+        self._hotspots = _open_section(
+            _hotspots_path(path), HOTSPOTS_MAGIC, 2 * HOTSPOT_DTYPE.itemsize
+        )
+        self._records = _open_section(path, RECORDS_MAGIC, RECORD_DTYPE.itemsize)
+        hotspot_bytes = self._hotspots.tell() - HEADER_SIZE
+        self._hotspot_count = hotspot_bytes // (2 * HOTSPOT_DTYPE.itemsize)
+        record_count = (self._records.tell() - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if record_count:
+            records = np.memmap(
+                path,
+                dtype=RECORD_DTYPE,
+                mode="r",
+                offset=HEADER_SIZE,
+                shape=(record_count,),
+            )
+            complete = _complete_records(records, self._hotspot_count)
+            del records
+            _truncate_section(self._records, complete, RECORD_DTYPE.itemsize)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc: object):
+        self.close()
+
+    def append(self, data: CanSatData):
+        """
+        Appends one packet to the log.
+        """
+        self.append_many([data])
+
+    def append_many(self, packets: Iterable[CanSatData]):
+        """
+        Appends several packets to the log with one write per section.
+        """
+        packets = list(packets)
+        records = np.zeros(len(packets), dtype=RECORD_DTYPE)
+        hotspots: list[Hotspot] = []
+        for i, data in enumerate(packets):
+            records[i] = (
+                data.timestamp,
+                data.altitude,
+                data.temperature,
+                data.pressure,
+                data.gps_time.encode("ascii", errors="replace")[:8],
+                data.latitude,
+                data.longitude,
+                data.pitch,
+                data.roll,
+                data.yaw,
+                data.is_vtx_on,
+                len(data.hotspots),
+                len(hotspots),
+            )
+            hotspots.extend(data.hotspots)
+        self.append_records(records, np.array(hotspots, dtype=HOTSPOT_DTYPE))
+
+    def append_records(
+        self, records: NDArray[np.void], hotspots: NDArray[np.float64]
+    ):
+        """
+        Appends already columnar packets, e.g. the output of the bulk telemetry parser.
+
+        :param records: A structured array with RECORD_DTYPE, whose hotspot_offset
+                        column indexes into the given hotspots array.
+        :param hotspots: An N×2 array of (lat, lng) hotspots referenced by the records.
+        """
+        hotspots = np.ascontiguousarray(hotspots, dtype=HOTSPOT_DTYPE).reshape(-1, 2)
+        records = np.array(records, dtype=RECORD_DTYPE)
+        records["hotspot_offset"] += self._hotspot_count
+        _ = self._hotspots.write(hotspots.tobytes())
+        self._hotspot_count += len(hotspots)
+        # The hotspots reach the file before the records that reference them
+        self._hotspots.flush()
+        _ = self._records.write(records.tobytes())
+
+    def flush(self):
+        self._hotspots.flush()
+        self._records.flush()
+
+    def close(self):
+        self._hotspots.close()
+        self._records.close()
+
+
+class FlightLog:
+    """
+    Read-only, zero-copy view of a binary flight log through numpy.memmap.
+
+    `records` is a structured array (RECORD_DTYPE) whose columns can be used
+    directly for analysis, e.g. `log.records["altitude"]`, and `hotspots` is an
+    N×2 array of (lat, lng) pairs. A partially written trailing record is ignored,
+    as are records whose hotspots were not written (see FlightLogWriter).
+    The log also offers closest(), like TelemetryStore, so it can be used for
+    timestamp lookups without loading it into memory.
+    """
+
+    path: str
+    records: NDArray[np.void]
+    hotspots: NDArray[np.float64]
+
+    def __init__(self, path: str):
+        """
+        :param path: The path of the records file.
+        """
+        self.path = path
+        self.records = self._map(path, RECORDS_MAGIC, RECORD_DTYPE)
+        hotspots = self._map(
+            _hotspots_path(path), HOTSPOTS_MAGIC, HOTSPOT_DTYPE, item_count=2
+        )
+        self.hotspots = hotspots.reshape(-1, 2)
+        complete = _complete_records(self.records, len(self.hotspots))
+        self.records = self.records[:complete]
+        timestamps = self.records["timestamp"]
+        # Record indices in timestamp order, if the records are not already sorted
+        # (e.g. packets that arrived out of order), for closest()
+        self._order: NDArray[np.intp] | None = None
+        self._timestamps = timestamps
+        if not np.all(timestamps[1:] >= timestamps[:-1]):
+            self._order = np.argsort(timestamps, kind="stable")
+            self._timestamps = timestamps[self._order]
+
+    @staticmethod
+    def _map(path: str, magic: bytes, dtype: np.dtype, item_count: int = 1):
+        item_size = dtype.itemsize * item_count
+        _check_header(path, magic, item_size)
+        count = (os.path.getsize(path) - HEADER_SIZE) // item_size
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(
+            path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count * item_count,)
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def hotspots_for(self, index: int) -> NDArray[np.float64]:
+        """
+        Returns the hotspots of the given record as an N×2 (lat, lng) array view.
+        """
+        record = self.records[index]
+        offset = int(record["hotspot_offset"])
+        return self.hotspots[offset : offset + int(record["hotspot_count"])]
+
+    def __getitem__(self, index: int):
+        """
+        Returns the given record as a CanSatData object.
+        """
+        return record_to_cansat_data(self.records[index], self.hotspots_for(index))
+
+    def closest(self, timestamp: float, interpolate: bool = False):
+        """
+        Returns the packet whose timestamp is closest to the given timestamp,
+        or None if the log is empty. See TelemetryStore.closest(); a log whose
+        records are not in timestamp order is searched (and interpolated) in
+        timestamp order too.
+        """
+        if len(self.records) == 0:
+            return None
+        timestamps, order = self._timestamps, self._order
+
+        def packet(position: int):
+            # The packet at a position in timestamp order
+            return self[position if order is None else int(order[position])]
+
+        index = int(np.searchsorted(timestamps, timestamp))
+        if index == 0:
+            return packet(0)
+        if index == len(timestamps):
+            return packet(-1)
+        before, after = packet(index - 1), packet(index)
+        if interpolate:
+            return interpolate_cansat_data(before, after, timestamp)
+        if timestamp - before.timestamp <= after.timestamp - timestamp:
+            return before
+        return after
+
+
+def csv_to_flight_log(csv_filename: str, path: str):
+    """
+    Converts a telemetry CSV log (CSV_HEADER schema) to a binary flight log.
+    Rows that cannot be parsed are skipped.
+
+    :return: The number of packets written.
+    """
+    with open(csv_filename, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        _ = next(reader, None)  # Skip header row
+        packets = [
+            data
+            for data in (CanSatData.parse_from_csv_row(row) for row in reader)
+            if data is not None
+        ]
+    with FlightLogWriter(path) as writer:
+        writer.append_many(packets)
+    return len(packets)
+
+
+def flight_log_to_csv(path: str, csv_filename: str):
+    """
+    Converts a binary flight log to a telemetry CSV log (CSV_HEADER schema).
+
+    :return: The number of packets written.
+    """
+    log = FlightLog(path)
+    with open(csv_filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for index in range(len(log)):
+            writer.writerow(log[index].to_csv_row())
+    return len(log)
@@ -0,0 +1,291 @@
+import os
+import threading
+import time
+import weakref
+from typing import Protocol
+import cv2
+import numpy as np
+
+# Frame buffers of a capture source. Without the grabber thread the ring advances
+# once per read(), so it must be larger than the frames a VTXPipeline with the
+# default queue sizes holds at once (2 + 2 queued, 2 in process, last_image); with
+# it, frames handed out by read() leave the ring until they are released (see
+# FrameRing.detach)
+RING_SIZE = 10
+
+
+class FrameSource(Protocol):
+    """
+    Where VTXProcessor.read_image gets its frames from.
+    """
+
+    def read(self) -> tuple[cv2.typing.MatLike, float] | None:
+        """
+        Returns the next frame and its capture time (Unix time), or None if no
+        frame could be read.
+        """
+        ...
+
+    def release(self, frame: cv2.typing.MatLike) -> None:
+        """
+        Tells the source that a frame returned by read() is no longer used, so that
+        its buffer can be captured into again.
+        """
+        ...
+
+    def stats(self) -> dict[str, object]: ...
+
+    def close(self) -> None: ...
+
+
+class FrameRing:
+    """
+    A fixed ring of reusable frame buffers, so that capturing does not allocate a
+    new frame every time. A buffer is captured into again `size` frames later, so
+    either the ring must be larger than the number of frames in use at once
+    (queued in a VTXPipeline, being processed, kept as VTXProcessor.last_image), or
+    the frames that are handed out must be detached from it and released back once
+    they are no longer used.
+    """
+
+    size: int
+
+    def __init__(self, size: int = RING_SIZE):
+        self.size = size
+        self._buffers: list[np.ndarray | None] = [None] * size
+        self._next = 0
+        # Detached frames by id (weakly, so that unreleased frames are still freed)
+        self._detached: weakref.WeakValueDictionary[int, np.ndarray] = (
+            weakref.WeakValueDictionary()
+        )
+        self._released: list[np.ndarray] = []  # buffers for the detached slots
+        self.allocations = 0
+
+    def next(self):
+        """
+        Returns the next buffer to capture into (None until the frame size is known).
+        """
+        if self._buffers[self._next] is None and self._released:
+            self._buffers[self._next] = self._released.pop()
+        return self._buffers[self._next]
+
+    def commit(self, frame: np.ndarray):
+        """
+        Stores the frame that was captured into the current buffer (a new array if
+        the capture could not reuse it) and advances the ring.
+        """
+        if frame is not self._buffers[self._next]:
+            self._buffers[self._next] = frame
+            self.allocations += 1
+        self._next = (self._next + 1) % self.size
+
+    def detach(self, frame: np.ndarray):
+        """
+        Hands a committed frame over to its reader: its slot gets another buffer on
+        its next capture, so the frame is not captured over until it is released.
+        """
+        for i, buffer in enumerate(self._buffers):
+            if buffer is frame:
+                self._buffers[i] = None
+                self._detached[id(frame)] = frame
+                return
+
+    def release(self, frame: np.ndarray):
+        """
+        Takes back a detached frame, whose buffer is then reused for a detached
+        slot. Frames that were not detached (or were already released) are ignored.
+        """
+        if self._detached.pop(id(frame), None) is frame:
+            if len(self._released) < self.size:
+                self._released.append(frame)
+
+
+class CaptureSource:
+    """
+    Reads frames from a cv2.VideoCapture into a FrameRing with cap.read(image=...).
+
+    With background=True, a grabber thread (started on the first read) reads frames
+    continuously and keeps the newest one, so read() never waits for the camera when
+    a new frame is available and always returns the freshest frame. A frame counts as
+    dropped only if it was replaced by a newer one before anybody read it. Since the
+    grabber runs at the camera's rate, a frame returned by read() is detached from
+    the ring and not captured over until it is handed back with release(); frames
+    that are never released are left to the garbage collector.
+    """
+
+    cap: cv2.VideoCapture
+    background: bool
+
+    def __init__(
+        self,
+        cap: cv2.VideoCapture | int,
+        ring_size: int = RING_SIZE,
+        background: bool = True,
+        read_timeout: float = 1.0,
+    ):
+        """
+        :param cap: An opened VideoCapture or a camera index.
+        :param ring_size: Number of reusable frame buffers (at least 2).
+        :param background: Read frames on a background grabber thread.
+        :param read_timeout: Seconds read() waits for a new frame (background mode).
+        """
+        if ring_size < 2:
+            raise ValueError("A capture source needs at least 2 frame buffers")
+        self.cap = cv2.VideoCapture(cap) if isinstance(cap, int) else cap
+        self.background = background
+        self.read_timeout = read_timeout
+        self._ring = FrameRing(ring_size)
+        self._cond = threading.Condition()
+        self._latest: tuple[cv2.typing.MatLike, float] | None = None
+        self._latest_read = True  # whether _latest was returned by read()
+        self._failed = False
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._counters = {"captured": 0, "read": 0, "dropped": 0, "failures": 0}
+
+    def _capture(self):
+        """
+        Captures one frame into the ring; returns None if the capture failed.
+        """
+        with self._cond:
+            buffer = self._ring.next()
+        # The buffer is neither the latest frame nor handed out: read() detaches
+        # what it returns until it is released, and the latest frame is in the
+        # previous slot
+        ret, frame = self.cap.read(image=buffer)
+        if not ret or frame is None:
+            return None
+        with self._cond:
+            self._ring.commit(frame)
+        return frame, time.time()
+
+    def _grab_loop(self):
+        while not self._stop.is_set():
+            captured = self._capture()
+            with self._cond:
+                if captured is None:
+                    self._counters["failures"] += 1
+                    self._failed = True
+                    self._cond.notify_all()
+                else:
+                    self._counters["captured"] += 1
+                    if not self._latest_read:
+                        self._counters["dropped"] += 1
+                    self._latest = captured
+                    self._latest_read = False
+                    self._failed = False
+                    self._cond.notify_all()
+            if captured is None:
+                # Avoid spinning on a broken source
+                _ = self._stop.wait(0.01)
+
+    def read(self):
+        if not self.background:
+            captured = self._capture()
+            with self._cond:
+                if captured is None:
+                    self._counters["failures"] += 1
+                else:
+                    self._counters["captured"] += 1
+                    self._counters["read"] += 1
+            return captured
+
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._grab_loop, name="vtx-grabber", daemon=True
+            )
+            self._thread.start()
+        with self._cond:
+            # Wait for a frame that was not returned yet (or a capture failure)
+            self._failed = False
+            if not self._cond.wait_for(
+                lambda: not self._latest_read or self._failed or self._stop.is_set(),
+                self.read_timeout,
+            ):
+                return None
+            if self._latest_read:
+                return None
+            self._latest_read = True
+            self._counters["read"] += 1
+            assert self._latest is not None
+            self._ring.detach(self._latest[0])  # pyright: ignore[reportArgumentType]
+            return self._latest
+
+    def release(self, frame: cv2.typing.MatLike):
+        """
+        Returns the buffer of a frame from read() to the ring once the caller is
+        done with it (background mode; otherwise the ring reuses it anyway).
+        """
+        with self._cond:
+            self._ring.release(frame)  # pyright: ignore[reportArgumentType]
+
+    def stats(self):
+        """
+        Returns the frames captured, read and dropped (captured but never read),
+        capture failures and the buffer allocations (once per ring slot, unless
+        the frame size changes, plus one per frame read in background mode and
+        not released).
+        """
+        with self._cond:
+            counters: dict[str, object] = dict(self._counters)
+            counters["allocations"] = self._ring.allocations
+        return counters
+
+    def close(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(1.0)
+        self.cap.release()
+
+
+class FileSource:
+    """
+    Reads frames from an image file that another program keeps replacing (e.g.
+    static/images/latest.jpg). The file is decoded again only when its
+    modification time or size changes; otherwise the cached frame is returned.
+    The cached frame is read-only, since it is shared between reads.
+    """
+
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        self._key: tuple[int, int] | None = None
+        self._image: cv2.typing.MatLike | None = None
+        self._lock = threading.Lock()
+        self._counters = {"read": 0, "decoded": 0, "cache_hits": 0, "failures": 0}
+
+    def read(self):
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                self._counters["failures"] += 1
+                return None
+            key = (stat.st_mtime_ns, stat.st_size)
+            if key != self._key or self._image is None:
+                image = cv2.imread(self.path)
+                if image is None:
+                    # Possibly caught while being rewritten; retry on the next read
+                    self._counters["failures"] += 1
+                    return None
+                image.flags.writeable = False
+                self._image = image
+                self._key = key
+                self._counters["decoded"] += 1
+            else:
+                self._counters["cache_hits"] += 1
+            self._counters["read"] += 1
+            return self._image, time.time()
+
+    def release(self, frame: cv2.typing.MatLike):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def close(self):
+        pass
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+import cv2
+from tasks.telemetry_hub import VTX_FRAME, TelemetryHub
+
+MJPEG_BOUNDARY = "frame"
+MJPEG_KEEPALIVE = 5.0  # seconds without a new frame before the last one is resent
+
+
+@dataclass(slots=True)
+class JPEGSettings:
+    """
+    How VTX frames are encoded for the web view.
+    """
+
+    quality: int = 80  # JPEG quality (0-100)
+    max_width: int | None = 960  # frames are downscaled to at most this width
+    max_fps: float | None = 15.0  # frames published per second at most
+
+
+@dataclass(frozen=True, slots=True)
+class EncodedFrame:
+    """
+    A JPEG-encoded VTX frame, as published on the VTX_FRAME topic.
+    """
+
+    jpeg: bytes
+    timestamp: float  # capture time (Unix time)
+    width: int
+    height: int
+
+
+class FramePublisher:
+    """
+    Encodes captured VTX frames to JPEG once and publishes them on the hub, where
+    the /frame.jpg and /stream.mjpg endpoints pick up the latest one. Publishing
+    swaps the hub's latest snapshot, so readers always get a complete frame and
+    never race with the writer.
+    """
+
+    hub: TelemetryHub
+    settings: JPEGSettings
+
+    def __init__(self, hub: TelemetryHub, settings: JPEGSettings | None = None):
+        self.hub = hub
+        self.settings = settings if settings is not None else JPEGSettings()
+        self._lock = threading.Lock()
+        self._last_published: float | None = None
+        self._counters = {"published": 0, "skipped": 0, "failures": 0, "seconds": 0.0}
+
+    def encode(self, image: cv2.typing.MatLike, timestamp: float):
+        """
+        Encodes a BGR frame with the configured size and quality. Returns None if
+        encoding failed.
+        """
+        settings = self.settings
+        height, width = image.shape[:2]
+        if settings.max_width is not None and width > settings.max_width:
+            scale = settings.max_width / width
+            width, height = settings.max_width, max(1, round(height * scale))
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(
+            ".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, settings.quality]
+        )
+        if not ok:
+            return None
+        return EncodedFrame(jpeg.tobytes(), timestamp, width, height)
+
+    def publish(self, image: cv2.typing.MatLike, timestamp: float):
+        """
+        Encodes and publishes a frame, unless a frame was published less than
+        1 / max_fps seconds ago.
+
+        :return: True if the frame was published.
+        """
+        now = time.monotonic()
+        max_fps = self.settings.max_fps
+        with self._lock:
+            if (
+                max_fps
+                and self._last_published is not None
+                and now - self._last_published < 1 / max_fps
+            ):
+                self._counters["skipped"] += 1
+                return False
+            self._last_published = now
+        frame = self.encode(image, timestamp)
+        with self._lock:
+            self._counters["seconds"] += time.monotonic() - now
+            if frame is None:
+                self._counters["failures"] += 1
+                return False
+            self._counters["published"] += 1
+        _ = self.hub.publish(VTX_FRAME, frame)
+        return True
+
+    def stats(self):
+        """
+        Returns the frames published, skipped (max_fps) and failed, and the average
+        encoding time.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        encoded = counters["published"] + counters["failures"]
+        seconds = counters.pop("seconds")
+        return {**counters, "seconds_per_frame": seconds / encoded if encoded else 0.0}
+
+
+def mjpeg_part(frame: EncodedFrame):
+    """
+    Formats a frame as one part of a multipart/x-mixed-replace response.
+    """
+    header = (
+        f"--{MJPEG_BOUNDARY}\r\n"
+        "Content-Type: image/jpeg\r\n"
+        f"Content-Length: {len(frame.jpeg)}\r\n\r\n"
+    )
+    return header.encode() + frame.jpeg + b"\r\n"
+
+
+def mjpeg_stream(
+    hub: TelemetryHub, keepalive: float = MJPEG_KEEPALIVE
+) -> Iterator[bytes]:
+    """
+    Streams the VTX frames published on the hub as MJPEG (multipart/x-mixed-replace),
+    each as soon as it is published. A client that is slower than the frame rate
+    skips to the newest frame instead of falling behind. Without new frames, the
+    last one is resent every `keepalive` seconds so that the connection stays open.
+    """
+    seq = 0
+    while True:
+        snapshot = hub.wait_for_newer(seq, VTX_FRAME, timeout=keepalive)
+        if snapshot is None:
+            snapshot = hub.latest(VTX_FRAME)
+            if snapshot is None:
+                continue
+        seq = snapshot.seq
+        yield mjpeg_part(snapshot.value)  # pyright: ignore[reportArgumentType]
@@ -0,0 +1,237 @@
+"""
+Load generator for the ground-station web server.
+
+Sends requests to a running server from several client processes, each with a
+number of keep-alive connections used back to back, and reports the throughput
+and latency percentiles, overall and per path:
+
+    python app.py --workers 4 --port 3000
+    python -m tasks.loadtest http://127.0.0.1:3000 --connections 64 --duration 10
+
+It needs nothing but the standard library and NumPy, so it can run on the ground
+station itself, without network access.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from dataclasses import dataclass
+import numpy as np
+
+PATHS = ("/", "/points")  # requested in turn by every connection
+DURATION = 10.0  # seconds of measured load
+WARMUP = 1.0  # seconds of load before the measurement
+CONNECTIONS = 32  # concurrent keep-alive connections
+TIMEOUT = 10.0  # seconds before a request counts as failed
+
+
+@dataclass(slots=True)
+class ClientResult:
+    """
+    The requests sent by one client process.
+    """
+
+    paths: list[int]  # index in the paths list of every request
+    latencies: list[float]  # seconds, of the successful requests
+    statuses: Counter[int]  # HTTP status codes, 0 for connection errors
+    errors: int
+
+
+def _client(
+    url: str,
+    paths: list[str],
+    headers: dict[str, str],
+    connections: int,
+    start: float,
+    end: float,
+    offset: int,
+) -> ClientResult:
+    """
+    Client process: runs `connections` threads that each send requests over one
+    keep-alive connection, cycling through the paths, and records the requests
+    that complete between `start` and `end` (time.time()).
+    """
+    parsed = urllib.parse.urlsplit(url)
+    host = parsed.hostname or "127.0.0.1"
+    port = parsed.port or 80
+    prefix = parsed.path.rstrip("/")
+    result = ClientResult([], [], Counter(), 0)
+    lock = threading.Lock()
+
+    def run(index: int):
+        connection = http.client.HTTPConnection(host, port, timeout=TIMEOUT)
+        path_indices: list[int] = []
+        latencies: list[float] = []
+        statuses: Counter[int] = Counter()
+        errors = 0
+        i = index
+        while (now := time.time()) < end:
+            path_index = i % len(paths)
+            i += 1
+            started = time.perf_counter()
+            try:
+                connection.request("GET", prefix + paths[path_index], headers=headers)
+                response = connection.getresponse()
+                _ = response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status = 0
+            latency = time.perf_counter() - started
+            if now < start:
+                continue
+            statuses[status] += 1
+            if 200 <= status < 400:
+                path_indices.append(path_index)
+                latencies.append(latency)
+            else:
+                errors += 1
+        connection.close()
+        with lock:
+            result.paths.extend(path_indices)
+            result.latencies.extend(latencies)
+            result.statuses.update(statuses)
+            result.errors += errors
+
+    threads = [
+        threading.Thread(target=run, args=(offset + i,)) for i in range(connections)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return result
+
+
+def _latency_stats(latencies: np.ndarray, seconds: float):
+    if len(latencies) == 0:
+        return {"requests": 0, "requests_per_s": 0.0}
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {
+        "requests": len(latencies),
+        "requests_per_s": len(latencies) / seconds,
+        "latency_mean_ms": float(latencies.mean()) * 1000,
+        "latency_p50_ms": float(p50) * 1000,
+        "latency_p90_ms": float(p90) * 1000,
+        "latency_p99_ms": float(p99) * 1000,
+        "latency_max_ms": float(latencies.max()) * 1000,
+    }
+
+
+def run(
+    url: str,
+    paths: list[str] | None = None,
+    connections: int = CONNECTIONS,
+    processes: int | None = None,
+    duration: float = DURATION,
+    warmup: float = WARMUP,
+    headers: dict[str, str] | None = None,
+) -> dict[str, object]:
+    """
+    Loads the server at `url` and returns the results.
+
+    :param paths: Paths requested in turn by every connection (PATHS if None).
+    :param connections: Concurrent connections, spread over the client processes.
+    :param processes: Client processes (as many as CPUs, at most `connections`, if
+                      None); one process cannot generate much load on its own.
+    :param duration: Seconds during which the requests are counted.
+    :param warmup: Seconds of load before that, not counted.
+    :param headers: Request headers (e.g. {"Accept-Encoding": "gzip"}).
+    :return: The requests per second and latency percentiles (in milliseconds) of
+             the successful requests, overall and per path, and the status codes.
+    """
+    paths = list(paths or PATHS)
+    processes = max(1, min(processes or os.cpu_count() or 1, connections))
+    start = time.time() + warmup
+    end = start + duration
+    shares = [
+        connections // processes + (i < connections % processes)
+        for i in range(processes)
+    ]
+    offsets = np.cumsum([0, *shares[:-1]]).tolist()
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        results = pool.starmap(
+            _client,
+            [
+                (url, paths, headers or {}, share, start, end, offset)
+                for share, offset in zip(shares, offsets)
+            ],
+        )
+
+    path_indices = np.array([i for r in results for i in r.paths], dtype=np.int64)
+    latencies = np.array([t for r in results for t in r.latencies], dtype=np.float64)
+    statuses: Counter[int] = Counter()
+    for r in results:
+        statuses.update(r.statuses)
+    return {
+        "url": url,
+        "connections": connections,
+        "processes": processes,
+        "duration_s": duration,
+        **_latency_stats(latencies, duration),
+        "errors": sum(r.errors for r in results),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "paths": {
+            path: _latency_stats(latencies[path_indices == i], duration)
+            for i, path in enumerate(paths)
+        },
+    }
+
+
+def _format_row(name: str, stats: dict[str, object]):
+    if not stats["requests"]:
+        return f"{name:<12} {0:>10} {0.0:>10.1f}"
+    return (
+        f"{name:<12} {stats['requests']:>10} {stats['requests_per_s']:>10.1f}"
+        f" {stats['latency_p50_ms']:>9.2f} {stats['latency_p90_ms']:>9.2f}"
+        f" {stats['latency_p99_ms']:>9.2f} {stats['latency_max_ms']:>9.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    _ = parser.add_argument("url", help="base URL of the server")
+    _ = parser.add_argument(
+        "--paths", nargs="+", default=list(PATHS), help="paths requested in turn"
+    )
+    _ = parser.add_argument("-c", "--connections", type=int, default=CONNECTIONS)
+    _ = parser.add_argument("-p", "--processes", type=int, help="client processes")
+    _ = parser.add_argument("-d", "--duration", type=float, default=DURATION)
+    _ = parser.add_argument("--warmup", type=float, default=WARMUP)
+    _ = parser.add_argument(
+        "--gzip", action="store_true", help="send Accept-Encoding: gzip"
+    )
+    _ = parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(
+        args.url,
+        args.paths,
+        connections=args.connections,
+        processes=args.processes,
+        duration=args.duration,
+        warmup=args.warmup,
+        headers={"Accept-Encoding": "gzip"} if args.gzip else None,
+    )
+    print(
+        f"{'path':<12} {'requests':>10} {'req/s':>10}"
+        f" {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    )
+    paths: dict[str, dict[str, object]] = report["paths"]  # pyright: ignore
+    for path, stats in paths.items():
+        print(_format_row(path, stats))
+    print(_format_row("total", report))
+    print(f"errors: {report['errors']}, statuses: {report['statuses']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
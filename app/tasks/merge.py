@@ -0,0 +1,154 @@
+import math
+from collections.abc import Iterable
+from dataclasses import dataclass
+from tasks.projection import METERS_PER_DEGREE
+from tasks.detection import DetectionMethod, DetectionPoint
+
+MERGE_THRESHOLD = 11.0  # metres, for merging nearby points (~0.0001° of latitude)
+MIN_WEIGHT = 1e-6  # weight of zero-score points in the cluster centroids
+
+type Cell = tuple[int, int]
+
+
+@dataclass(slots=True, eq=False)
+class _Cluster:
+    lat_sum: float
+    lng_sum: float
+    weight: float
+    score: float
+    methods: DetectionMethod
+    cell: Cell
+
+    @property
+    def latitude(self):
+        return self.lat_sum / self.weight
+
+    @property
+    def longitude(self):
+        return self.lng_sum / self.weight
+
+
+class PointMerger:
+    """
+    Merges nearby detection points into clusters using a uniform grid index.
+
+    Coordinates are scaled to metres around a reference latitude, and the grid cell
+    size equals the merge threshold, so only the 3x3 neighbouring cells have to be
+    searched for each point. Each cluster's position is the score-weighted centroid
+    of its points, its score is the maximum score and its methods are the union of
+    the methods.
+
+    Points within a batch are processed in a canonical order, so the result does not
+    depend on the input order. Clusters persist between add() calls, which allows
+    merging the detections of consecutive frames incrementally; reset() starts over.
+    """
+
+    threshold_m: float
+
+    def __init__(self, threshold_m: float = MERGE_THRESHOLD):
+        """
+        :param threshold_m: Points closer than this (in metres) are merged.
+        """
+        self.threshold_m = threshold_m
+        self._clusters: list[_Cluster] = []
+        self._grid: dict[Cell, list[_Cluster]] = {}
+        self._lng_scale: float | None = None
+
+    def reset(self):
+        """
+        Discards all clusters.
+        """
+        self._clusters.clear()
+        self._grid.clear()
+        self._lng_scale = None
+
+    def _to_metres(self, latitude: float, longitude: float):
+        assert self._lng_scale is not None
+        return (latitude * METERS_PER_DEGREE, longitude * self._lng_scale)
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        y, x = self._to_metres(latitude, longitude)
+        return (math.floor(y / self.threshold_m), math.floor(x / self.threshold_m))
+
+    def _nearest_cluster(self, latitude: float, longitude: float):
+        y, x = self._to_metres(latitude, longitude)
+        row, col = self._cell(latitude, longitude)
+        nearest: _Cluster | None = None
+        nearest_dist = self.threshold_m
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                for cluster in self._grid.get((row + d_row, col + d_col), ()):
+                    cy, cx = self._to_metres(cluster.latitude, cluster.longitude)
+                    dist = math.hypot(y - cy, x - cx)
+                    if dist < nearest_dist:
+                        nearest = cluster
+                        nearest_dist = dist
+        return nearest
+
+    def _move(self, cluster: _Cluster):
+        cell = self._cell(cluster.latitude, cluster.longitude)
+        if cell != cluster.cell:
+            self._grid[cluster.cell].remove(cluster)
+            if not self._grid[cluster.cell]:
+                del self._grid[cluster.cell]
+            cluster.cell = cell
+            self._grid.setdefault(cell, []).append(cluster)
+
+    def add(self, points: Iterable[DetectionPoint]):
+        """
+        Merges a batch of points into the current clusters.
+        """
+        ordered = sorted(
+            points,
+            key=lambda p: (-p.score, p.latitude, p.longitude, p.methods.value),
+        )
+        if not ordered:
+            return
+        if self._lng_scale is None:
+            self._lng_scale = METERS_PER_DEGREE * math.cos(
+                math.radians(ordered[0].latitude)
+            )
+
+        for pt in ordered:
+            weight = max(pt.score, MIN_WEIGHT)
+            cluster = self._nearest_cluster(pt.latitude, pt.longitude)
+            if cluster is None:
+                cluster = _Cluster(
+                    lat_sum=pt.latitude * weight,
+                    lng_sum=pt.longitude * weight,
+                    weight=weight,
+                    score=pt.score,
+                    methods=pt.methods,
+                    cell=self._cell(pt.latitude, pt.longitude),
+                )
+                self._clusters.append(cluster)
+                self._grid.setdefault(cluster.cell, []).append(cluster)
+            else:
+                cluster.lat_sum += pt.latitude * weight
+                cluster.lng_sum += pt.longitude * weight
+                cluster.weight += weight
+                cluster.score = max(cluster.score, pt.score)
+                cluster.methods = cluster.methods | pt.methods
+                self._move(cluster)
+
+    def points(self) -> list[DetectionPoint]:
+        """
+        Returns the current clusters as detection points.
+        """
+        return [
+            DetectionPoint(
+                latitude=cluster.latitude,
+                longitude=cluster.longitude,
+                score=cluster.score,
+                methods=cluster.methods,
+            )
+            for cluster in self._clusters
+        ]
+
+    def merge(self, points: Iterable[DetectionPoint]) -> list[DetectionPoint]:
+        """
+        Merges a batch of points from scratch and returns the merged points.
+        """
+        self.reset()
+        self.add(points)
+        return self.points()
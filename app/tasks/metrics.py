@@ -0,0 +1,443 @@
+"""
+Lightweight instrumentation of the ground station: per-stage latency histograms,
+counters, callback gauges, a Prometheus text exporter (served as /metrics) and an
+on-demand sampling profiler.
+
+Metrics are created once at import time by the modules that update them, e.g.
+
+    _PARSE_TIME = metrics.stage_timer("parse")
+    with _PARSE_TIME.time():
+        ...
+
+so the hot path is a perf_counter() pair and a short critical section; there is no
+lookup by name or label per observation.
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter as _StackCounter
+from collections.abc import Callable
+from types import FrameType
+
+# Seconds; from sub-millisecond parsing to multi-second stalls
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+PROFILE_INTERVAL = 0.005  # seconds between profiler samples
+PROFILE_MAX_DEPTH = 64  # frames kept per sampled stack
+PROFILE_ENV = "VOYAGER_PROFILE"  # set to 1 to start the profiler at import
+
+type Labels = tuple[tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels):
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    A monotonically increasing count (e.g. packets received, frames dropped).
+    """
+
+    __slots__ = ("name", "labels", "_value", "_lock")
+
+    def __init__(self, name: str, labels: Labels = ()):
+        self.name = name
+        self.labels = labels
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self):
+        return [(self.name, self.labels, self._value)]
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: "Histogram"):
+        self._histogram = histogram
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_: object):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Histogram:
+    """
+    A distribution of observed values (usually durations in seconds) in fixed
+    buckets, with their count and sum.
+    """
+
+    __slots__ = ("name", "labels", "buckets", "_counts", "_sum", "_count", "_lock")
+
+    def __init__(
+        self,
+        name: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        """
+        Returns a context manager that observes the time spent in its block.
+        """
+        return _Timer(self)
+
+    def snapshot(self):
+        """
+        Returns the count, sum and mean, and the approximate p50/p95/p99 (the upper
+        bound of the bucket the quantile falls into).
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        quantiles: dict[str, float] = {}
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            rank = q * count
+            cumulative = 0
+            bound = 0.0
+            for upper, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                bound = upper
+                if cumulative >= rank:
+                    break
+            quantiles[name] = bound if count else 0.0
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            **quantiles,
+        }
+
+    def samples(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        samples: list[tuple[str, Labels, float]] = []
+        cumulative = 0
+        for upper, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = (("le", _format_value(upper)),)
+            samples.append((f"{self.name}_bucket", self.labels + le, cumulative))
+        samples.append((f"{self.name}_sum", self.labels, total))
+        samples.append((f"{self.name}_count", self.labels, count))
+        return samples
+
+
+class CallbackMetric:
+    """
+    A value read from a function when the metrics are collected, for state that is
+    already counted elsewhere (e.g. a queue depth or the counters of a stats() dict).
+    """
+
+    __slots__ = ("name", "labels", "function")
+
+    def __init__(self, name: str, labels: Labels, function: Callable[[], float]):
+        self.name = name
+        self.labels = labels
+        self.function = function
+
+    def samples(self):
+        try:
+            value = self.function()
+        except Exception:
+            return []
+        return [(self.name, self.labels, value)]
+
+
+type Metric = Counter | Histogram | CallbackMetric
+
+
+class Registry:
+    """
+    The metrics of the process, grouped in families of the same name with different
+    labels (e.g. voyager_stage_seconds{stage="parse"}).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (type, help, {labels: metric})
+        self._families: dict[str, tuple[str, str, dict[Labels, Metric]]] = {}
+
+    def _get(
+        self,
+        kind: str,
+        name: str,
+        help: str,
+        labels: dict[str, str],
+        create: Callable[[Labels], Metric],
+    ):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = (kind, help, {})
+                self._families[name] = family
+            elif family[0] != kind:
+                raise ValueError(f"Metric {name} is a {family[0]}, not a {kind}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = create(key)
+                family[2][key] = metric
+            return metric
+
+    def counter(self, name: str, help: str, **labels: str) -> Counter:
+        """
+        Returns the counter with the given name and labels, creating it if needed.
+        """
+        metric = self._get(
+            "counter", name, help, labels, lambda key: Counter(name, key)
+        )
+        assert isinstance(metric, Counter)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        **labels: str,
+    ) -> Histogram:
+        """
+        Returns the histogram with the given name and labels, creating it if needed.
+        """
+        metric = self._get(
+            "histogram", name, help, labels, lambda key: Histogram(name, key, buckets)
+        )
+        assert isinstance(metric, Histogram)
+        return metric
+
+    def callback(
+        self,
+        name: str,
+        help: str,
+        function: Callable[[], float],
+        kind: str = "gauge",
+        **labels: str,
+    ):
+        """
+        Registers (or replaces) a metric whose value is read from `function` when
+        the metrics are collected.
+
+        :param kind: "gauge", or "counter" for values that only increase.
+        """
+        key = tuple(sorted(labels.items()))
+        metric = CallbackMetric(name, key, function)
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help, {}))
+            family[2][key] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        Returns all the metrics in the Prometheus text exposition format (0.0.4).
+        """
+        with self._lock:
+            families = [
+                (name, kind, help, list(metrics.values()))
+                for name, (kind, help, metrics) in self._families.items()
+            ]
+        lines: list[str] = []
+        for name, kind, help, metrics in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in metrics:
+                for sample_name, labels, value in metric.samples():
+                    lines.append(
+                        f"{sample_name}{_format_labels(labels)} {_format_value(value)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict[str, object]:
+        """
+        Returns the metrics as a JSON-serializable dictionary: counter and gauge
+        values, and histogram summaries (see Histogram.snapshot).
+        """
+        with self._lock:
+            metrics = [
+                metric
+                for _, _, family in self._families.values()
+                for metric in family.values()
+            ]
+        snapshot: dict[str, object] = {}
+        for metric in metrics:
+            key = metric.name + _format_labels(metric.labels)
+            if isinstance(metric, Histogram):
+                snapshot[key] = metric.snapshot()
+            else:
+                samples = metric.samples()
+                if samples:
+                    snapshot[key] = samples[0][2]
+        return snapshot
+
+
+REGISTRY = Registry()
+
+
+def stage_timer(stage: str) -> Histogram:
+    """
+    Returns the latency histogram of a processing stage (voyager_stage_seconds).
+    """
+    return REGISTRY.histogram(
+        "voyager_stage_seconds", "Time spent in each processing stage.", stage=stage
+    )
+
+
+def counter(name: str, help: str, **labels: str) -> Counter:
+    return REGISTRY.counter(name, help, **labels)
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler that can be switched on and off while the ground station
+    runs. A background thread takes the stacks of all the other threads every
+    `interval` seconds (sys._current_frames) and counts them, so the overhead is
+    bounded by the sampling rate and there is none while it is off. The result is
+    in the collapsed-stack format of flame graph tools.
+    """
+
+    interval: float
+    max_depth: int
+
+    def __init__(
+        self, interval: float = PROFILE_INTERVAL, max_depth: int = PROFILE_MAX_DEPTH
+    ):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._stacks: _StackCounter[str] = _StackCounter()
+        self._samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._started: float | None = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, reset: bool = True):
+        """
+        Starts sampling (does nothing if already running).
+
+        :param reset: Discard the stacks of the previous run.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            if reset:
+                self._stacks.clear()
+                self._samples = 0
+            self._stop.clear()
+            self._started = time.monotonic()
+            self._thread = threading.Thread(
+                target=self._run, name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _stack(self, frame: FrameType | None):
+        names: list[str] = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()  # pyright: ignore[reportPrivateUsage]
+            stacks = [
+                self._stack(frame) for ident, frame in frames.items() if ident != own
+            ]
+            del frames
+            with self._lock:
+                self._stacks.update(stacks)
+                self._samples += 1
+
+    def collapsed(self) -> str:
+        """
+        Returns the sampled stacks as "frame;frame;... count" lines, most frequent
+        first (e.g. for flamegraph.pl or speedscope).
+        """
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None,
+                "samples": self._samples,
+                "stacks": len(self._stacks),
+                "seconds": (
+                    time.monotonic() - self._started
+                    if self._thread is not None and self._started is not None
+                    else 0.0
+                ),
+            }
+
+
+PROFILER = SamplingProfiler()
+if os.getenv(PROFILE_ENV, "") not in ("", "0"):
+    PROFILER.start()
@@ -0,0 +1,594 @@
+import importlib
+import itertools
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Protocol
+import cv2
+import numpy as np
+
+STATS_WINDOW = 200  # inferences kept for the latency statistics
+LIVENESS_INTERVAL = 0.5  # seconds between checks that the worker process is alive
+
+
+@dataclass(slots=True)
+class MLDetection:
+    """
+    An interest point found by an ML detector, in pixel coordinates of the frame.
+    """
+
+    x: float
+    y: float
+    score: float
+
+
+class DetectorBackend(Protocol):
+    """
+    An ML model that finds interest points in a batch of BGR frames.
+    """
+
+    def detect_batch(
+        self, images: list[cv2.typing.MatLike]
+    ) -> list[list[MLDetection]]: ...
+
+    def warm_up(self) -> None: ...
+
+
+class RandomDetector:
+    """
+    Placeholder model: 5 to 10 random points per frame with scores in [0.5, 1].
+    Uses the `random` module, so seeding it makes the output reproducible.
+    """
+
+    def detect_batch(self, images: list[cv2.typing.MatLike]):
+        detections: list[list[MLDetection]] = []
+        for image in images:
+            h, w = image.shape[:2]
+            detections.append(
+                [
+                    MLDetection(
+                        random.randint(0, w - 1),
+                        random.randint(0, h - 1),
+                        random.uniform(0.5, 1.0),
+                    )
+                    for _ in range(random.randint(5, 10))
+                ]
+            )
+        return detections
+
+    def warm_up(self):
+        pass
+
+
+class StubDetector:
+    """
+    Deterministic model for tests: the frame is divided in a grid x grid raster and
+    the `count` brightest cells (above min_score) are returned at their centres, with
+    their mean brightness (0-1) as the score. The same frame always gives the same
+    points, in any process.
+    """
+
+    def __init__(self, grid: int = 16, count: int = 5, min_score: float = 0.0):
+        self.grid = grid
+        self.count = count
+        self.min_score = min_score
+
+    def detect_batch(self, images: list[cv2.typing.MatLike]):
+        detections: list[list[MLDetection]] = []
+        for image in images:
+            h, w = image.shape[:2]
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            cells = cv2.resize(
+                gray, (self.grid, self.grid), interpolation=cv2.INTER_AREA
+            )
+            scores = cells.astype(np.float64).ravel() / 255
+            # Stable sort: ties are broken by cell order
+            best = np.argsort(-scores, kind="stable")[: self.count]
+            detections.append(
+                [
+                    MLDetection(
+                        (cell % self.grid + 0.5) * w / self.grid,
+                        (cell // self.grid + 0.5) * h / self.grid,
+                        float(scores[cell]),
+                    )
+                    for cell in best.tolist()
+                    if scores[cell] >= self.min_score
+                ]
+            )
+        return detections
+
+    def warm_up(self):
+        pass
+
+
+@lru_cache(maxsize=4)
+def _load_net(model_path: str, mtime: float):
+    # Keyed by the modification time, so that a replaced model file is reloaded
+    net = cv2.dnn.readNet(model_path)
+    net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+    net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+    return net
+
+
+def load_net(model_path: str):
+    """
+    Loads an ONNX (or any OpenCV-DNN supported) model for CPU inference. Loaded
+    models are cached, so creating several detectors with the same model is cheap.
+    """
+    return _load_net(os.path.abspath(model_path), os.path.getmtime(model_path))
+
+
+class OnnxDetector:
+    """
+    Runs a YOLO-style object detection model with OpenCV DNN on the CPU.
+
+    The frames of a batch are resized to the model's input size and run in a single
+    forward pass. Outputs are read as "yolov8" ((batch, 4 + classes, anchors), box
+    centre and size followed by class scores) or "yolov5" ((batch, anchors,
+    5 + classes), with an objectness score). After non-maximum suppression, the
+    centre of each box is an interest point.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        input_size: tuple[int, int] = (640, 640),
+        output_format: str = "yolov8",
+        score_threshold: float = 0.5,
+        nms_threshold: float = 0.45,
+        classes: list[int] | None = None,
+    ):
+        """
+        :param model_path: Path of the model file (e.g. an .onnx file).
+        :param input_size: (width, height) of the model input.
+        :param output_format: "yolov8" or "yolov5".
+        :param score_threshold: Minimum score of a detection.
+        :param nms_threshold: IoU above which overlapping boxes are suppressed.
+        :param classes: Class indices to keep (all if None).
+        """
+        if output_format not in ("yolov8", "yolov5"):
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.net = load_net(model_path)
+        self.input_size = input_size
+        self.output_format = output_format
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.classes = classes
+        self._warmed_up = False
+
+    def _decode(self, output: np.ndarray, image_size: tuple[int, int]):
+        if self.output_format == "yolov8":
+            rows = output.T  # (anchors, 4 + classes)
+            class_scores = rows[:, 4:]
+        else:
+            rows = output  # (anchors, 5 + classes)
+            class_scores = rows[:, 5:] * rows[:, 4:5]
+        if self.classes is not None:
+            class_scores = class_scores[:, self.classes]
+        scores = class_scores.max(axis=1)
+        keep = scores >= self.score_threshold
+        boxes, scores = rows[keep, :4], scores[keep]
+        if not len(scores):
+            return []
+
+        sx = image_size[0] / self.input_size[0]
+        sy = image_size[1] / self.input_size[1]
+        cx, cy = boxes[:, 0] * sx, boxes[:, 1] * sy
+        w, h = boxes[:, 2] * sx, boxes[:, 3] * sy
+        rects = np.stack((cx - w / 2, cy - h / 2, w, h), axis=1)
+        indices = cv2.dnn.NMSBoxes(
+            rects.tolist(), scores.tolist(), self.score_threshold, self.nms_threshold
+        )
+        return [
+            MLDetection(float(cx[i]), float(cy[i]), float(scores[i]))
+            for i in np.asarray(indices).reshape(-1).tolist()
+        ]
+
+    def detect_batch(self, images: list[cv2.typing.MatLike]):
+        if not images:
+            return []
+        blob = cv2.dnn.blobFromImages(
+            images, 1 / 255, self.input_size, swapRB=True, crop=False
+        )
+        self.net.setInput(blob)
+        outputs = np.asarray(self.net.forward())
+        return [
+            self._decode(output, (image.shape[1], image.shape[0]))
+            for output, image in zip(outputs, images)
+        ]
+
+    def warm_up(self):
+        """
+        Runs one inference on a blank frame, so that the first real frame does not
+        pay for the lazy initialization of the network.
+        """
+        if not self._warmed_up:
+            w, h = self.input_size
+            _ = self.detect_batch([np.zeros((h, w, 3), dtype=np.uint8)])
+            self._warmed_up = True
+
+
+_BACKENDS: dict[str, Callable[..., DetectorBackend]] = {
+    "random": RandomDetector,
+    "stub": StubDetector,
+    "onnx": OnnxDetector,
+}
+
+
+def register_backend(name: str, factory: Callable[..., DetectorBackend]):
+    """
+    Registers a detector backend plugin under a name for create_backend().
+    """
+    _BACKENDS[name] = factory
+
+
+def create_backend(name: str, **options: object) -> DetectorBackend:
+    """
+    Creates a detector backend: a registered name ("random", "stub", "onnx", ...) or
+    a "package.module:Class" path, which also works in a worker process for backends
+    registered elsewhere.
+    """
+    if name in _BACKENDS:
+        return _BACKENDS[name](**options)
+    if ":" in name:
+        module, attribute = name.split(":", 1)
+        return getattr(importlib.import_module(module), attribute)(**options)
+    raise ValueError(f"Unknown ML detector backend: {name}")
+
+
+class LatencyStats:
+    """
+    Inference counters and latency statistics over the last STATS_WINDOW batches
+    and frames.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inference: deque[float] = deque(maxlen=STATS_WINDOW)
+        self._batch_sizes: deque[int] = deque(maxlen=STATS_WINDOW)
+        self._latency: deque[float] = deque(maxlen=STATS_WINDOW)
+        self.frames = 0
+        self.batches = 0
+
+    def record_batch(self, inference: float, batch_size: int):
+        """
+        :param inference: Seconds spent in the model for the batch.
+        :param batch_size: Frames in the batch.
+        """
+        with self._lock:
+            self.batches += 1
+            self._inference.append(inference)
+            self._batch_sizes.append(batch_size)
+
+    def record_frame(self, latency: float):
+        """
+        :param latency: Seconds from submitting the frame to getting its detections.
+        """
+        with self._lock:
+            self.frames += 1
+            self._latency.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            inference = sorted(self._inference)
+            latency = sorted(self._latency)
+            batch_sizes = list(self._batch_sizes)
+
+        def average(values: list[float] | list[int]):
+            return sum(values) / len(values) if values else 0.0
+
+        def p95(values: list[float]):
+            if not values:
+                return 0.0
+            return values[min(len(values) - 1, int(0.95 * len(values)))]
+
+        return {
+            "frames": self.frames,
+            "batches": self.batches,
+            "batch_size_avg": average(batch_sizes),
+            "inference_avg": average(inference),
+            "inference_p95": p95(inference),
+            "latency_avg": average(latency),
+            "latency_p95": p95(latency),
+        }
+
+
+class MLDetector:
+    """
+    Runs a detector backend in the calling thread.
+    """
+
+    backend: DetectorBackend
+
+    def __init__(self, backend: DetectorBackend | None = None):
+        """
+        :param backend: The model; defaults to the RandomDetector placeholder.
+        """
+        self.backend = backend if backend is not None else RandomDetector()
+        started = time.perf_counter()
+        self.backend.warm_up()
+        self.startup_time = time.perf_counter() - started
+        self.latency = LatencyStats()
+
+    def detect_batch(self, images: list[cv2.typing.MatLike]):
+        started = time.perf_counter()
+        detections = self.backend.detect_batch(images)
+        elapsed = time.perf_counter() - started
+        self.latency.record_batch(elapsed, len(images))
+        for _ in images:
+            self.latency.record_frame(elapsed)
+        return detections
+
+    def detect(
+        self, image: cv2.typing.MatLike, timeout: float | None = None
+    ) -> list[MLDetection]:
+        """
+        :param timeout: Ignored (the model runs in the calling thread); accepted
+                        for compatibility with MLDetectorProcess.detect.
+        """
+        return self.detect_batch([image])[0]
+
+    def stats(self):
+        return {"startup_time": self.startup_time, **self.latency.snapshot()}
+
+    def close(self):
+        pass
+
+
+def _worker_main(
+    backend: str,
+    options: dict[str, object],
+    requests: "multiprocessing.Queue[tuple[int, cv2.typing.MatLike] | None]",
+    responses: "multiprocessing.Queue[tuple[int, object, float, int]]",
+    batch_size: int,
+    max_batch_delay: float,
+):
+    """
+    Worker process: loads and warms up the model, then runs batches of the queued
+    frames: the first waiting frame plus whatever arrives within max_batch_delay,
+    up to batch_size frames.
+    """
+    try:
+        started = time.perf_counter()
+        model = create_backend(backend, **options)
+        model.warm_up()
+        responses.put((-1, None, time.perf_counter() - started, 0))
+    except Exception as e:
+        responses.put((-1, e, 0.0, 0))
+        return
+
+    # Responses are (request ID, detections or exception, inference seconds, batch
+    # size); the first frame of each batch reports the batch size, the others 0.
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        batch = [request]
+        deadline = time.monotonic() + max_batch_delay
+        stop = False
+        while len(batch) < batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    request = requests.get(timeout=remaining)
+                else:
+                    request = requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                stop = True
+                break
+            batch.append(request)
+
+        started = time.perf_counter()
+        try:
+            images = [image for _, image in batch]
+            results: list[object] = list(model.detect_batch(images))
+        except Exception as e:
+            results = [e] * len(batch)
+        inference = time.perf_counter() - started
+        for i, ((request_id, _), result) in enumerate(zip(batch, results)):
+            responses.put((request_id, result, inference, len(batch) if i == 0 else 0))
+        if stop:
+            break
+
+
+class WorkerExitedError(RuntimeError):
+    """
+    The worker process of an MLDetectorProcess exited, or was closed, before it
+    returned the detections of a frame.
+    """
+
+
+class MLDetectorProcess:
+    """
+    Runs a detector backend in a worker process, so that inference never blocks the
+    capture or detection threads (nor holds the GIL).
+
+    Frames submitted while the worker is busy are batched into a single inference
+    call (up to batch_size frames, waiting at most max_batch_delay for more). The
+    model is loaded and warmed up once when the worker starts. Frames can be
+    downscaled before they are sent (max_side) to reduce the transfer cost; the
+    detections are mapped back to the original frame.
+
+    If the worker exits (e.g. it crashed or was killed), the pending and later
+    frames fail with WorkerExitedError instead of waiting forever.
+    """
+
+    def __init__(
+        self,
+        backend: str = "random",
+        options: dict[str, object] | None = None,
+        batch_size: int = 4,
+        max_batch_delay: float = 0.005,
+        max_side: int | None = None,
+        start_timeout: float = 60.0,
+    ):
+        """
+        :param backend: Backend name or "package.module:Class" (see create_backend).
+        :param options: Keyword arguments of the backend (e.g. model_path).
+        :param batch_size: Maximum frames per inference call.
+        :param max_batch_delay: Seconds the worker waits for more frames of a batch.
+        :param max_side: If set, frames are downscaled so that their longest side is
+                         at most this many pixels before they are sent to the worker.
+        :param start_timeout: Seconds to wait for the model to load.
+        """
+        context = multiprocessing.get_context("spawn")
+        self.max_side = max_side
+        self.latency = LatencyStats()
+        self._requests = context.Queue()
+        self._responses = context.Queue()
+        self._pending: dict[int, tuple[Future[list[MLDetection]], float, float]] = {}
+        self._lock = threading.Lock()
+        self._exited: str | None = None  # why frames can no longer be detected
+        self._ids = itertools.count()
+        self._process = context.Process(
+            target=_worker_main,
+            args=(
+                backend,
+                options or {},
+                self._requests,
+                self._responses,
+                batch_size,
+                max_batch_delay,
+            ),
+            daemon=True,
+            name="ml-detector",
+        )
+        started = time.perf_counter()
+        self._process.start()
+        try:
+            _, error, _, _ = self._responses.get(timeout=start_timeout)
+        except queue.Empty:
+            self._process.kill()
+            raise TimeoutError("The ML detector worker did not start in time")
+        if isinstance(error, Exception):
+            self._process.join()
+            raise error
+        self.startup_time = time.perf_counter() - started
+        self._collector = threading.Thread(
+            target=self._collect, name="ml-detector-results", daemon=True
+        )
+        self._collector.start()
+
+    def _collect(self):
+        exited = False
+        while True:
+            try:
+                response = self._responses.get(
+                    timeout=0.0 if exited else LIVENESS_INTERVAL
+                )
+            except queue.Empty:
+                if exited:
+                    code = self._process.exitcode
+                    self._fail_pending(f"The ML detector worker exited (code {code})")
+                    break
+                # Once the worker is gone, collect what it sent before exiting
+                exited = not self._process.is_alive()
+                continue
+            except (EOFError, OSError):
+                self._fail_pending("The ML detector worker's queue was closed")
+                break
+            request_id, result, inference, batch_size = response
+            if request_id < 0:  # close() sentinel
+                break
+            with self._lock:
+                future, scale, submitted = self._pending.pop(request_id)
+            if batch_size:
+                self.latency.record_batch(inference, batch_size)
+            # From here on the future can no longer be cancelled; skip it if the
+            # caller already gave up waiting
+            if not future.set_running_or_notify_cancel():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+                continue
+            detections: list[MLDetection] = result  # pyright: ignore
+            if scale != 1.0:
+                for detection in detections:
+                    detection.x /= scale
+                    detection.y /= scale
+            self.latency.record_frame(time.monotonic() - submitted)
+            future.set_result(detections)
+
+    def _fail_pending(self, reason: str):
+        """
+        Fails the pending frames, and every frame submitted from now on.
+        """
+        with self._lock:
+            self._exited = reason
+            pending, self._pending = self._pending, {}
+        # Nothing reads the queues any more (and a killed worker may have died
+        # holding their locks): exiting must not wait to send what is left
+        self._requests.cancel_join_thread()
+        self._responses.cancel_join_thread()
+        for future, _, _ in pending.values():
+            if future.set_running_or_notify_cancel():
+                future.set_exception(WorkerExitedError(reason))
+
+    def submit(self, image: cv2.typing.MatLike) -> Future[list[MLDetection]]:
+        """
+        Queues a frame for detection and returns a Future of its detections, which
+        fails with WorkerExitedError if the worker exits before answering.
+        """
+        scale = 1.0
+        if self.max_side is not None:
+            h, w = image.shape[:2]
+            if max(h, w) > self.max_side:
+                scale = self.max_side / max(h, w)
+                size = (round(w * scale), round(h * scale))
+                image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        future: Future[list[MLDetection]] = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            if self._exited is not None:
+                future.set_exception(WorkerExitedError(self._exited))
+                return future
+            self._pending[request_id] = (future, scale, time.monotonic())
+        self._requests.put((request_id, image))
+        return future
+
+    def detect(self, image: cv2.typing.MatLike, timeout: float | None = None):
+        """
+        Detects the objects of a frame, waiting at most `timeout` seconds.
+
+        :raises TimeoutError: If the worker did not answer in time (the frame is
+                              then abandoned).
+        :raises WorkerExitedError: If the worker exited.
+        """
+        future = self.submit(image)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            _ = future.cancel()
+            raise
+
+    def detect_batch(
+        self, images: list[cv2.typing.MatLike], timeout: float | None = None
+    ):
+        futures = [self.submit(image) for image in images]
+        return [future.result(timeout) for future in futures]
+
+    def stats(self):
+        return {"startup_time": self.startup_time, **self.latency.snapshot()}
+
+    def close(self, timeout: float = 5.0):
+        """
+        Stops the worker process after the queued frames.
+        """
+        self._requests.put(None)
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.kill()
+        if self._collector.is_alive():
+            self._responses.put((-1, None, 0.0, 0))
+            self._collector.join(timeout)
+        self._fail_pending("The ML detector was closed")
@@ -0,0 +1,124 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict, deque
+from tasks.push_stream import PointState, diff_points, index_points
+from tasks.telemetry_hub import INTEREST_POINTS, TelemetryHub
+
+HISTORY_SIZE = 32  # versions kept for since= deltas
+DELTA_CACHE_SIZE = 16  # serialized deltas kept per version
+GZIP_MIN_SIZE = 512  # bytes; smaller bodies are not worth compressing
+GZIP_LEVEL = 6
+
+
+class CachedBody:
+    """
+    A serialized response body with its ETag. The gzip-compressed body is computed
+    once, on the first request that accepts it, and has an ETag of its own
+    (gzip_etag), since its bytes differ.
+    """
+
+    __slots__ = ("version", "etag", "body", "_gzipped", "_lock")
+
+    def __init__(self, version: int, etag: str, data: object):
+        self.version = version
+        self.etag = etag
+        self.body = json.dumps(data, separators=(",", ":")).encode()
+        self._gzipped: bytes | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def gzip_etag(self):
+        return f"{self.etag}-gzip"
+
+    def gzipped(self):
+        """
+        Returns the gzip-compressed body, or None if the body is too small to be
+        worth compressing.
+        """
+        if len(self.body) < GZIP_MIN_SIZE:
+            return None
+        with self._lock:
+            if self._gzipped is None:
+                self._gzipped = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+            return self._gzipped
+
+
+class PointsCache:
+    """
+    Serializes the interest points published on the hub once per update, for the
+    /points endpoint.
+
+    The version of the points is the sequence number of their hub snapshot, and the
+    ETag is derived from it, so unchanged points are answered with 304 Not Modified
+    without serializing anything. The point states of the last HISTORY_SIZE versions
+    are kept, so that a client that has version N can get only the changes since
+    then (the delta format of push_stream); older versions get the full state.
+    """
+
+    hub: TelemetryHub
+
+    def __init__(self, hub: TelemetryHub):
+        self.hub = hub
+        self._lock = threading.Lock()
+        self._full: CachedBody | None = None
+        self._history: deque[tuple[int, PointState]] = deque(maxlen=HISTORY_SIZE)
+        self._deltas: OrderedDict[int, CachedBody] = OrderedDict()
+        self._counters = {"serialized": 0, "deltas": 0}
+
+    def _refresh(self):
+        """
+        Brings the cache up to date with the hub's latest points; returns the
+        current version. Must be called with the lock held.
+        """
+        snapshot = self.hub.latest(INTEREST_POINTS)
+        version = snapshot.seq if snapshot is not None else 0
+        if self._full is None or self._full.version != version:
+            points: list[dict[str, object]] = (
+                snapshot.value if snapshot is not None else []  # pyright: ignore
+            )
+            self._full = CachedBody(version, f"points-{version}", points)
+            self._history.append((version, index_points(points)))
+            self._deltas.clear()
+            self._counters["serialized"] += 1
+        return version
+
+    def full(self):
+        """
+        Returns the current points as a list, as served by /points.
+        """
+        with self._lock:
+            _ = self._refresh()
+            assert self._full is not None
+            return self._full
+
+    def since(self, since: int):
+        """
+        Returns the changes from version `since` to the current version:
+        {"version", "reset", "upsert", "remove"}. If `since` is too old (or unknown),
+        "reset" is true and "upsert" has all the points.
+        """
+        with self._lock:
+            version = self._refresh()
+            cached = self._deltas.get(since)
+            if cached is not None:
+                self._deltas.move_to_end(since)
+                return cached
+            current = self._history[-1][1]
+            old = next((state for v, state in self._history if v == since), None)
+            if old is None:
+                delta = {"reset": True, "upsert": list(current.values()), "remove": []}
+            else:
+                delta = {"reset": False, **diff_points(old, current)}
+            cached = CachedBody(
+                version, f"points-{version}-since-{since}", {"version": version, **delta}
+            )
+            self._deltas[since] = cached
+            if len(self._deltas) > DELTA_CACHE_SIZE:
+                _ = self._deltas.popitem(last=False)
+            self._counters["deltas"] += 1
+            return cached
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
@@ -0,0 +1,420 @@
+import math
+from functools import lru_cache
+import numpy as np
+from numpy.typing import NDArray
+from tasks.CanSatData import CanSatData
+
+HORIZONTAL_FOV = 150  # degrees (adjust as needed)
+METERS_PER_DEGREE = 111111  # approximate length of one degree of latitude
+PROJECTION_CACHE_SIZE = 32  # (pose, resolution) projections kept
+RAY_TABLE_CACHE_SIZE = 2  # ray tables kept (width × height × 2 float64 each)
+
+
+def rotation_matrix(pitch: float, roll: float, yaw: float) -> NDArray[np.float64]:
+    """
+    Builds the camera-to-world rotation matrix R = Rz(yaw) · Ry(pitch) · Rx(roll).
+
+    :param pitch: Pitch in degrees.
+    :param roll: Roll in degrees.
+    :param yaw: Yaw in degrees.
+    :return: A 3x3 rotation matrix.
+    """
+    pitch = math.radians(pitch)
+    roll = math.radians(roll)
+    yaw = math.radians(yaw)
+
+    Rx = np.array(
+        [
+            [1.0, 0.0, 0.0],
+            [0.0, math.cos(roll), -math.sin(roll)],
+            [0.0, math.sin(roll), math.cos(roll)],
+        ]
+    )
+    Ry = np.array(
+        [
+            [math.cos(pitch), 0.0, math.sin(pitch)],
+            [0.0, 1.0, 0.0],
+            [-math.sin(pitch), 0.0, math.cos(pitch)],
+        ]
+    )
+    Rz = np.array(
+        [
+            [math.cos(yaw), -math.sin(yaw), 0.0],
+            [math.sin(yaw), math.cos(yaw), 0.0],
+            [0.0, 0.0, 1.0],
+        ]
+    )
+    return Rz @ Ry @ Rx
+
+
+def rotation_matrices(
+    pitch: NDArray[np.float64], roll: NDArray[np.float64], yaw: NDArray[np.float64]
+) -> NDArray[np.float64]:
+    """
+    Vectorized rotation_matrix: builds the rotation matrices of N poses at once.
+
+    :param pitch: N pitches in degrees.
+    :param roll: N rolls in degrees.
+    :param yaw: N yaws in degrees.
+    :return: An N×3×3 array of rotation matrices.
+    """
+    pitch = np.radians(np.asarray(pitch, dtype=np.float64))
+    roll = np.radians(np.asarray(roll, dtype=np.float64))
+    yaw = np.radians(np.asarray(yaw, dtype=np.float64))
+    n = len(pitch)
+    Rx = np.zeros((n, 3, 3))
+    Rx[:, 0, 0] = 1.0
+    Rx[:, 1, 1] = Rx[:, 2, 2] = np.cos(roll)
+    Rx[:, 1, 2] = -np.sin(roll)
+    Rx[:, 2, 1] = np.sin(roll)
+    Ry = np.zeros((n, 3, 3))
+    Ry[:, 1, 1] = 1.0
+    Ry[:, 0, 0] = Ry[:, 2, 2] = np.cos(pitch)
+    Ry[:, 0, 2] = np.sin(pitch)
+    Ry[:, 2, 0] = -np.sin(pitch)
+    Rz = np.zeros((n, 3, 3))
+    Rz[:, 2, 2] = 1.0
+    Rz[:, 0, 0] = Rz[:, 1, 1] = np.cos(yaw)
+    Rz[:, 0, 1] = -np.sin(yaw)
+    Rz[:, 1, 0] = np.sin(yaw)
+    return Rz @ Ry @ Rx
+
+
+def focal_length(width: int, horizontal_fov: float = HORIZONTAL_FOV):
+    """
+    Returns the focal length in pixels of a camera `width` pixels wide.
+    """
+    return (width / 2) / math.tan(math.radians(horizontal_fov / 2))
+
+
+class CameraProjection:
+    """
+    Camera intrinsics and orientation for one (pose, resolution) pair, using a
+    simplified pinhole camera model with a fixed horizontal field of view.
+    Projects pixels to directions in the world frame.
+    """
+
+    width: int
+    height: int
+    cx: float
+    cy: float
+    focal: float
+    rotation: NDArray[np.float64]
+
+    def __init__(
+        self,
+        pitch: float,
+        roll: float,
+        yaw: float,
+        image_resolution: tuple[int, int],
+        horizontal_fov: float = HORIZONTAL_FOV,
+    ):
+        """
+        :param pitch: Pitch in degrees.
+        :param roll: Roll in degrees.
+        :param yaw: Yaw in degrees.
+        :param image_resolution: A tuple (width, height) of the image in pixels.
+        :param horizontal_fov: Horizontal field of view of the camera in degrees.
+        """
+        self.width, self.height = image_resolution
+        self.cx, self.cy = self.width / 2, self.height / 2
+        self.focal = focal_length(self.width, horizontal_fov)
+        self.rotation = rotation_matrix(pitch, roll, yaw)
+        self.rotation.flags.writeable = False
+
+    def world_directions(self, image_points: NDArray[np.float64]) -> NDArray[np.float64]:
+        """
+        Converts pixel coordinates to unit view directions in the world frame.
+
+        :param image_points: An N×2 array of (x, y) pixel coordinates.
+        :return: An N×3 array of world-frame directions.
+        """
+        dx = image_points[:, 0] - self.cx
+        dy = image_points[:, 1] - self.cy
+        dz = np.full_like(dx, self.focal)
+        norm = np.sqrt(dx**2 + dy**2 + dz**2)
+        dir_cam = np.stack((dx / norm, dy / norm, dz / norm), axis=1)
+        return dir_cam @ self.rotation.T
+
+    def ray_table(self) -> NDArray[np.float64]:
+        """
+        Computes the ground offset of every pixel's view ray per metre of altitude:
+        a height × width × 2 array of (north, east) metres, so that the offset of
+        pixel (x, y) at altitude h is table[y, x] * h. Rays parallel to the ground
+        have a zero offset, as in directions_to_offsets.
+
+        The world ray of pixel (x, y) is R · (x - cx, y - cy, focal); its ground
+        offset does not depend on the ray's length, so the rays need no
+        normalization and each world component is the sum of a per-column and a
+        per-row term.
+        """
+        xs = np.arange(self.width, dtype=np.float64) - self.cx
+        ys = np.arange(self.height, dtype=np.float64) - self.cy
+        r = self.rotation
+        world = [
+            (r[i, 1] * ys + r[i, 2] * self.focal)[:, None] + (r[i, 0] * xs)[None, :]
+            for i in range(3)
+        ]
+        dz = world[2]
+        parallel = dz == 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = np.where(parallel, 0.0, -1.0 / np.where(parallel, 1.0, dz))
+        table = np.empty((self.height, self.width, 2))
+        table[:, :, 0] = world[0] * scale
+        table[:, :, 1] = world[1] * scale
+        table.flags.writeable = False
+        return table
+
+
+@lru_cache(maxsize=PROJECTION_CACHE_SIZE)
+def get_projection(
+    pitch: float,
+    roll: float,
+    yaw: float,
+    image_resolution: tuple[int, int],
+    horizontal_fov: float = HORIZONTAL_FOV,
+) -> CameraProjection:
+    """
+    Returns the CameraProjection for the given pose and resolution. Consecutive frames
+    between two telemetry packets share the same pose, so the projection is cached
+    (least recently used poses are evicted; see get_projection.cache_info()).
+    """
+    return CameraProjection(pitch, roll, yaw, image_resolution, horizontal_fov)
+
+
+@lru_cache(maxsize=RAY_TABLE_CACHE_SIZE)
+def get_ray_table(
+    pitch: float,
+    roll: float,
+    yaw: float,
+    image_resolution: tuple[int, int],
+    horizontal_fov: float = HORIZONTAL_FOV,
+) -> NDArray[np.float64]:
+    """
+    Returns the per-pixel ray table (see CameraProjection.ray_table) for the given
+    pose and resolution. Tables are large, so fewer of them are cached than
+    projections.
+    """
+    projection = get_projection(pitch, roll, yaw, image_resolution, horizontal_fov)
+    return projection.ray_table()
+
+
+def directions_to_offsets(
+    altitude: float | NDArray[np.float64], world_dir: NDArray[np.float64]
+) -> NDArray[np.float64]:
+    """
+    Intersects world-frame view directions from a camera at `altitude` metres with
+    the ground plane. Directions parallel to the ground have a zero offset.
+
+    :param altitude: The camera's altitude, or an array with the altitude of the
+                     camera of each direction.
+
+    :return: An N×2 array of (north, east) ground offsets in metres.
+    """
+    dz = world_dir[:, 2]
+    parallel = dz == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(parallel, 0.0, -altitude / np.where(parallel, 1.0, dz))
+    return world_dir[:, :2] * t[:, None]
+
+
+def directions_to_world(
+    cansat_data: CanSatData, world_dir: NDArray[np.float64]
+) -> NDArray[np.float64]:
+    """
+    Intersects world-frame view directions from the CanSat with the ground plane and
+    converts the ground offsets to GPS coordinates. Directions parallel to the ground
+    map to the CanSat's own position.
+
+    :param cansat_data: A CanSatData object (with altitude, latitude, longitude).
+    :param world_dir: An N×3 array of world-frame directions.
+    :return: An N×2 array of (lat, lng) coordinates.
+    """
+    offsets = directions_to_offsets(cansat_data.altitude, world_dir)
+    return offsets_to_world(cansat_data, offsets[:, 0], offsets[:, 1])
+
+
+def offsets_to_world(
+    cansat_data: CanSatData, dx_m: NDArray[np.float64], dy_m: NDArray[np.float64]
+) -> NDArray[np.float64]:
+    """
+    Converts ground offsets in metres from the CanSat (north, east) to GPS
+    coordinates.
+
+    :return: An N×2 array of (lat, lng) coordinates.
+    """
+    return _offsets_to_lat_lng(cansat_data.latitude, cansat_data.longitude, dx_m, dy_m)
+
+
+def _offsets_to_lat_lng(
+    latitude: float | NDArray[np.float64],
+    longitude: float | NDArray[np.float64],
+    dx_m: NDArray[np.float64],
+    dy_m: NDArray[np.float64],
+) -> NDArray[np.float64]:
+    # Offsets from one position, or from the position of each offset
+    world = np.empty((len(dx_m), 2))
+    world[:, 0] = latitude + dx_m / METERS_PER_DEGREE
+    lng_scale = METERS_PER_DEGREE * np.cos(np.radians(latitude))
+    world[:, 1] = longitude + dy_m / lng_scale
+    return world
+
+
+def image_points_to_world(
+    cansat_data: CanSatData,
+    image_points: NDArray[np.float64] | list[tuple[float, float]],
+    image_resolution: tuple[int, int],
+    use_ray_table: bool = False,
+    horizontal_fov: float = HORIZONTAL_FOV,
+) -> NDArray[np.float64]:
+    """
+    Converts a batch of pixels from an image to estimated world (GPS) coordinates.
+    The camera intrinsics and rotation are computed once for the whole batch.
+
+    :param cansat_data: A CanSatData object (with altitude, latitude, longitude, pitch, roll, yaw).
+    :param image_points: An N×2 array (or list of (x, y) tuples) of pixel coordinates.
+    :param image_resolution: A tuple (width, height) of the image in pixels.
+    :param use_ray_table: Look the pixels up in the pose's ray table (see
+                          get_ray_table) instead of projecting them analytically.
+                          Pixels are rounded to the nearest pixel centre; pixels
+                          outside the image are projected analytically.
+    :param horizontal_fov: Horizontal field of view of the camera in degrees.
+    :return: An N×2 array of (lat, lng) coordinates.
+    """
+    points = np.asarray(image_points, dtype=np.float64).reshape(-1, 2)
+    pose = (cansat_data.pitch, cansat_data.roll, cansat_data.yaw)
+    resolution = (int(image_resolution[0]), int(image_resolution[1]))
+    if not use_ray_table:
+        projection = get_projection(*pose, resolution, horizontal_fov)
+        return directions_to_world(cansat_data, projection.world_directions(points))
+
+    table = get_ray_table(*pose, resolution, horizontal_fov)
+    pixels = np.rint(points).astype(np.intp)
+    inside = (
+        (pixels[:, 0] >= 0)
+        & (pixels[:, 0] < resolution[0])
+        & (pixels[:, 1] >= 0)
+        & (pixels[:, 1] < resolution[1])
+    )
+    offsets = np.empty((len(points), 2))
+    offsets[inside] = table[pixels[inside, 1], pixels[inside, 0]]
+    offsets *= cansat_data.altitude
+    if not inside.all():
+        outside = ~inside
+        projection = get_projection(*pose, resolution, horizontal_fov)
+        directions = projection.world_directions(points[outside])
+        offsets[outside] = directions_to_offsets(cansat_data.altitude, directions)
+    return offsets_to_world(cansat_data, offsets[:, 0], offsets[:, 1])
+
+
+def records_points_to_world(
+    records: NDArray[np.void],
+    record_index: NDArray[np.intp],
+    image_points: NDArray[np.float64],
+    image_resolution: tuple[int, int],
+    horizontal_fov: float = HORIZONTAL_FOV,
+) -> NDArray[np.float64]:
+    """
+    Converts pixels taken at many different poses to world (GPS) coordinates in one
+    batch, e.g. the hotspots of hundreds of replayed thermal frames. Gives the same
+    results as image_points_to_world for each pixel and its pose, but the rotation
+    matrices of all poses are built and applied at once instead of one pose at a
+    time.
+
+    :param records: Telemetry records with altitude, latitude, longitude, pitch,
+                    roll and yaw fields (e.g. TelemetryBatch.records).
+    :param record_index: The index in `records` of the pose of each pixel.
+    :param image_points: An N×2 array of (x, y) pixel coordinates.
+    :param image_resolution: A tuple (width, height) of the image in pixels.
+    :param horizontal_fov: Horizontal field of view of the camera in degrees.
+    :return: An N×2 array of (lat, lng) coordinates.
+    """
+    points = np.asarray(image_points, dtype=np.float64).reshape(-1, 2)
+    index = np.asarray(record_index, dtype=np.intp)
+    if len(points) == 0:
+        return np.empty((0, 2))
+    # Only the poses that are used
+    used, inverse = np.unique(index, return_inverse=True)
+    poses = records[used]
+    rotations = rotation_matrices(poses["pitch"], poses["roll"], poses["yaw"])
+
+    width, height = image_resolution
+    dir_cam = np.empty((len(points), 3))
+    dir_cam[:, 0] = points[:, 0] - width / 2
+    dir_cam[:, 1] = points[:, 1] - height / 2
+    dir_cam[:, 2] = focal_length(width, horizontal_fov)
+    dir_cam /= np.linalg.norm(dir_cam, axis=1)[:, None]
+    world_dir = np.einsum("nij,nj->ni", rotations[inverse], dir_cam)
+
+    offsets = directions_to_offsets(poses["altitude"][inverse], world_dir)
+    return _offsets_to_lat_lng(
+        poses["latitude"][inverse],
+        poses["longitude"][inverse],
+        offsets[:, 0],
+        offsets[:, 1],
+    )
+
+
+def ray_table_error(
+    cansat_data: CanSatData, image_resolution: tuple[int, int], step: int = 1
+) -> float:
+    """
+    Checks the ray table of a pose against the analytical projection over the pixel
+    centres (every `step`-th pixel in each direction). Returns the largest distance
+    between the two results relative to the point's distance from the CanSat (at
+    least 1 m), since rays close to the horizon reach the ground very far away.
+    """
+    width, height = image_resolution
+    xs, ys = np.meshgrid(np.arange(0, width, step), np.arange(0, height, step))
+    pixels = np.stack((xs.ravel(), ys.ravel()), axis=1).astype(np.float64)
+    exact = image_points_to_world(cansat_data, pixels, image_resolution)
+    table = image_points_to_world(
+        cansat_data, pixels, image_resolution, use_ray_table=True
+    )
+    lng_scale = METERS_PER_DEGREE * math.cos(math.radians(cansat_data.latitude))
+    error = np.hypot(
+        (table[:, 0] - exact[:, 0]) * METERS_PER_DEGREE,
+        (table[:, 1] - exact[:, 1]) * lng_scale,
+    )
+    distance = np.hypot(
+        (exact[:, 0] - cansat_data.latitude) * METERS_PER_DEGREE,
+        (exact[:, 1] - cansat_data.longitude) * lng_scale,
+    )
+    return float((error / np.maximum(distance, 1.0)).max(initial=0.0))
+
+
+def world_to_image_points(
+    cansat_data: CanSatData,
+    world_points: NDArray[np.float64] | list[tuple[float, float]],
+    image_resolution: tuple[int, int],
+) -> NDArray[np.float64]:
+    """
+    Inverse of image_points_to_world: projects GPS coordinates on the ground into
+    the image, e.g. to know where the CanSat hotspots should appear in a frame.
+
+    :param cansat_data: A CanSatData object (with altitude, latitude, longitude, pitch, roll, yaw).
+    :param world_points: An N×2 array (or list of (lat, lng) tuples) of coordinates.
+    :param image_resolution: A tuple (width, height) of the image in pixels.
+    :return: An N×2 array of (x, y) pixel coordinates; NaN for points that cannot be
+             seen by the camera. Points outside the frame are not clipped.
+    """
+    world = np.asarray(world_points, dtype=np.float64).reshape(-1, 2)
+    projection = get_projection(
+        cansat_data.pitch, cansat_data.roll, cansat_data.yaw, tuple(image_resolution)
+    )
+    dx_m = (world[:, 0] - cansat_data.latitude) * METERS_PER_DEGREE
+    dy_m = (world[:, 1] - cansat_data.longitude) * (
+        METERS_PER_DEGREE * math.cos(math.radians(cansat_data.latitude))
+    )
+    # Any direction along ±(dx, dy, -altitude) reaches the point in directions_to_world;
+    # take the one in front of the camera.
+    world_dir = np.stack((dx_m, dy_m, np.full_like(dx_m, -cansat_data.altitude)), axis=1)
+    dir_cam = world_dir @ projection.rotation
+    dir_cam *= np.where(dir_cam[:, 2] < 0, -1.0, 1.0)[:, None]
+
+    pixels = np.full((len(world), 2), np.nan)
+    visible = dir_cam[:, 2] > 0
+    z = dir_cam[visible, 2]
+    pixels[visible, 0] = projection.cx + projection.focal * dir_cam[visible, 0] / z
+    pixels[visible, 1] = projection.cy + projection.focal * dir_cam[visible, 1] / z
+    return pixels
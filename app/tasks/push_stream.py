@@ -0,0 +1,138 @@
+import json
+from collections.abc import Iterator
+from dataclasses import asdict, is_dataclass
+from tasks.telemetry_hub import INTEREST_POINTS, TELEMETRY, Snapshot, TelemetryHub
+
+KEEPALIVE_INTERVAL = 15.0  # seconds without updates before a keep-alive comment
+STREAM_QUEUE_SIZE = 16  # snapshots buffered per client before the oldest are dropped
+
+type PointState = dict[str, dict[str, object]]
+
+
+def point_id(point: dict[str, object]):
+    """
+    Identifies an interest point by its track ID (see HotspotTracker) or, for
+    untracked points, by its position.
+    """
+    if "id" in point:
+        return f"track-{point['id']}"
+    return f"{point['lat']:.6f},{point['lng']:.6f}"
+
+
+def index_points(points: list[dict[str, object]]) -> PointState:
+    """
+    Returns the points keyed by point_id, each with its "id" and its "rank" (its index
+    in the ranked list).
+    """
+    state: PointState = {}
+    for rank, point in enumerate(points):
+        key = point_id(point)
+        if key in state:  # same position twice: keep both
+            key = f"{key}#{rank}"
+        state[key] = {**point, "id": key, "rank": rank}
+    return state
+
+
+def diff_points(old: PointState, new: PointState):
+    """
+    Returns the delta between two point states: the points that are new or changed
+    (including their rank) and the IDs of the points that are gone.
+    """
+    return {
+        "upsert": [point for key, point in new.items() if old.get(key) != point],
+        "remove": [key for key in old if key not in new],
+    }
+
+
+def telemetry_fields(value: object) -> dict[str, object]:
+    if is_dataclass(value) and not isinstance(value, type):
+        return asdict(value)
+    return dict(value)  # pyright: ignore[reportCallIssue, reportArgumentType]
+
+
+def diff_telemetry(old: dict[str, object], new: dict[str, object]):
+    """
+    Returns the telemetry fields whose value changed.
+    """
+    return {name: value for name, value in new.items() if old.get(name) != value}
+
+
+def format_event(event: str, data: object, event_id: int | None = None):
+    """
+    Formats a Server-Sent Events message.
+    """
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class ClientState:
+    """
+    What a stream client was last sent, to compute the next delta from.
+    """
+
+    def __init__(self):
+        self.points: PointState | None = None
+        self.telemetry: dict[str, object] | None = None
+        self.seq = {INTEREST_POINTS: 0, TELEMETRY: 0}
+
+    def delta(self, snapshot: Snapshot) -> dict[str, object] | None:
+        """
+        Returns the delta for a snapshot, or None if there is nothing to send
+        (nothing changed, or the snapshot is not newer than what was sent).
+        """
+        if snapshot.seq <= self.seq.get(snapshot.topic, snapshot.seq):
+            return None
+        self.seq[snapshot.topic] = snapshot.seq
+
+        if snapshot.topic == INTEREST_POINTS:
+            points = index_points(snapshot.value)  # pyright: ignore[reportArgumentType]
+            old, self.points = self.points, points
+            if old is None:
+                return {"reset": True, "upsert": list(points.values()), "remove": []}
+            delta = diff_points(old, points)
+            return delta if delta["upsert"] or delta["remove"] else None
+
+        telemetry = telemetry_fields(snapshot.value)
+        old, self.telemetry = self.telemetry, telemetry
+        if old is None:
+            return {"reset": True, "changed": telemetry}
+        changed = diff_telemetry(old, telemetry)
+        return {"changed": changed} if changed else None
+
+
+def event_stream(
+    hub: TelemetryHub, keepalive: float = KEEPALIVE_INTERVAL
+) -> Iterator[str]:
+    """
+    Streams interest-point and telemetry updates from the hub as Server-Sent Events,
+    as soon as they are published.
+
+    The first message of each kind carries the full state ("reset": true); after that
+    only deltas are sent: for "interest_points" the new or changed points (with their
+    rank) and the IDs of the removed ones, for "telemetry" the changed fields. Deltas
+    are computed against what this client was last sent, so snapshots dropped for a
+    slow client never leave it with an inconsistent state.
+    """
+    # Subscribe before reading the latest snapshots, so that no update can be
+    # published in between and missed.
+    subscription = hub.subscribe((INTEREST_POINTS, TELEMETRY), STREAM_QUEUE_SIZE)
+    state = ClientState()
+    try:
+        yield "retry: 2000\n\n"
+        pending = [hub.latest(INTEREST_POINTS), hub.latest(TELEMETRY)]
+        while True:
+            for snapshot in pending:
+                if snapshot is None:
+                    continue
+                delta = state.delta(snapshot)
+                if delta is not None:
+                    yield format_event(snapshot.topic, delta, snapshot.seq)
+
+            snapshot = subscription.get(timeout=keepalive)
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+            pending = [snapshot]
+    finally:
+        subscription.close()
@@ -0,0 +1,209 @@
+import heapq
+import itertools
+import json
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from tasks.detection import DetectionMethod, DetectionPoint, RatedDetectionPoint
+
+UNRATED = 100  # rank of method combinations without a rule
+
+CV = DetectionMethod.COMPUTER_VISION
+ML = DetectionMethod.MACHINE_LEARNING
+CH = DetectionMethod.CANSAT_HOTSPOTS
+
+# Lower rank = higher priority
+DEFAULT_RANKS: dict[DetectionMethod, int] = {
+    CV | ML | CH: 1,
+    ML | CH: 2,
+    CV | CH: 3,
+    CV | ML: 4,
+    ML: 5,
+    CV: 6,
+    CH: 7,
+}
+
+# Every DetectionMethod bitmask is an index in the lookup tables
+_TABLE_SIZE = 1 << len(DetectionMethod)
+
+
+_ABBREVIATIONS = {"CV": CV.name, "ML": ML.name, "CH": CH.name}
+
+
+def parse_methods(text: str) -> DetectionMethod:
+    """
+    Parses a method combination written as names joined by "|" or "+", e.g.
+    "COMPUTER_VISION|CANSAT_HOTSPOTS" or "CV+CH".
+    """
+    methods = DetectionMethod(0)
+    for name in text.replace("+", "|").split("|"):
+        name = name.strip().upper()
+        name = _ABBREVIATIONS.get(name, name)
+        try:
+            methods |= DetectionMethod[name]
+        except KeyError:
+            raise ValueError(f"Unknown detection method: {name}") from None
+    return methods
+
+
+@dataclass(slots=True)
+class RankingRules:
+    """
+    How merged points are ranked: by the rank of their exact method combination
+    (ascending), then by their weighted score (descending). The weighted score is
+    the point's score times the sum of the weights of its methods.
+
+    With the defaults, points are ranked by the table of DEFAULT_RANKS and then by
+    score; giving every combination the same rank ranks them by weighted score only.
+    """
+
+    ranks: dict[DetectionMethod, int] = field(
+        default_factory=lambda: dict(DEFAULT_RANKS)
+    )
+    weights: dict[DetectionMethod, float] = field(default_factory=dict)  # default 1
+    fallback_rank: int = UNRATED
+
+    @classmethod
+    def from_dict(cls, data: dict[str, object]):
+        """
+        Creates the rules from a dictionary like
+        {"ranks": {"ML|CH": 2, ...}, "weights": {"MACHINE_LEARNING": 1.5},
+        "fallback_rank": 100}. Method names may be abbreviated as CV, ML and CH.
+        Missing sections keep their defaults.
+        """
+        rules = cls()
+        ranks: dict[str, int] | None = data.get("ranks")  # pyright: ignore
+        if ranks is not None:
+            rules.ranks = {
+                parse_methods(key): int(value) for key, value in ranks.items()
+            }
+        weights: dict[str, float] | None = data.get("weights")  # pyright: ignore
+        if weights is not None:
+            rules.weights = {
+                parse_methods(key): float(value) for key, value in weights.items()
+            }
+        fallback = data.get("fallback_rank")
+        if isinstance(fallback, int):
+            rules.fallback_rank = fallback
+        return rules
+
+    @classmethod
+    def load(cls, filename: str):
+        """
+        Loads the rules from a JSON file (see from_dict).
+        """
+        with open(filename, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+class RankingEngine:
+    """
+    Rates merged detection points and selects the best ones.
+
+    The rank and weight of every possible DetectionMethod bitmask are computed once
+    from the rules into lookup tables, so rating a point is two list lookups. The
+    best `limit` points are selected with a bounded heap instead of sorting all
+    points.
+    """
+
+    rules: RankingRules
+
+    def __init__(self, rules: RankingRules | None = None):
+        self.rules = rules if rules is not None else RankingRules()
+        self._ranks = [self.rules.fallback_rank] * _TABLE_SIZE
+        self._weights = [1.0] * _TABLE_SIZE
+        for methods, rank in self.rules.ranks.items():
+            self._ranks[methods.value] = rank
+        for value in range(1, _TABLE_SIZE):
+            methods = DetectionMethod(value)
+            weight = sum(self.rules.weights.get(method, 1.0) for method in methods)
+            self._weights[value] = weight
+
+    def rank(self, methods: DetectionMethod):
+        """
+        Returns the rank of a method combination (lower = higher priority).
+        """
+        return self._ranks[methods.value]
+
+    def weighted_score(self, point: DetectionPoint | RatedDetectionPoint):
+        return point.score * self._weights[point.methods.value]
+
+    def sort_key(self, point: RatedDetectionPoint):
+        return (point.rating, -self.weighted_score(point))
+
+    def rate(self, points: Iterable[DetectionPoint]):
+        """
+        Returns the points as RatedDetectionPoint objects.
+        """
+        ranks = self._ranks
+        return [
+            RatedDetectionPoint(point, ranks[point.methods.value]) for point in points
+        ]
+
+    def top(self, points: Iterable[DetectionPoint], limit: int):
+        """
+        Rates the points and returns the best `limit` of them, best first. Ties keep
+        the input order, as with a stable sort.
+        """
+        if limit <= 0:
+            return []
+        return heapq.nsmallest(limit, self.rate(points), key=self.sort_key)
+
+    def selection(self, limit: int):
+        """
+        Returns an empty TopKSelection that ranks with these rules.
+        """
+        return TopKSelection(self, limit)
+
+
+class TopKSelection:
+    """
+    Keeps the best `limit` points of a stream of points, for points that arrive
+    incrementally (e.g. per detection method or per frame). Each add() costs
+    O(log limit) per point; the selection can be read at any time.
+    """
+
+    engine: RankingEngine
+    limit: int
+
+    def __init__(self, engine: RankingEngine, limit: int):
+        self.engine = engine
+        self.limit = limit
+        # Heap of (-rank, weighted score, -sequence, point): the root is the worst
+        # kept point, which is the one a better point replaces.
+        self._heap: list[tuple[int, float, int, RatedDetectionPoint]] = []
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, points: Iterable[DetectionPoint | RatedDetectionPoint]):
+        """
+        Adds points (rated by the engine unless already rated).
+        """
+        if self.limit <= 0:
+            return
+        engine = self.engine
+        heap = self._heap
+        for point in points:
+            if not isinstance(point, RatedDetectionPoint):
+                point = RatedDetectionPoint(point, engine.rank(point.methods))
+            entry = (
+                -point.rating,
+                engine.weighted_score(point),
+                -next(self._sequence),
+                point,
+            )
+            if len(heap) < self.limit:
+                heapq.heappush(heap, entry)
+            elif entry[:3] > heap[0][:3]:
+                _ = heapq.heapreplace(heap, entry)
+
+    def results(self):
+        """
+        Returns the kept points, best first.
+        """
+        entries = sorted(self._heap, key=lambda entry: entry[:3], reverse=True)
+        return [entry[3] for entry in entries]
+
+    def reset(self):
+        self._heap.clear()
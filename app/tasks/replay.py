@@ -0,0 +1,404 @@
+"""
+Replays a recorded flight through the ground station.
+
+A recorded telemetry log (the CSV written by ESP32Task, or a raw serial capture with
+`#...#` frames) and a directory of timestamped VTX frames are merged into a single
+timeline and fed through ESP32Task and VTXProcessor, at real time, N× speed or as
+fast as possible:
+
+    python -m tasks.replay esp32_data.csv ../assets --pattern "processed_*.png" --speed 4
+    python -m tasks.replay capture.bin ../assets --fast --pipeline
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import random
+import re
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+import cv2
+import numpy as np
+from tasks.CanSatData import CanSatData
+from tasks.ranking import RankingRules
+from tasks.task1_vtx import VTXProcessor
+from tasks.task2_esp32 import ESP32Task
+from tasks.telemetry_parser import parse_file
+from tasks.vtx_pipeline import FrameResult, VTXPipeline
+
+FRAME_INDEX = "frames.csv"  # optional "filename,timestamp" index in a frame directory
+FRAME_RATE = 30.0  # fps assumed for numbered frame files (e.g. processed_2709.png)
+TELEMETRY_INTERVAL = 1.0  # seconds between packets without a timestamp field
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp")
+
+_NUMBER_RE = re.compile(r"(\d+)(?!.*\d)")  # the last number in a file name
+
+
+@dataclass(slots=True)
+class ReplayFrame:
+    """
+    A recorded VTX frame. The image is decoded when the frame is replayed.
+    """
+
+    path: Path
+    timestamp: float
+
+
+class ReplayClock:
+    """
+    Deterministic clock for replays: it shows the recorded time of the event being
+    replayed, whatever the replay speed, so the same recording always produces the
+    same timestamps.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+
+    def set(self, timestamp: float):
+        self._now = timestamp
+
+    def now(self):
+        return self._now
+
+
+def load_telemetry(filename: str | Path, interval: float = TELEMETRY_INTERVAL):
+    """
+    Loads a recorded telemetry log: the CSV written by ESP32Task, or a raw serial
+    capture. Packets without a timestamp (a capture of frames without the timestamp
+    field) are spaced `interval` seconds apart after the previous packet.
+
+    :return: The packets, sorted by timestamp.
+    """
+    path = Path(filename)
+    packets: list[CanSatData] = []
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            _ = next(reader, None)  # header
+            for row in reader:
+                packet = CanSatData.parse_from_csv_row(row)
+                if packet is not None:
+                    packets.append(packet)
+    else:
+        batch = parse_file(str(path))
+        packets = [batch.packet(i) for i in range(len(batch))]
+
+    previous = None
+    for packet in packets:
+        if packet.timestamp == 0 and previous is not None:
+            packet.timestamp = previous + interval
+        previous = packet.timestamp
+    packets.sort(key=lambda packet: packet.timestamp)
+    return packets
+
+
+def load_frames(
+    directory: str | Path,
+    start: float = 0.0,
+    frame_rate: float = FRAME_RATE,
+    pattern: str = "*",
+):
+    """
+    Lists the frames of a recorded flight with their timestamps.
+
+    The timestamps come from a FRAME_INDEX file ("filename,timestamp" rows) in the
+    directory if there is one. Rows starting with "#" are comments, and a first row
+    whose timestamp is not a number (e.g. a "filename,timestamp" header) is skipped.
+    Otherwise the frames are placed at frame_rate fps from
+    `start`: if the files are a numbered sequence (e.g. processed_2709.png, ...), the
+    number is taken as the frame number, so gaps in the numbering are kept; otherwise
+    the frames are one frame apart in name order.
+
+    :param pattern: Glob pattern of the frame files (e.g. "processed_*.png").
+    :return: The frames, sorted by timestamp.
+    """
+    directory = Path(directory)
+    index_file = directory / FRAME_INDEX
+    if index_file.exists():
+        frames: list[ReplayFrame] = []
+        first = True
+        with open(index_file, newline="") as f:
+            for row in csv.reader(f):
+                if len(row) < 2 or row[0].startswith("#"):
+                    continue
+                try:
+                    timestamp = float(row[1])
+                except ValueError:
+                    if not first:
+                        raise
+                    continue  # the header
+                finally:
+                    first = False
+                frames.append(ReplayFrame(directory / row[0], timestamp))
+        return sorted(frames, key=lambda frame: frame.timestamp)
+
+    paths = sorted(
+        path
+        for path in directory.glob(pattern)
+        if path.suffix.lower() in IMAGE_SUFFIXES
+    )
+    matches = [_NUMBER_RE.search(path.stem) for path in paths]
+    # A numbered sequence: every name has a number and the same text around it
+    names = {
+        _NUMBER_RE.sub("", path.stem) if match else None
+        for path, match in zip(paths, matches)
+    }
+    if len(names) == 1 and None not in names:
+        numbers = [int(match.group(1)) for match in matches if match]
+    else:
+        numbers = list(range(len(paths)))
+    first = min(numbers, default=0)
+    frames = [
+        ReplayFrame(path, start + (number - first) / frame_rate)
+        for path, number in zip(paths, numbers)
+    ]
+    return sorted(frames, key=lambda frame: frame.timestamp)
+
+
+def read_frame_image(path: Path):
+    # cv2.imread does not handle non-ASCII paths on every platform
+    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+class FlightReplay:
+    """
+    Drives ESP32Task and VTXProcessor from a recorded flight.
+
+    Telemetry packets and frames are replayed in timestamp order (a packet before a
+    frame with the same timestamp). Packets go through ESP32Task.process_telemetry_line,
+    so they reach the telemetry store, the CSV writer and the hub as live packets do.
+    Frames are either processed in line, so every frame is detected and ranked and the
+    results are reproducible, or (pipeline=True) submitted to a VTXPipeline, which
+    drops frames as it would when live.
+
+    The clocks are deterministic: every timestamp is the recorded one (see
+    ReplayClock) and the random generator is seeded, so a replay gives the same
+    results at any speed.
+    """
+
+    speed: float
+    clock: ReplayClock
+    esp32_task: ESP32Task
+    processor: VTXProcessor
+    pipeline: VTXPipeline | None
+    on_result: Callable[[FrameResult], None] | None
+
+    def __init__(
+        self,
+        telemetry: list[CanSatData],
+        frames: list[ReplayFrame],
+        speed: float = 1.0,
+        csv_filename: str | None = None,
+        esp32_task: ESP32Task | None = None,
+        processor: VTXProcessor | None = None,
+        pipeline: bool = False,
+        on_result: Callable[[FrameResult], None] | None = None,
+        seed: int = 0,
+        ranking_rules: RankingRules | None = None,
+    ):
+        """
+        :param telemetry: The recorded packets (see load_telemetry).
+        :param frames: The recorded frames (see load_frames).
+        :param speed: Replay speed: 1 = real time, N = N× speed, 0 = as fast as possible.
+        :param csv_filename: The CSV log the replayed packets are written to. Defaults
+                             to a temporary file.
+        :param esp32_task: The task that receives the packets (not started). Defaults
+                           to one writing to csv_filename.
+        :param processor: The VTXProcessor. Defaults to one using the task's telemetry
+                          store.
+        :param pipeline: Process the frames with a VTXPipeline instead of in line.
+        :param on_result: Called with the ranked points of every processed frame.
+        :param seed: Seed of the random generator (used e.g. by the ML detection).
+        :param ranking_rules: Ranking rules of the default VTXProcessor.
+        """
+        self.telemetry = telemetry
+        self.frames = frames
+        self.speed = speed
+        self.clock = ReplayClock()
+        self._tmpdir = None
+        if esp32_task is None:
+            if csv_filename is None:
+                self._tmpdir = tempfile.TemporaryDirectory()
+                csv_filename = str(Path(self._tmpdir.name) / "replay_data.csv")
+            esp32_task = ESP32Task(csv_filename=csv_filename, clock=self.clock.now)
+        self.esp32_task = esp32_task
+        if processor is None:
+            processor = VTXProcessor(
+                debug=True,
+                telemetry_store=esp32_task.telemetry_store,
+                ranking_rules=ranking_rules,
+            )
+        self.processor = processor
+        self.on_result = on_result
+        self.seed = seed
+        self.pipeline = None
+        if pipeline:
+            store = esp32_task.telemetry_store
+            self.pipeline = VTXPipeline(
+                processor,
+                telemetry_lookup=lambda timestamp: store.closest(timestamp),
+                on_result=on_result,
+            )
+        self.results: list[FrameResult] = []
+
+    def _timeline(self):
+        """
+        Yields (timestamp, kind, item) in replay order; kind 0 = packet, 1 = frame.
+        """
+        packets = ((packet.timestamp, 0, i) for i, packet in enumerate(self.telemetry))
+        frames = ((frame.timestamp, 1, i) for i, frame in enumerate(self.frames))
+        for timestamp, kind, i in heapq.merge(packets, frames):
+            yield timestamp, kind, (self.telemetry[i] if kind == 0 else self.frames[i])
+
+    def _process_frame(self, frame: ReplayFrame, image: cv2.typing.MatLike):
+        processor = self.processor
+        started = time.monotonic()
+        processor.last_image = image
+        processor.last_timestamp = frame.timestamp
+        cansat_data = processor.get_closest_cansat_data(frame.timestamp)
+        if cansat_data is None:
+            return None
+        points = processor.score_and_sort_points(
+            processor.detect_cv_points(cansat_data, image),
+            processor.detect_ml_points(cansat_data, image),
+            processor.detect_hotspot_points(cansat_data),
+            cansat_data,
+        )
+        result = FrameResult(
+            len(self.results),
+            frame.timestamp,
+            cansat_data,
+            points,
+            time.monotonic() - started,
+        )
+        self.results.append(result)
+        if self.on_result is not None:
+            self.on_result(result)
+        return result
+
+    def run(self):
+        """
+        Replays the whole flight and returns the replay statistics.
+        """
+        random.seed(self.seed)
+        task = self.esp32_task
+        if not task.csv_writer.is_alive():
+            task.csv_writer.start()
+        if self.pipeline is not None:
+            self.pipeline.start(capture=False)
+
+        packets = frames = skipped_frames = 0
+        latencies: list[float] = []
+        max_lag = 0.0
+        first_time: float | None = None
+        wall_start = time.monotonic()
+        for timestamp, kind, item in self._timeline():
+            if first_time is None:
+                first_time = timestamp
+            if self.speed > 0:
+                due = wall_start + (timestamp - first_time) / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+            self.clock.set(timestamp)
+
+            if isinstance(item, CanSatData):
+                line = item.to_string()
+                if task.process_telemetry_line(line, arrival=timestamp) is not None:
+                    packets += 1
+                continue
+
+            image = read_frame_image(item.path)
+            if image is None:
+                skipped_frames += 1
+                continue
+            frames += 1
+            if self.pipeline is not None:
+                _ = self.pipeline.submit(image, timestamp)
+            else:
+                result = self._process_frame(item, image)
+                if result is None:
+                    skipped_frames += 1
+                else:
+                    latencies.append(result.latency)
+
+        pipeline_stats = None
+        if self.pipeline is not None:
+            if frames:
+                # Let the pipeline finish the last frame (it is never dropped)
+                _ = self.pipeline.wait_for_result(after=frames - 2, timeout=5.0)
+            self.pipeline.stop()
+            pipeline_stats = self.pipeline.stats()
+        task.csv_writer.close()
+
+        wall = time.monotonic() - wall_start
+        recorded = self.clock.now() - first_time if first_time is not None else 0.0
+        return {
+            "packets": packets,
+            "frames": frames,
+            "skipped_frames": skipped_frames,
+            "recorded_s": recorded,
+            "wall_s": wall,
+            "achieved_speed": recorded / wall if wall > 0 else 0.0,
+            "packets_per_s": packets / wall if wall > 0 else 0.0,
+            "frames_per_s": frames / wall if wall > 0 else 0.0,
+            "frame_latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "frame_latency_max": max(latencies, default=0.0),
+            "max_lag_s": max_lag,
+            "pipeline": pipeline_stats,
+            "writer": task.writer_stats(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    _ = parser.add_argument("telemetry", help="telemetry CSV log or serial capture")
+    _ = parser.add_argument("frames", help="directory of recorded VTX frames")
+    _ = parser.add_argument(
+        "--speed", type=float, default=1.0, help="replay speed (1 = real time)"
+    )
+    _ = parser.add_argument(
+        "--fast", action="store_true", help="replay as fast as possible"
+    )
+    _ = parser.add_argument(
+        "--pipeline", action="store_true", help="process the frames with VTXPipeline"
+    )
+    _ = parser.add_argument(
+        "--frame-rate",
+        type=float,
+        default=FRAME_RATE,
+        help="fps of numbered frame files",
+    )
+    _ = parser.add_argument(
+        "--pattern", default="*", help="glob pattern of the frame files"
+    )
+    _ = parser.add_argument("--csv", help="write the replayed telemetry to this CSV")
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument(
+        "--ranking", help="JSON file of ranking rules (see tasks.ranking)"
+    )
+    args = parser.parse_args()
+
+    telemetry = load_telemetry(args.telemetry)
+    start = telemetry[0].timestamp if telemetry else 0.0
+    frames = load_frames(args.frames, start, args.frame_rate, args.pattern)
+    replay = FlightReplay(
+        telemetry,
+        frames,
+        speed=0.0 if args.fast else args.speed,
+        csv_filename=args.csv,
+        pipeline=args.pipeline,
+        seed=args.seed,
+        ranking_rules=RankingRules.load(args.ranking) if args.ranking else None,
+    )
+    print(json.dumps(replay.run(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Protocol
+from tasks.wire_format import SYNC, scan_packet
+
+try:
+    import serial  # pyserial
+except ImportError:  # only needed when reading from a real port
+    serial = None
+
+# A frame body: printable ASCII without "#", "\r" or "\n"
+_BODY_RE = re.compile(rb"[ -\"$-~]+")
+MAX_FRAME_SIZE = 512  # bytes; longer candidates are treated as corruption
+RATE_WINDOW = 5.0  # seconds over which bytes/s and frames/s are measured
+
+
+class ByteStream(Protocol):
+    def read(self, size: int = 1, /) -> bytes: ...
+
+
+class FrameDecoder:
+    """
+    Incremental extractor of telemetry frames from a byte stream: `#...#` text
+    frames and binary packets (see wire_format), in any mix.
+
+    Bytes are fed as they arrive and complete frames are returned as soon as their
+    closing "#" is seen; partial frames are kept for the next feed. Anything between
+    frames (e.g. the base station's own log lines) is skipped. A candidate frame that
+    contains a line break or non-printable bytes, or grows past max_frame_size, is a
+    framing error: the decoder resyncs by treating its closing "#" as the opening of
+    the next frame, so a corrupted or half-received frame costs at most one packet.
+
+    A binary packet is recognized by its sync bytes and checked by its length and
+    CRC. A packet with an unknown version or a CRC mismatch is a framing error too:
+    the decoder resyncs at the next byte after its sync bytes.
+    """
+
+    max_frame_size: int
+    frames: int
+    binary_frames: int
+    framing_errors: int
+    skipped_bytes: int
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        # A complete, valid text frame (the common case, matched in one call)
+        self._frame_re = re.compile(rb"#[ -\"$-~]{1,%d}#" % max_frame_size)
+        self._buffer = bytearray()
+        self.frames = 0
+        self.binary_frames = 0
+        self.framing_errors = 0
+        self.skipped_bytes = 0
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """
+        Adds received bytes and returns the complete frames (text frames including
+        the "#", binary packets including the sync bytes and CRC).
+        """
+        self._buffer += data
+        buf = self._buffer
+        frames: list[bytes] = []
+        binary_frames = 0
+        pos = 0
+        # The first sync bytes at or after pos, searched again only once passed, so
+        # that text-only data is not searched for them at every frame
+        next_sync = buf.find(SYNC)
+        while True:
+            if 0 <= next_sync < pos:
+                next_sync = buf.find(SYNC, pos)
+            start = buf.find(b"#", pos)
+            sync = next_sync if start < 0 or next_sync < start else -1
+            if sync >= 0:
+                self.skipped_bytes += sync - pos
+                size = scan_packet(buf, sync)
+                if size == 0:
+                    pos = sync  # wait for the rest of the packet
+                    break
+                if size < 0:
+                    self.framing_errors += 1
+                    self.skipped_bytes += 1
+                    pos = sync + 1
+                    continue
+                frames.append(bytes(buf[sync : sync + size]))
+                binary_frames += 1
+                pos = sync + size
+                continue
+            if start < 0:
+                # Keep a trailing first sync byte not yet consumed (e.g. by a
+                # packet whose CRC ends with it), which may start a packet
+                keep = 1 if len(buf) > pos and buf.endswith(SYNC[:1]) else 0
+                self.skipped_bytes += len(buf) - pos - keep
+                pos = len(buf) - keep
+                break
+            self.skipped_bytes += start - pos
+
+            match = self._frame_re.match(buf, start)
+            if match is not None:
+                frames.append(match[0])
+                pos = match.end()
+                continue
+            # Not a whole frame: find out why
+            end = buf.find(b"#", start + 1, start + 2 + self.max_frame_size)
+            # Text frames are printable, so sync bytes before the closing "#" mean
+            # that this "#" was not the opening of a frame.
+            sync = next_sync if end < 0 or next_sync < end else -1
+            if sync >= 0:
+                self.framing_errors += 1
+                self.skipped_bytes += sync - start
+                pos = sync
+                continue
+            if end < 0:
+                if len(buf) - start > self.max_frame_size + 1:
+                    # Too long to be a frame: drop the opening "#" and resync
+                    self.framing_errors += 1
+                    self.skipped_bytes += 1
+                    pos = start + 1
+                    continue
+                pos = start  # wait for the rest of the frame
+                break
+
+            if _BODY_RE.fullmatch(buf, start + 1, end):
+                frames.append(bytes(buf[start : end + 1]))
+                pos = end + 1
+            else:
+                # Not a frame: the closing "#" may open the next one
+                self.framing_errors += 1
+                self.skipped_bytes += end - start
+                pos = end
+
+        del buf[:pos]
+        self.frames += len(frames)
+        self.binary_frames += binary_frames
+        return frames
+
+
+class SerialIngest:
+    """
+    Continuous ingestion of telemetry frames from a byte stream: a pyserial port
+    (or any URL supported by serial_for_url, e.g. a pty, "socket://host:port" or
+    "loop://"), a socket, or any object with a read() method.
+
+    read_frames() blocks only until some bytes are available (up to the stream's
+    timeout), so frames are handed off as soon as they are complete instead of on
+    a fixed polling interval. Each frame is timestamped on arrival.
+    """
+
+    stream: ByteStream
+    decoder: FrameDecoder
+    clock: Callable[[], float]
+    read_size: int
+
+    def __init__(
+        self,
+        stream: ByteStream,
+        clock: Callable[[], float] = time.time,
+        read_size: int = 4096,
+        max_frame_size: int = MAX_FRAME_SIZE,
+    ):
+        """
+        :param stream: The byte stream to read from.
+        :param clock: Function returning the arrival timestamp of a frame.
+        :param read_size: Maximum number of bytes read per call.
+        :param max_frame_size: See FrameDecoder.
+        """
+        self.stream = stream
+        self.decoder = FrameDecoder(max_frame_size)
+        self.clock = clock
+        self.read_size = read_size
+        self.bytes_received = 0
+        self._samples: deque[tuple[float, int, int]] = deque()
+        self._lock = threading.Lock()
+
+    def _read(self) -> bytes:
+        stream = self.stream
+        in_waiting = getattr(stream, "in_waiting", None)
+        if in_waiting is not None:
+            # pyserial: take everything already buffered, or wait for one byte
+            return stream.read(min(max(in_waiting, 1), self.read_size))
+        recv = getattr(stream, "recv", None)
+        if recv is not None:
+            return recv(self.read_size)
+        return stream.read(self.read_size)
+
+    def read_frames(self) -> list[tuple[bytes, float]]:
+        """
+        Reads the available bytes and returns the completed frames with their
+        arrival timestamps. Returns an empty list if nothing arrived before the
+        stream's timeout.
+
+        :raises EOFError: If the stream was closed.
+        """
+        data = self._read()
+        if data is None:
+            return []
+        if not data and not hasattr(self.stream, "in_waiting"):
+            raise EOFError("Telemetry stream closed")
+        arrival = self.clock()
+        frames = self.decoder.feed(data)
+        with self._lock:
+            self.bytes_received += len(data)
+            self._samples.append((time.monotonic(), len(data), len(frames)))
+        return [(frame, arrival) for frame in frames]
+
+    def stats(self):
+        """
+        Returns the ingestion counters and the bytes/s and frames/s measured over
+        the last RATE_WINDOW seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._samples and now - self._samples[0][0] > RATE_WINDOW:
+                _ = self._samples.popleft()
+            window_bytes = sum(sample[1] for sample in self._samples)
+            window_frames = sum(sample[2] for sample in self._samples)
+            return {
+                "bytes_received": self.bytes_received,
+                "frames": self.decoder.frames,
+                "binary_frames": self.decoder.binary_frames,
+                "framing_errors": self.decoder.framing_errors,
+                "skipped_bytes": self.decoder.skipped_bytes,
+                "bytes_per_s": window_bytes / RATE_WINDOW,
+                "frames_per_s": window_frames / RATE_WINDOW,
+            }
+
+
+def open_serial(port: str, baudrate: int = 115200, timeout: float = 0.1):
+    """
+    Opens a serial port or pyserial URL (e.g. "COM3", "/dev/ttyUSB0", a pty path,
+    "socket://localhost:7777" or "loop://") for SerialIngest.
+    """
+    if serial is None:
+        raise RuntimeError("pyserial is required to read telemetry from a serial port")
+    return serial.serial_for_url(port, baudrate=baudrate, timeout=timeout)
@@ -0,0 +1,197 @@
+"""
+Production serving of the ground-station web app.
+
+One producer process owns the ground-station state: it runs the tasks that publish
+on the hub (interest points, VTX frames, telemetry) and exports every update to
+shared memory (see shared_state). Several worker processes, forked before any thread
+is started, accept connections on one listening socket and serve requests with a
+thread each; every worker mirrors the shared state on its own copy of the hub, so
+the endpoints read it from memory as in the single-process server.
+
+    python app.py --workers 4 --port 3000
+
+Another WSGI server can host the workers instead: run the producer on its own
+(python app.py --producer) and start the server with VOYAGER_SHARED_STATE set to the
+name of the shared state, e.g. VOYAGER_SHARED_STATE=voyager gunicorn -w 4 app:app.
+"""
+
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import threading
+import time
+from collections.abc import Callable, Sequence
+from multiprocessing.process import BaseProcess
+from werkzeug.serving import WSGIRequestHandler, make_server
+from tasks.shared_state import CAPACITIES, SharedState, StateExporter, StateMirror
+from tasks.telemetry_hub import TelemetryHub
+
+SHARED_STATE_ENV = "VOYAGER_SHARED_STATE"  # shared state mirrored by app.py workers
+DEFAULT_STATE_NAME = "voyager"
+LISTEN_BACKLOG = 1024  # connections waiting to be accepted by a worker
+RESTART_DELAY = 1.0  # seconds before a worker that exited is started again
+SHUTDOWN_TIMEOUT = 5.0  # seconds the processes get to exit before they are killed
+
+type Producer = Callable[[], object]
+
+logger = logging.getLogger(__name__)
+
+
+class _RequestHandler(WSGIRequestHandler):
+    # Access logs only at DEBUG level: at hundreds of requests per second,
+    # formatting and writing a line per request costs more than the request
+    def log_request(self, code: int | str = "-", size: int | str = "-"):
+        if logger.isEnabledFor(logging.DEBUG):
+            super().log_request(code, size)
+
+
+def _interrupt(*_: object):
+    raise KeyboardInterrupt
+
+
+def run_producer(hub: TelemetryHub, producers: Sequence[Producer], state: SharedState):
+    """
+    Runs the producer tasks in threads and exports what they publish on the hub to
+    the shared state, until interrupted (SIGINT or SIGTERM).
+    """
+    _ = signal.signal(signal.SIGTERM, _interrupt)
+    exporter = StateExporter(hub, state)
+    exporter.start()
+    for producer in producers:
+        name = getattr(producer, "__name__", "producer")
+        threading.Thread(target=producer, name=name, daemon=True).start()
+    try:
+        _ = threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    exporter.stop()
+
+
+def _producer_main(
+    hub: TelemetryHub, producers: Sequence[Producer], state: SharedState
+):
+    run_producer(hub, producers, state)
+    state.close()
+
+
+def _worker_main(
+    app: Callable[..., object],
+    hub: TelemetryHub,
+    state: SharedState,
+    listener: socket.socket,
+):
+    """
+    Worker process: mirrors the shared state on the hub and serves requests on the
+    inherited listening socket, a thread per connection.
+    """
+    _ = signal.signal(signal.SIGTERM, _interrupt)
+    mirror = StateMirror(hub, state)
+    mirror.start()
+    host, port = listener.getsockname()[:2]
+    server = make_server(
+        host,
+        port,
+        app,  # pyright: ignore[reportArgumentType]
+        threaded=True,
+        request_handler=_RequestHandler,
+        fd=listener.fileno(),
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    mirror.stop()
+
+
+def serve(
+    app: Callable[..., object],
+    hub: TelemetryHub,
+    producers: Sequence[Producer],
+    host: str = "0.0.0.0",
+    port: int = 3000,
+    workers: int | None = None,
+    state_name: str | None = None,
+    ready: Callable[[int], object] | None = None,
+):
+    """
+    Serves a WSGI app with a producer process and `workers` prefork worker
+    processes, until interrupted (SIGINT or SIGTERM). A worker that exits is
+    restarted; if the producer exits, the server stops.
+
+    Requires os.fork (Linux, macOS); the processes must be forked before any
+    thread is started, so this must be called before the producers are.
+
+    :param app: The WSGI app; its module-level state (e.g. the hub) is copied to
+                every process.
+    :param hub: The hub the producers publish on and the app reads from.
+    :param producers: Functions that publish on the hub, run in threads of the
+                      producer process.
+    :param workers: Worker processes (the number of CPUs if None).
+    :param state_name: Name of the shared memory (unique per server by default).
+    :param ready: Called with the bound port once the server accepts connections.
+    """
+    context = multiprocessing.get_context("fork")
+    workers = workers or os.cpu_count() or 1
+    state = SharedState(
+        state_name or f"{DEFAULT_STATE_NAME}-{os.getpid()}", capacities=CAPACITIES
+    )
+    listener = socket.create_server((host, port), backlog=LISTEN_BACKLOG)
+    listener.set_inheritable(True)
+    port = listener.getsockname()[1]
+
+    def start(target: Callable[..., None], name: str, *args: object) -> BaseProcess:
+        process = context.Process(target=target, args=args, name=name)
+        process.start()
+        return process
+
+    producer = start(_producer_main, "producer", hub, producers, state)
+    processes = {
+        start(_worker_main, f"worker-{i}", app, hub, state, listener): i
+        for i in range(workers)
+    }
+    logger.info(
+        "Serving on http://%s:%d with %d workers (shared state %s)",
+        host,
+        port,
+        workers,
+        state.name,
+    )
+    if ready is not None:
+        _ = ready(port)
+
+    previous = signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        while True:
+            sentinels = [producer.sentinel, *(p.sentinel for p in processes)]
+            ended = multiprocessing.connection.wait(sentinels, timeout=0.5)
+            if producer.sentinel in ended:
+                logger.error("The producer exited (code %s)", producer.exitcode)
+                break
+            for process in [p for p in processes if p.sentinel in ended]:
+                i = processes.pop(process)
+                process.join()
+                logger.warning(
+                    "Worker %d exited (code %s); restarting it", i, process.exitcode
+                )
+                time.sleep(RESTART_DELAY)
+                processes[
+                    start(_worker_main, f"worker-{i}", app, hub, state, listener)
+                ] = i
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _ = signal.signal(signal.SIGTERM, previous)
+        for process in [producer, *processes]:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for process in [producer, *processes]:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        listener.close()
+        state.close(unlink=True)
@@ -0,0 +1,366 @@
+"""
+Shares the latest value of each hub topic between processes through shared memory,
+so that one producer process can own the ground-station state (telemetry, interest
+points, VTX frames) while several web server processes serve it.
+
+Each topic has a shared memory block with a fixed capacity, written by one process
+and read by any number of others without locks: the writer increments a counter
+(in a block of its own) before and after every write (a seqlock), and a reader
+retries when the counter changed while it was copying. Since the counter covers all
+the topics, a reader can copy several topics as of one moment. A StateExporter writes the snapshots published on the
+producer's hub; a StateMirror in every server process polls the blocks and
+republishes new values on its own hub, with the producer's sequence numbers, so the
+existing endpoints work unchanged and give the same ETags in every process.
+"""
+
+import json
+import logging
+import struct
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass
+from multiprocessing import resource_tracker, shared_memory
+from tasks.CanSatData import CanSatData
+from tasks.live_frame import EncodedFrame
+from tasks.telemetry_hub import (
+    INTEREST_POINTS,
+    TELEMETRY,
+    VTX_FRAME,
+    Subscription,
+    TelemetryHub,
+)
+
+# Bytes of shared memory per topic (the largest value that can be shared)
+CAPACITIES = {
+    TELEMETRY: 64 * 1024,
+    INTEREST_POINTS: 1024 * 1024,
+    VTX_FRAME: 4 * 1024 * 1024,
+}
+POLL_INTERVAL = 0.02  # seconds between StateMirror polls
+READ_RETRIES = 100  # reads that may overlap a write before read() gives up
+
+_COUNTER = struct.Struct("<Q")  # odd while a write is in progress
+_HEADER = struct.Struct("<QQd")  # hub sequence number, payload length, timestamp
+_FRAME_HEADER = struct.Struct("<dII")  # EncodedFrame timestamp, width, height
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_points(points: object):
+    return json.dumps(points, separators=(",", ":")).encode()
+
+
+def _encode_frame(frame: object):
+    assert isinstance(frame, EncodedFrame)
+    header = _FRAME_HEADER.pack(frame.timestamp, frame.width, frame.height)
+    return header + frame.jpeg
+
+
+def _decode_frame(payload: bytes):
+    timestamp, width, height = _FRAME_HEADER.unpack_from(payload)
+    return EncodedFrame(payload[_FRAME_HEADER.size :], timestamp, width, height)
+
+
+def _encode_telemetry(data: object):
+    # Every field as is (the wire format is lossy and limited to the CanSat's ranges)
+    assert isinstance(data, CanSatData)
+    return json.dumps(asdict(data), separators=(",", ":")).encode()
+
+
+def _decode_telemetry(payload: bytes):
+    data = CanSatData(**json.loads(payload))
+    data.hotspots = [(lat, lng) for lat, lng in data.hotspots]
+    return data
+
+
+@dataclass(frozen=True, slots=True)
+class Codec:
+    """
+    How the values of a topic are converted to and from bytes.
+    """
+
+    encode: Callable[[object], bytes]
+    decode: Callable[[bytes], object]
+
+
+CODECS = {
+    TELEMETRY: Codec(_encode_telemetry, _decode_telemetry),
+    INTEREST_POINTS: Codec(_encode_points, json.loads),
+    VTX_FRAME: Codec(_encode_frame, _decode_frame),
+}
+
+
+class SharedState:
+    """
+    The shared memory blocks of a set of topics, named "<name>-<topic>", and their
+    counter, named "<name>-counter".
+
+    Only one process (the producer) may write; any process may read.
+    """
+
+    name: str
+
+    def __init__(
+        self,
+        name: str,
+        topics: Iterable[str] | None = None,
+        capacities: dict[str, int] | None = None,
+    ):
+        """
+        Attaches to the blocks of existing shared state, or creates them.
+
+        :param name: Prefix of the shared memory block names.
+        :param topics: Topics to attach to (all the topics of CODECS if None).
+        :param capacities: If given, the blocks of these topics are created with
+                           these sizes in bytes (see CAPACITIES), instead of
+                           attached to.
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._blocks: dict[str, shared_memory.SharedMemory] = {}
+        self._counter: shared_memory.SharedMemory | None = None
+        create = capacities is not None
+        try:
+            if capacities is not None:
+                self._counter = shared_memory.SharedMemory(
+                    f"{name}-counter", create=True, size=_COUNTER.size
+                )
+                _COUNTER.pack_into(self._counter.buf, 0, 0)
+                for topic, capacity in capacities.items():
+                    block = shared_memory.SharedMemory(
+                        f"{name}-{topic}", create=True, size=_HEADER.size + capacity
+                    )
+                    _HEADER.pack_into(block.buf, 0, 0, 0, 0.0)
+                    self._blocks[topic] = block
+            else:
+                self._counter = self._attach(f"{name}-counter")
+                for topic in topics if topics is not None else CODECS:
+                    self._blocks[topic] = self._attach(f"{name}-{topic}")
+        except BaseException:
+            self.close(unlink=create)
+            raise
+
+    @staticmethod
+    def _attach(name: str):
+        block = shared_memory.SharedMemory(name)
+        # Attaching registers the block with this process's resource tracker, which
+        # would remove it when the process exits (bpo-38119); only its creator
+        # removes it.
+        resource_tracker.unregister(block._name, "shared_memory")  # pyright: ignore
+        return block
+
+    @property
+    def topics(self):
+        return list(self._blocks)
+
+    def capacity(self, topic: str):
+        return self._blocks[topic].size - _HEADER.size
+
+    def write(self, topic: str, seq: int, timestamp: float, payload: bytes):
+        """
+        Replaces the value of a topic.
+
+        :raises ValueError: If the payload is larger than the topic's capacity.
+        """
+        block = self._blocks[topic]
+        if len(payload) > block.size - _HEADER.size:
+            raise ValueError(
+                f"{len(payload)} bytes do not fit in the {topic} block "
+                f"({block.size - _HEADER.size} bytes)"
+            )
+        assert self._counter is not None
+        buffer, counter_buffer = block.buf, self._counter.buf
+        with self._lock:
+            (counter,) = _COUNTER.unpack_from(counter_buffer)
+            _COUNTER.pack_into(counter_buffer, 0, counter + 1)
+            buffer[_HEADER.size : _HEADER.size + len(payload)] = payload
+            _HEADER.pack_into(buffer, 0, seq, len(payload), timestamp)
+            _COUNTER.pack_into(counter_buffer, 0, counter + 2)
+
+    def read_many(self, after: dict[str, int]):
+        """
+        Returns the values of the given topics whose sequence number is greater than
+        after[topic], all as of the same moment, as (seq, topic, timestamp, payload)
+        tuples in the order of their sequence numbers. So every value written later
+        has a greater sequence number than all of them.
+
+        :raises TimeoutError: If every attempt overlapped a write.
+        """
+        assert self._counter is not None
+        counter_buffer = self._counter.buf
+        for _ in range(READ_RETRIES):
+            (counter,) = _COUNTER.unpack_from(counter_buffer)
+            if counter % 2:
+                time.sleep(0)
+                continue
+            updates: list[tuple[int, str, float, bytes]] = []
+            for topic, seq_after in after.items():
+                buffer = self._blocks[topic].buf
+                seq, length, timestamp = _HEADER.unpack_from(buffer)
+                if seq > seq_after:
+                    payload = bytes(buffer[_HEADER.size : _HEADER.size + length])
+                    updates.append((seq, topic, timestamp, payload))
+            if _COUNTER.unpack_from(counter_buffer)[0] == counter:
+                updates.sort()
+                return updates
+        raise TimeoutError("The shared state was being written on every read")
+
+    def read(self, topic: str, after: int = 0):
+        """
+        Returns the (seq, timestamp, payload) of a topic if its sequence number is
+        greater than `after`, otherwise (or if nothing was written yet) None.
+
+        :raises TimeoutError: If every attempt overlapped a write.
+        """
+        for seq, _, timestamp, payload in self.read_many({topic: after}):
+            return seq, timestamp, payload
+        return None
+
+    def close(self, unlink: bool = False):
+        """
+        Detaches from the blocks, and removes them if `unlink` (in the process that
+        created them, once no other process needs them).
+        """
+        blocks, self._blocks = list(self._blocks.values()), {}
+        if self._counter is not None:
+            blocks.append(self._counter)
+            self._counter = None
+        for block in blocks:
+            block.close()
+            if unlink:
+                try:
+                    block.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+class StateExporter:
+    """
+    Writes every snapshot published on a hub to the shared state (in the producer
+    process), from a background thread.
+    """
+
+    def __init__(self, hub: TelemetryHub, state: SharedState):
+        self.hub = hub
+        self.state = state
+        self.exported = 0
+        self.failures = 0
+        self._subscription: Subscription | None = None
+        self._thread: threading.Thread | None = None
+
+    def _export(self, seq: int, topic: str, value: object, timestamp: float):
+        try:
+            payload = CODECS[topic].encode(value)
+            self.state.write(topic, seq, timestamp, payload)
+        except ValueError as e:
+            self.failures += 1
+            logger.warning("Could not share the %s value: %s", topic, e)
+            return
+        self.exported += 1
+
+    def _run(self, subscription: Subscription):
+        for snapshot in subscription:
+            self._export(
+                snapshot.seq, snapshot.topic, snapshot.value, snapshot.timestamp
+            )
+
+    def start(self):
+        topics = self.state.topics
+        self._subscription = self.hub.subscribe(topics)
+        # What was published before the subscription
+        for topic in topics:
+            snapshot = self.hub.latest(topic)
+            if snapshot is not None:
+                self._export(snapshot.seq, topic, snapshot.value, snapshot.timestamp)
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(self._subscription,),
+            name="state-exporter",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        if self._subscription is not None:
+            self._subscription.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {"exported": self.exported, "failures": self.failures}
+
+
+class StateMirror:
+    """
+    Republishes the values of the shared state on a local hub (in a server process),
+    polling for new values every `interval` seconds.
+
+    Each poll copies the changed topics as of one moment (SharedState.read_many)
+    and publishes them in the order of their sequence numbers, so the local hub
+    sees the producer's updates in the order they happened (updates between two
+    polls may be coalesced to the newest value per topic).
+    """
+
+    def __init__(
+        self,
+        hub: TelemetryHub,
+        state: SharedState,
+        interval: float = POLL_INTERVAL,
+    ):
+        self.hub = hub
+        self.state = state
+        self.interval = interval
+        self.mirrored = 0
+        self._seqs = {topic: 0 for topic in state.topics}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def poll(self):
+        """
+        Publishes the values that changed since the last poll; returns how many.
+        """
+        updates = self.state.read_many(self._seqs)
+        for seq, topic, timestamp, payload in updates:
+            value = CODECS[topic].decode(payload)
+            if value is not None:
+                try:
+                    _ = self.hub.publish(topic, value, seq=seq, timestamp=timestamp)
+                except ValueError:
+                    # The local hub is ahead (something else published on it):
+                    # publish the value anyway, with the hub's next number
+                    logger.warning("Mirroring %s #%d out of order", topic, seq)
+                    _ = self.hub.publish(topic, value, timestamp=timestamp)
+                self.mirrored += 1
+            self._seqs[topic] = seq
+        return len(updates)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                _ = self.poll()
+            except Exception:
+                logger.exception("Mirroring the shared state failed")
+
+    def start(self):
+        _ = self.poll()
+        self._thread = threading.Thread(
+            target=self._run, name="state-mirror", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def mirror_topics(
+    hub: TelemetryHub, name: str, topics: Iterable[str] | None = None
+) -> StateMirror:
+    """
+    Attaches to the shared state `name` and starts mirroring it on `hub`.
+    """
+    mirror = StateMirror(hub, SharedState(name, topics))
+    mirror.start()
+    return mirror
@@ -1,52 +1,39 @@
+import logging
+from concurrent.futures import Future
 import cv2
-import time
-import random
-import math
-import csv
-import ast
-import enum
+import numpy as np
+from numpy.typing import NDArray
+from tasks import metrics
 from tasks.CanSatData import CanSatData
-from enum import Flag
-from dataclasses import dataclass
-
-MERGE_THRESHOLD = 20  # for merging nearby points (not used in these methods)
-
-
-class DetectionMethod(Flag):
-    COMPUTER_VISION = enum.auto()
-    MACHINE_LEARNING = enum.auto()
-    CANSAT_HOTSPOTS = enum.auto()
-    THE_CANSAT = enum.auto()
-
-
-@dataclass(slots=True)
-class DetectionPoint:
-    latitude: float
-    longitude: float
-    score: float
-    methods: DetectionMethod
-
-
-@dataclass(slots=True)
-class RatedDetectionPoint:
-    detection_point: DetectionPoint
-    rating: int
-
-    @property
-    def latitude(self):
-        return self.detection_point.latitude
-
-    @property
-    def longitude(self):
-        return self.detection_point.longitude
-
-    @property
-    def score(self):
-        return self.detection_point.score
-
-    @property
-    def methods(self):
-        return self.detection_point.methods
+from tasks.cv_detection import BlobDetector, CVDetectionConfig, score_from_area
+from tasks.detection import DetectionMethod, DetectionPoint, RatedDetectionPoint
+from tasks.frame_source import CaptureSource, FileSource, FrameSource
+from tasks.merge import MERGE_THRESHOLD, PointMerger
+from tasks.ml_detector import (
+    MLDetection,
+    MLDetector,
+    MLDetectorProcess,
+    WorkerExitedError,
+)
+from tasks.projection import image_points_to_world, world_to_image_points
+from tasks.ranking import RankingEngine, RankingRules
+from tasks.telemetry_store import TelemetryStore
+from tasks.vtx_pipeline import VTXPipeline
+
+ML_TIMEOUT = 2.0  # seconds to wait for the ML detections of a frame
+
+logger = logging.getLogger(__name__)
+
+_CAPTURE_TIME = metrics.stage_timer("capture")
+_CV_TIME = metrics.stage_timer("cv_detection")
+_ML_TIME = metrics.stage_timer("ml_detection")
+_PROJECTION_TIME = metrics.stage_timer("projection")
+_MERGE_TIME = metrics.stage_timer("merge")
+_RANK_TIME = metrics.stage_timer("rank")
+_FRAMES = metrics.counter("voyager_frames_captured_total", "VTX frames captured.")
+_CAPTURE_FAILURES = metrics.counter(
+    "voyager_capture_failures_total", "VTX frame captures that failed."
+)
 
 
 class VTXProcessor:
@@ -58,38 +45,98 @@ class VTXProcessor:
     """
 
     cap: cv2.VideoCapture
+    frame_source: FrameSource
     max_spots: int
     last_image: cv2.typing.MatLike | None
     last_timestamp: float | None
     debug: bool
-
-    def __init__(self, camera_index: int = 1, max_spots: int = 20, debug: bool = False):
+    telemetry_store: TelemetryStore | None
+    merge_threshold: float
+    blob_detector: BlobDetector
+    ml_detector: MLDetector | MLDetectorProcess
+    ml_timeout: float | None
+    ranking: RankingEngine
+    use_ray_table: bool
+
+    def __init__(
+        self,
+        camera_index: int = 1,
+        max_spots: int = 20,
+        debug: bool = False,
+        telemetry_store: TelemetryStore | None = None,
+        merge_threshold: float = MERGE_THRESHOLD,
+        cv_config: CVDetectionConfig | None = None,
+        ml_detector: MLDetector | MLDetectorProcess | None = None,
+        ranking_rules: RankingRules | None = None,
+        use_ray_table: bool = False,
+        frame_source: FrameSource | None = None,
+        ml_timeout: float | None = ML_TIMEOUT,
+    ):
         """
         Initializes the VTXProcessor.
 
         :param camera_index: The index of the camera (second monitor).
         :param maxspots: Maximum number of interest points to return.
+        :param telemetry_store: Shared TelemetryStore fed by ESP32Task. If None, the
+                                telemetry is read incrementally from the CSV log.
+        :param merge_threshold: Distance in metres under which points are merged.
+        :param cv_config: Settings of the CV detection pyramid (downscaling, ROIs).
+                          The default detects on the full-resolution frame.
+        :param ml_detector: The ML model runner, in-process (MLDetector) or in a worker
+                            process (MLDetectorProcess). Defaults to the in-process
+                            RandomDetector placeholder.
+        :param ranking_rules: Ranks and per-method score weights of the interest points
+                              (e.g. RankingRules.load("ranking.json")). The default
+                              is the rank table of score_and_sort_points.
+        :param use_ray_table: Project pixels with the per-pixel ray table of each pose
+                              (see projection.get_ray_table) instead of analytically.
+        :param frame_source: Where frames are read from. Defaults to the camera, read
+                             into reusable buffers by a background grabber, or in
+                             debug mode to static/images/latest.jpg, decoded again
+                             only when the file changes.
+        :param ml_timeout: Seconds to wait for the detections of a frame from an
+                           MLDetectorProcess before its ML points are skipped
+                           (None waits forever).
         """
-        if not debug:
-            self.cap = cv2.VideoCapture(camera_index)
+        if frame_source is None:
+            if debug:
+                frame_source = FileSource("static/images/latest.jpg")
+            else:
+                frame_source = CaptureSource(camera_index)
+        if isinstance(frame_source, CaptureSource):
+            self.cap = frame_source.cap
+        self.frame_source = frame_source
         self.max_spots = max_spots
         self.last_image = None
         self.last_timestamp = None
         self.debug = debug
+        self.telemetry_store = telemetry_store
+        self.merge_threshold = merge_threshold
+        self._csv_stores: dict[str, TelemetryStore] = {}
+        self.blob_detector = BlobDetector(cv_config)
+        self.ml_detector = ml_detector if ml_detector is not None else MLDetector()
+        self.ml_timeout = ml_timeout
+        self.ranking = RankingEngine(ranking_rules)
+        self.use_ray_table = use_ray_table
 
     def read_image(self):
         """
-        Captures an image from the secondary monitor.
+        Captures an image from the secondary monitor (or the frame source).
+
+        The frame may be a reused buffer of the source: it stays valid until the
+        source's ring of buffers wraps around, or until it is handed back with
+        frame_source.release() (as VTXPipeline does once a frame is ranked).
+
+        :return: The captured frame, or None if the capture failed.
         """
-        if not self.debug:
-            ret, frame = self.cap.read()
-            if not ret:
-                return
-            self.last_image = frame
-        else:
-            frame = cv2.imread("static/images/latest.jpg")
-            self.last_image = frame
-        self.last_timestamp = time.time()
+        with _CAPTURE_TIME.time():
+            captured = self.frame_source.read()
+        if captured is None:
+            _CAPTURE_FAILURES.inc()
+            return None
+        _FRAMES.inc()
+        self.last_image, self.last_timestamp = captured
+        return self.last_image
 
     def image_point_to_world(
         self,
@@ -106,255 +153,203 @@ class VTXProcessor:
         :param image_resolution: A tuple (width, height) of the image in pixels.
         :return: A tuple (new_lat, new_lng) representing estimated GPS coordinates.
         """
-        W, H = image_resolution
-        cx, cy = W / 2, H / 2
+        world = self.image_points_to_world(cansat_data, [image_point], image_resolution)
+        return (float(world[0, 0]), float(world[0, 1]))
 
-        horizontal_FOV = 150  # degrees (adjust as needed)
-        f = (W / 2) / math.tan(math.radians(horizontal_FOV / 2))
-
-        dx = image_point[0] - cx
-        dy = image_point[1] - cy
-
-        norm = math.sqrt(dx**2 + dy**2 + f**2)
-        dir_cam = (dx / norm, dy / norm, f / norm)
-
-        pitch = math.radians(cansat_data.pitch)
-        roll = math.radians(cansat_data.roll)
-        yaw = math.radians(cansat_data.yaw)
-
-        Rx = [
-            [1.0, 0.0, 0.0],
-            [0.0, math.cos(roll), -math.sin(roll)],
-            [0.0, math.sin(roll), math.cos(roll)],
-        ]
-        Ry = [
-            [math.cos(pitch), 0.0, math.sin(pitch)],
-            [0.0, 1.0, 0.0],
-            [-math.sin(pitch), 0.0, math.cos(pitch)],
-        ]
-        Rz = [
-            [math.cos(yaw), -math.sin(yaw), 0.0],
-            [math.sin(yaw), math.cos(yaw), 0.0],
-            [0.0, 0.0, 1.0],
-        ]
-
-        def mat_mult(A: list[list[float]], B: list[list[float]]):
-            result = [[0.0, 0.0, 0.0] for _ in range(3)]
-            for i in range(3):
-                for j in range(3):
-                    for k in range(3):
-                        result[i][j] += A[i][k] * B[k][j]
-            return result
-
-        Rzy = mat_mult(Rz, Ry)
-        R = mat_mult(Rzy, Rx)
-
-        world_dir = (
-            R[0][0] * dir_cam[0] + R[0][1] * dir_cam[1] + R[0][2] * dir_cam[2],
-            R[1][0] * dir_cam[0] + R[1][1] * dir_cam[1] + R[1][2] * dir_cam[2],
-            R[2][0] * dir_cam[0] + R[2][1] * dir_cam[1] + R[2][2] * dir_cam[2],
-        )
-
-        Hc = cansat_data.altitude
-
-        if world_dir[2] == 0:
-            return (cansat_data.latitude, cansat_data.longitude)
-        t = -Hc / world_dir[2]
-
-        dx_m = world_dir[0] * t
-        dy_m = world_dir[1] * t
-
-        dlat = dx_m / 111111
-        dlon = dy_m / (111111 * math.cos(math.radians(cansat_data.latitude)))
-
-        new_lat = cansat_data.latitude + dlat
-        new_lng = cansat_data.longitude + dlon
+    def image_points_to_world(
+        self,
+        cansat_data: CanSatData,
+        image_points: NDArray[np.float64] | list[tuple[int, int]],
+        image_resolution: tuple[int, int],
+    ) -> NDArray[np.float64]:
+        """
+        Converts a batch of pixels from an image to estimated world (GPS) coordinates.
+        The camera intrinsics and rotation are computed once per pose and resolution;
+        with use_ray_table, each pixel is looked up in the pose's ray table.
 
-        return (new_lat, new_lng)
+        :param cansat_data: A CanSatData object (with altitude, latitude, longitude, pitch, roll, yaw).
+        :param image_points: An N×2 array (or list of (x, y) tuples) of pixel coordinates.
+        :param image_resolution: A tuple (width, height) of the image in pixels.
+        :return: An N×2 array of (lat, lng) coordinates.
+        """
+        with _PROJECTION_TIME.time():
+            return image_points_to_world(
+                cansat_data, image_points, image_resolution, self.use_ray_table
+            )
 
-    def detect_cv_points(self, cansat_data: CanSatData) -> list[DetectionPoint]:
+    def detect_cv_points(
+        self, cansat_data: CanSatData, image: cv2.typing.MatLike | None = None
+    ) -> list[DetectionPoint]:
         """
         Detects preliminary interest points using computer vision techniques,
         then converts their pixel coordinates to world coordinates.
 
-        Dummy implementation: uses blob detection.
+        Dummy implementation: uses blob detection (see BlobDetector for the
+        downscaled, ROI-restricted and connected-components modes).
 
         :param cansat_data: A CanSatData object.
+        :param image: The image to process (defaults to the last captured image).
         :return: List of points as dictionaries with keys "lat", "lng", "score", "methods" (set containing "CV").
         """
 
-        if self.last_image is None:
+        if image is None:
+            image = self.last_image
+        if image is None:
             return []
 
         points: list[DetectionPoint] = []
 
-        gray = cv2.cvtColor(self.last_image, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (23, 23), 0)
-        (_, threshholded) = cv2.threshold(blurred, 230, 255, cv2.THRESH_BINARY_INV)
-        final_img = cv2.bitwise_not(threshholded)
-        # num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
-        #     final_img, connectivity=8
-        # )
-        contours, _ = cv2.findContours(
-            final_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-        )
-
-        def score_from_area(area: float, image_size: tuple[int, int]):
-            def clip(score: float):
-                return max(min(score, 1), 0)
-
-            w, h = image_size
-            score = (area) / (w * h)
-            score *= 8192
-            if score > 0.5:
-                return clip(score * 2)
-            elif score > 0.2:
-                return clip(score * 3)
-            elif score > 0.1:
-                return clip(score * 5)
-            elif score > 0.01:
-                return clip(score * 10)
-            else:
-                return clip(score * 30)
-
-        for contour in contours:
-            x, y, _, _ = cv2.boundingRect(contour)
-            h: int = final_img.shape[0]  # pyright: ignore[reportAny]
-            w: int = final_img.shape[1]  # pyright: ignore[reportAny]
-            world_coords = self.image_point_to_world(cansat_data, (x, y), (w, h))
-            area = cv2.contourArea(contour)
+        h: int = image.shape[0]  # pyright: ignore[reportAny]
+        w: int = image.shape[1]  # pyright: ignore[reportAny]
+        hotspot_pixels = None
+        if self.blob_detector.config.use_rois and cansat_data.hotspots:
+            hotspot_pixels = world_to_image_points(
+                cansat_data, cansat_data.hotspots, (w, h)
+            )
+        with _CV_TIME.time():
+            blobs = self.blob_detector.detect_arrays(image, hotspot_pixels)
+        if not len(blobs):
+            return points
+
+        # Project and score all blobs at once
+        world_coords = self.image_points_to_world(cansat_data, blobs.points(), (w, h))
+        scores = score_from_area(blobs.areas, (w, h))
+        for (latitude, longitude), score in zip(world_coords.tolist(), scores.tolist()):
             points.append(
                 DetectionPoint(
-                    latitude=world_coords[0],
-                    longitude=world_coords[1],
-                    score=score_from_area(area, (w, h)),
+                    latitude=latitude,
+                    longitude=longitude,
+                    score=score,
                     methods=DetectionMethod.COMPUTER_VISION,
                 )
             )
 
         return points
 
-    def detect_ml_points(self, cansat_data: CanSatData) -> list[DetectionPoint]:
+    def detect_ml_points(
+        self,
+        cansat_data: CanSatData,
+        image: cv2.typing.MatLike | None = None,
+        detections: Future[list[MLDetection]] | None = None,
+    ) -> list[DetectionPoint]:
         """
         Detects interest points using machine learning techniques,
         then converts their pixel coordinates to world coordinates.
 
-        Dummy implementation: returns a few random points.
+        The model is run by self.ml_detector (see tasks.ml_detector); its pixel
+        detections are projected to world coordinates in one batch. If the model
+        runs in a worker process that does not answer within ml_timeout seconds, or
+        has exited, no ML points are returned for the frame.
 
         :param cansat_data: A CanSatData object.
+        :param image: The image to process (defaults to the last captured image).
+        :param detections: The pending detections of the image, if it was already
+                           queued with MLDetectorProcess.submit.
         :return: List of points as dictionaries with keys "lat", "lng", "score", "methods" (set containing "ML").
         """
 
-        if self.last_image is None:
+        if image is None:
+            image = self.last_image
+        if image is None:
             return []
 
         points: list[DetectionPoint] = []
 
-        shape: tuple[int, ...] = self.last_image.shape  # pyright: ignore[reportAny]
-        h, w, _ = shape
+        shape: tuple[int, ...] = image.shape  # pyright: ignore[reportAny]
+        h, w = shape[:2]
         image_resolution = (w, h)
-        num_points = random.randint(5, 10)
-        for _ in range(num_points):
-            x = random.randint(0, w - 1)
-            y = random.randint(0, h - 1)
-            score = random.uniform(0.5, 1.0)
-            world_coords = self.image_point_to_world(
-                cansat_data, (x, y), image_resolution
-            )
+        with _ML_TIME.time():
+            try:
+                if detections is None:
+                    found = self.ml_detector.detect(image, self.ml_timeout)
+                else:
+                    try:
+                        found = detections.result(self.ml_timeout)
+                    except TimeoutError:
+                        _ = detections.cancel()
+                        raise
+            except TimeoutError:
+                logger.warning("No ML detections within %s s", self.ml_timeout)
+                return points
+            except WorkerExitedError as e:
+                logger.error("ML detection failed: %s", e)
+                return points
+        if not found:
+            return points
+        image_points = [(detection.x, detection.y) for detection in found]
+        scores = [detection.score for detection in found]
+
+        world_coords = self.image_points_to_world(
+            cansat_data, image_points, image_resolution
+        )
+        for (latitude, longitude), score in zip(world_coords.tolist(), scores):
             points.append(
                 DetectionPoint(
-                    latitude=world_coords[0],
-                    longitude=world_coords[1],
+                    latitude=latitude,
+                    longitude=longitude,
                     score=score,
                     methods=DetectionMethod.MACHINE_LEARNING,
                 )
             )
         return points
 
-    def get_closest_cansat_data(self, image_timestamp: float, csv_filename: str):
+    def detect_hotspot_points(self, cansat_data: CanSatData) -> list[DetectionPoint]:
         """
-        Reads the CSV file containing logged CanSatData and returns the
-        CanSatData object whose timestamp is closest to the given image_timestamp.
+        Converts the hotspots reported by the CanSat's thermal camera to detection points.
+
+        :param cansat_data: A CanSatData object.
+        :return: List of points with the CANSAT_HOTSPOTS method.
+        """
+        return [
+            DetectionPoint(
+                latitude, longitude, score=1, methods=DetectionMethod.CANSAT_HOTSPOTS
+            )
+            for latitude, longitude in cansat_data.hotspots
+        ]
+
+    def get_closest_cansat_data(
+        self,
+        image_timestamp: float,
+        csv_filename: str | None = None,
+        interpolate: bool = False,
+    ):
+        """
+        Returns the CanSatData object whose timestamp is closest to the given image_timestamp.
+
+        The lookup uses the shared telemetry store if one was given to the processor.
+        Otherwise the CSV log is followed incrementally: only the rows appended since the
+        previous call are parsed, and the lookup is a binary search over the store.
 
         :param image_timestamp: The Unix timestamp (in seconds) when the image was captured.
         :param csv_filename: The path to the CSV file containing telemetry data.
+        :param interpolate: If True, interpolates between the two packets that bracket
+                            image_timestamp instead of returning the closest one.
         :return: A CanSatData object with the closest timestamp, or None if not found.
         """
-        closest_data = None
-        smallest_diff = float("inf")
-        try:
-            with open(csv_filename, "r", newline="", encoding="utf-8") as f:
-                reader = csv.reader(f)
-                _ = next(reader)  # Skip header row
-                # Expected headers: altitude,temperature,pressure,gps_time,latitude,longitude,
-                # pitch,roll,yaw,is_vtx_on,hotspots,timestamp
-                for row in reader:
-                    try:
-                        altitude = float(row[0])
-                        temperature = float(row[1])
-                        pressure = float(row[2])
-                        gps_time = row[3]
-                        latitude = float(row[4])
-                        longitude = float(row[5])
-                        pitch = float(row[6])
-                        roll = float(row[7])
-                        yaw = float(row[8])
-                        is_vtx_on = int(row[9])
-                        # hotspots are stored as a string; convert using literal_eval
-                        hotspots = ast.literal_eval(row[10])
-                        timestamp = float(row[11])
-                    except (ValueError, IndexError):
-                        continue
-                    diff = abs(timestamp - image_timestamp)
-                    if diff < smallest_diff:
-                        smallest_diff = diff
-                        # Create a new CanSatData object (assume its __init__ takes the fields in order)
-                        closest_data = CanSatData(
-                            altitude,
-                            temperature,
-                            pressure,
-                            gps_time,
-                            latitude,
-                            longitude,
-                            pitch,
-                            roll,
-                            yaw,
-                            is_vtx_on,
-                            hotspots,
-                            timestamp,
-                        )
-        except FileNotFoundError:
-            print("CSV file not found:", csv_filename)
-            return None
-
-        return closest_data
+        store = self.telemetry_store
+        if store is None:
+            if csv_filename is None:
+                return None
+            store = self._csv_stores.setdefault(csv_filename, TelemetryStore())
+            try:
+                _ = store.follow_csv(csv_filename)
+            except FileNotFoundError:
+                logger.warning("CSV file not found: %s", csv_filename)
+                return None
+
+        return store.closest(image_timestamp, interpolate=interpolate)
 
     def merge_points(self, points_list: list[DetectionPoint]):
         """
-        Merges nearby points from a list based on a dummy distance threshold.
-        For simplicity, this dummy implementation uses a threshold in degrees.
-        :param points_list: List of point dictionaries (each with "lat", "lng", "score", "methods").
+        Merges nearby points from a list, using a grid-indexed PointMerger with a
+        threshold in metres (self.merge_threshold).
+        Merged points are placed at the score-weighted centroid of their points,
+        keep the maximum score and the union of the detection methods.
+        :param points_list: List of DetectionPoint objects.
         :return: A new list of merged points.
         """
-        merged: list[DetectionPoint] = []
-        threshold = 0.0001  # Dummy threshold in degrees (adjust as needed)
-        for pt in points_list:
-            found = False
-            for mpt in merged:
-                dist = math.sqrt(
-                    (pt.latitude - mpt.latitude) ** 2
-                    + (pt.longitude - mpt.longitude) ** 2
-                )
-                if dist < threshold:
-                    mpt.latitude = (mpt.latitude + pt.latitude) / 2
-                    mpt.longitude = (mpt.longitude + pt.longitude) / 2
-                    mpt.score = max(mpt.score, pt.score)
-                    mpt.methods = pt.methods | mpt.methods
-                    found = True
-                    break
-            if not found:
-                merged.append(pt)
-        return merged
+        with _MERGE_TIME.time():
+            return PointMerger(self.merge_threshold).merge(points_list)
 
     def assign_rank(self, methods: DetectionMethod):
         """
@@ -369,38 +364,11 @@ class VTXProcessor:
           5. {"ML"}            -> rank 5
           6. {"CV"}            -> rank 6
           7. {"CH"}            -> rank 7
-        :param methods_set: A set of method strings.
+        Other combinations get rank 100. The ranks can be changed with ranking_rules.
+        :param methods: The detection methods of a point.
         :return: An integer rank.
         """
-        if (
-            methods
-            == DetectionMethod.COMPUTER_VISION
-            | DetectionMethod.MACHINE_LEARNING
-            | DetectionMethod.CANSAT_HOTSPOTS
-        ):
-            return 1
-        elif (
-            methods
-            == DetectionMethod.MACHINE_LEARNING | DetectionMethod.CANSAT_HOTSPOTS
-        ):
-            return 2
-        elif (
-            methods == DetectionMethod.COMPUTER_VISION | DetectionMethod.CANSAT_HOTSPOTS
-        ):
-            return 3
-        elif (
-            methods
-            == DetectionMethod.COMPUTER_VISION | DetectionMethod.MACHINE_LEARNING
-        ):
-            return 4
-        elif methods == DetectionMethod.MACHINE_LEARNING:
-            return 5
-        elif methods == DetectionMethod.COMPUTER_VISION:
-            return 6
-        elif methods == DetectionMethod.CANSAT_HOTSPOTS:
-            return 7
-        else:
-            return 100  # Fallback rank for unexpected combinations
+        return self.ranking.rank(methods)
 
     def score_and_sort_points(
         self,
@@ -445,13 +413,10 @@ class VTXProcessor:
         all_points = cv_points + ml_points + ch_points
         merged_points = self.merge_points(all_points)
 
-        rated_points: list[RatedDetectionPoint] = []
-        for pt in merged_points:
-            rated_points.append(RatedDetectionPoint(pt, self.assign_rank(pt.methods)))
-
-        # Sort the merged points by rating (ascending; lower is better) then by score (descending).
-        sorted_points = sorted(rated_points, key=lambda p: (p.rating, -p.score))
-        sorted_points = sorted_points[: max(0, self.max_spots - 1)]
+        # Keep the best points by rating (ascending; lower is better) then by
+        # (weighted) score (descending), without sorting all of them.
+        with _RANK_TIME.time():
+            sorted_points = self.ranking.top(merged_points, self.max_spots - 1)
 
         final_points = [fixed_point] + sorted_points
 
@@ -464,23 +429,19 @@ def main():
 
     dummy_data = CanSatData.create_dump()
 
-    vtx_processor.read_image()
-    cv_points = vtx_processor.detect_cv_points(dummy_data)
-    ml_points = vtx_processor.detect_ml_points(dummy_data)
-    ch_points = [
-        DetectionPoint(
-            latitude, longitude, score=1, methods=DetectionMethod.CANSAT_HOTSPOTS
-        )
-        for latitude, longitude in dummy_data.hotspots
-    ]
-
-    final_points = vtx_processor.score_and_sort_points(
-        cv_points, ml_points, ch_points, dummy_data
-    )
+    # Capture, detection and ranking run as a pipeline on separate threads
+    pipeline = VTXPipeline(vtx_processor, telemetry_lookup=lambda _: dummy_data)
+    pipeline.start()
+    result = pipeline.wait_for_result(timeout=10)
+    pipeline.stop()
+    if result is None:
+        print("No frame was processed")
+        return
 
     print("Final sorted interest points (with ratings):")
-    for pt in final_points:
+    for pt in result.points:
         print(
             f"Coordinates: ({pt.latitude:.6f}, {pt.longitude:.6f}), Score: {pt.score:.2f}, "
             + f"Methods: {pt.methods}, Rating: {pt.rating}"
         )
+    print("Pipeline stats:", pipeline.stats())
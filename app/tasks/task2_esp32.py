@@ -1,7 +1,21 @@
+import logging
 import threading
 import time
-import csv
-from CanSatData import CanSatData
+from tasks import metrics
+from tasks.CanSatData import CanSatData
+from tasks.csv_writer import CSVTelemetryWriter
+from tasks.serial_ingest import SerialIngest, open_serial
+from tasks.telemetry_hub import TELEMETRY
+from tasks.telemetry_store import TelemetryStore
+from tasks.wire_format import parse_packet
+
+logger = logging.getLogger(__name__)
+
+_PARSE_TIME = metrics.stage_timer("parse")
+_PACKETS = metrics.counter("voyager_packets_total", "Telemetry packets parsed.")
+_MALFORMED = metrics.counter(
+    "voyager_malformed_packets_total", "Telemetry frames that could not be parsed."
+)
 
 class ESP32Task(threading.Thread):
     """
@@ -10,83 +24,116 @@ class ESP32Task(threading.Thread):
     and keeps the most recent data for quick access.
     """
     
-    def __init__(self, csv_filename="esp32_data.csv", port=None, baudrate=115200):
+    def __init__(self, csv_filename="esp32_data.csv", port=None, baudrate=115200,
+                 telemetry_store=None, csv_writer=None, stream=None, clock=time.time,
+                 hub=None):
         super().__init__(daemon=True)
         self.csv_filename = csv_filename
-        self.port = port          # If using a real ESP32, set the COM port (e.g., "COM3")
+        self.port = port          # If using a real ESP32, set the COM port (e.g., "COM3") or a pyserial URL
         self.baudrate = baudrate  # Baud rate, e.g., 115200
         self.last_data = None     # Will store the most recent CanSatData object
+        # Shared TelemetryStore for timestamp lookups (e.g. by VTXProcessor)
+        self.telemetry_store = telemetry_store if telemetry_store is not None else TelemetryStore()
+        # Background CSV writer stage, so that slow disks never stall the reader
+        self.csv_writer = csv_writer if csv_writer is not None else CSVTelemetryWriter(csv_filename)
+        self.clock = clock        # Clock used to timestamp packets on arrival
+        self.hub = hub            # TelemetryHub that new packets are published to
 
-        # For real serial reading, you would import and use pyserial:
-        # import serial
-        # self.ser = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=1)
+        # Real telemetry comes from the serial port (or any byte stream, e.g. a socket);
+        # without one, dummy data is generated.
+        if stream is None and port is not None:
+            stream = open_serial(port, baudrate)
+        self.ingest = SerialIngest(stream, clock=clock) if stream is not None else None
 
     def run(self):
         """
         Main loop: continuously reads and processes telemetry data.
+        Frames from the serial port are processed as soon as they are complete;
+        dummy data is generated once per second.
         """
+        # A thread can only be started once (and not again after close())
+        if self.csv_writer.ident is None:
+            self.csv_writer.start()
         while True:
-            # For dummy data, generate a CanSatData object using its create_dump() method,
-            # then convert it to a telemetry string.
-            telemetry_line = self.read_telemetry_line()
-            
-            if telemetry_line:
-                data_obj = CanSatData.parse_from_string(telemetry_line)
-                if data_obj:
-                    self.last_data = data_obj
-                    self.save_to_csv(data_obj)
-                    print("New data:", data_obj.to_string())
-            time.sleep(1)  # Wait 1 second before reading again
+            if self.ingest is not None:
+                try:
+                    frames = self.ingest.read_frames()
+                except EOFError:
+                    logger.warning("Telemetry stream closed")
+                    break
+                for frame, arrival in frames:
+                    self.process_telemetry_line(frame, arrival)
+            else:
+                # For dummy data, generate a CanSatData object using its create_dump() method,
+                # then convert it to a telemetry string.
+                telemetry_line = self.read_telemetry_line()
+                if telemetry_line:
+                    self.process_telemetry_line(telemetry_line)
+                time.sleep(1)  # Wait 1 second before generating again
+
+    def process_telemetry_line(self, telemetry_line, arrival=None):
+        """
+        Parses a telemetry line and hands the packet to the consumers
+        (latest value, telemetry store, CSV writer and hub subscribers).
+
+        :param telemetry_line: A "#...#" telemetry frame or a binary packet
+                               (see wire_format); the format is auto-detected.
+        :param arrival: Ground-station time the frame arrived. If given, it replaces the
+                        packet's timestamp, so that packets can be matched with VTX frames.
+        :return: The CanSatData object, or None if parsing failed.
+        """
+        with _PARSE_TIME.time():
+            data_obj = parse_packet(telemetry_line)
+        if data_obj is None:
+            _MALFORMED.inc()
+            logger.debug("Malformed telemetry frame: %r", telemetry_line)
+        else:
+            _PACKETS.inc()
+            if arrival is not None:
+                data_obj.timestamp = arrival
+            self.last_data = data_obj
+            self.telemetry_store.add(data_obj)
+            self.save_to_csv(data_obj)
+            if self.hub is not None:
+                self.hub.publish(TELEMETRY, data_obj)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("New data: %s", data_obj.to_string())
+        return data_obj
 
     def read_telemetry_line(self):
         """
         Returns a dummy telemetry string by using the CanSatData.create_dump() method.
-        In a real application, you would read from the serial port, for example:
-            line = self.ser.readline().decode('utf-8').strip()
+        Used when no serial port or stream is given.
         """
         dummy_data = CanSatData.create_dump()
         return dummy_data.to_string()
 
     def save_to_csv(self, data_obj):
         """
-        Saves the CanSatData object to a CSV file.
+        Queues the CanSatData object for the background CSV writer.
         If the file does not exist, headers are written first.
-        Updated to include gps_time and timestamp.
+        Returns False if the row was dropped because the writer queue is full.
+        """
+        return self.csv_writer.write(data_obj)
+
+    def ingest_stats(self):
+        """
+        Returns the serial ingestion counters (bytes/s, frames/s, framing errors, ...),
+        or None when generating dummy data.
+        """
+        return self.ingest.stats() if self.ingest is not None else None
+
+    def writer_stats(self):
+        """
+        Returns the CSV writer counters (queue depth, written and dropped rows, ...).
         """
-        file_exists = False
-        try:
-            with open(self.csv_filename, "r", newline="", encoding="utf-8") as f:
-                file_exists = True
-        except FileNotFoundError:
-            pass
-
-        with open(self.csv_filename, "a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                # Write headers including gps_time and timestamp
-                writer.writerow([
-                    "altitude", "temperature", "pressure", "gps_time",
-                    "latitude", "longitude", "pitch", "roll", "yaw",
-                    "is_vtx_on", "hotspots", "timestamp"
-                ])
-            writer.writerow([
-                data_obj.altitude,
-                data_obj.temperature,
-                data_obj.pressure,
-                data_obj.gps_time,
-                data_obj.latitude,
-                data_obj.longitude,
-                data_obj.pitch,
-                data_obj.roll,
-                data_obj.yaw,
-                data_obj.is_vtx_on,
-                data_obj.hotspots,  # You may convert this to a string if needed
-                data_obj.timestamp
-            ])
+        return self.csv_writer.stats()
 
     def get_data(self):
         """
         Returns the most recent CanSatData object.
+        To be woken up on new packets instead of polling, use the hub
+        (hub.wait_for_newer() or hub.subscribe()).
         """
         return self.last_data
 
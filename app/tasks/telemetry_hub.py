@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+
+# Topics published by the ground station
+TELEMETRY = "telemetry"  # CanSatData packets from ESP32Task
+INTEREST_POINTS = "interest_points"  # ranked interest points for the map
+VTX_FRAME = "vtx_frame"  # JPEG-encoded VTX frames for the web view (see live_frame)
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """
+    An immutable published value with its hub-wide sequence number.
+    """
+
+    seq: int
+    topic: str
+    value: object
+    timestamp: float
+
+
+class DropOldestQueue[T]:
+    """
+    Thread-safe bounded queue that drops (and counts) its oldest item when full,
+    so that producers never block and consumers always get the newest items.
+    """
+
+    dropped: int
+    on_drop: Callable[[T], None] | None
+
+    def __init__(self, maxsize: int, on_drop: Callable[[T], None] | None = None):
+        """
+        :param maxsize: Number of items kept.
+        :param on_drop: Called with every dropped item (while the queue is locked).
+        """
+        self._items: deque[T] = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+        self.on_drop = on_drop
+
+    def put(self, item: T):
+        """
+        Adds an item; returns True if the oldest item was dropped to make room.
+        """
+        with self._cond:
+            dropped = len(self._items) == self._items.maxlen
+            if dropped:
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(self._items[0])
+            self._items.append(item)
+            self._cond.notify()
+            return dropped
+
+    def get(self, timeout: float | None = None) -> T | None:
+        """
+        Returns the oldest item, waiting up to timeout seconds (forever if None).
+        Returns None on timeout or when the queue is closed and empty.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def qsize(self):
+        return len(self._items)
+
+    def close(self):
+        """
+        Wakes up consumers blocked in get(); they get None once the queue is empty.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class Subscription:
+    """
+    A subscriber's bounded queue of snapshots. When the subscriber falls behind, the
+    oldest snapshots are dropped (and counted), so a slow consumer never blocks the
+    publisher and always sees the newest data.
+    """
+
+    topics: frozenset[str] | None
+
+    def __init__(self, hub: "TelemetryHub", topics: frozenset[str] | None, maxsize: int):
+        self._hub = hub
+        self.topics = topics
+        self._queue: DropOldestQueue[Snapshot] = DropOldestQueue(maxsize)
+
+    @property
+    def dropped(self):
+        return self._queue.dropped
+
+    def _push(self, snapshot: Snapshot):
+        if self.topics is None or snapshot.topic in self.topics:
+            _ = self._queue.put(snapshot)
+
+    def get(self, timeout: float | None = None):
+        """
+        Returns the next snapshot, waiting up to timeout seconds (forever if None).
+        Returns None on timeout or when the subscription is closed.
+        """
+        return self._queue.get(timeout)
+
+    def __iter__(self) -> Iterator[Snapshot]:
+        while (snapshot := self.get()) is not None:
+            yield snapshot
+
+    def close(self):
+        """
+        Unsubscribes and wakes up a consumer blocked in get().
+        """
+        self._hub._unsubscribe(self)
+        self._queue.close()
+
+
+class TelemetryHub:
+    """
+    Publish/subscribe hub for telemetry and detections.
+
+    Every published value becomes an immutable Snapshot with a hub-wide increasing
+    sequence number. Readers can take the latest snapshot of a topic without locking
+    (the snapshot is swapped in with a single reference assignment), block in
+    wait_for_newer(seq) until something newer than what they have arrives, or
+    subscribe to get every snapshot through a bounded drop-oldest queue.
+    """
+
+    def __init__(self):
+        self._latest: dict[str, Snapshot] = {}
+        self._newest: Snapshot | None = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._subscriptions: list[Subscription] = []
+
+    def publish(
+        self,
+        topic: str,
+        value: object,
+        seq: int | None = None,
+        timestamp: float | None = None,
+    ):
+        """
+        Publishes a value on a topic and wakes up everyone waiting for it.
+
+        :param seq: Sequence number to use instead of the next one, so that a hub
+                    that mirrors another (see shared_state) keeps its numbers (and
+                    the ETags derived from them). Must be greater than the last one.
+        :param timestamp: Publication time to use instead of the current time.
+        :return: The published Snapshot.
+        """
+        with self._cond:
+            if seq is None:
+                seq = self._seq + 1
+            elif seq <= self._seq:
+                raise ValueError(f"Sequence number {seq} is not after {self._seq}")
+            self._seq = seq
+            snapshot = Snapshot(
+                seq, topic, value, time.time() if timestamp is None else timestamp
+            )
+            self._latest[topic] = snapshot
+            self._newest = snapshot
+            # Pushed under the lock (a push never blocks), so that every
+            # subscription gets the snapshots in the order of their numbers
+            for subscription in self._subscriptions:
+                subscription._push(snapshot)
+            self._cond.notify_all()
+        return snapshot
+
+    def latest(self, topic: str | None = None):
+        """
+        Returns the latest snapshot of a topic (of any topic if None), or None if
+        nothing was published yet. Never blocks.
+        """
+        if topic is None:
+            return self._newest
+        return self._latest.get(topic)
+
+    def latest_value(self, topic: str, default: object = None):
+        """
+        Returns the latest value published on a topic, or default.
+        """
+        snapshot = self._latest.get(topic)
+        return snapshot.value if snapshot is not None else default
+
+    def wait_for_newer(
+        self, seq: int, topic: str | None = None, timeout: float | None = None
+    ):
+        """
+        Blocks until a snapshot newer than seq is published on the topic (on any
+        topic if None) and returns the latest one. Returns None on timeout.
+
+        :param seq: The sequence number the caller already has (0 for none).
+        """
+
+        def newer():
+            snapshot = self.latest(topic)
+            return snapshot if snapshot is not None and snapshot.seq > seq else None
+
+        with self._cond:
+            return self._cond.wait_for(newer, timeout)
+
+    def subscribe(self, topics: Iterable[str] | None = None, maxsize: int = 64):
+        """
+        Creates a subscription that receives every snapshot published from now on.
+
+        :param topics: Topics to receive, or None for all topics.
+        :param maxsize: Queue size; the oldest snapshots are dropped when it is full.
+        """
+        subscription = Subscription(
+            self, frozenset(topics) if topics is not None else None, maxsize
+        )
+        with self._cond:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._cond:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
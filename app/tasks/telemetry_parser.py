@@ -0,0 +1,263 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+import numpy as np
+from numpy.typing import NDArray
+from tasks.flight_log import HOTSPOT_DTYPE, RECORD_DTYPE, record_to_cansat_data
+from tasks.serial_ingest import FrameDecoder
+from tasks.wire_format import SYNC, decode_records, scan_packet
+
+MIN_FIELDS = 10  # altitude .. is_vtx_on
+CHUNK_SIZE = 8192  # frames converted per bulk call
+
+# Positions of the float fields in a frame (all mandatory fields except gps_time
+# and is_vtx_on), in the order of _FLOAT_COLUMNS
+_FLOAT_FIELDS = (0, 1, 2, 4, 5, 6, 7, 8)
+_FLOAT_COLUMNS = (
+    "altitude",
+    "temperature",
+    "pressure",
+    "latitude",
+    "longitude",
+    "pitch",
+    "roll",
+    "yaw",
+)
+
+
+@dataclass(slots=True)
+class TelemetryBatch:
+    """
+    Columnar result of the bulk telemetry parser.
+
+    `records` is a structured array with the flight log RECORD_DTYPE, one entry per
+    valid frame, and `hotspots` is the ragged hotspot column: an N×2 array of
+    (lat, lng) pairs indexed by each record's hotspot_offset and hotspot_count.
+    `malformed` counts the frames that were skipped because they could not be parsed.
+    """
+
+    records: NDArray[np.void] = field(
+        default_factory=lambda: np.zeros(0, dtype=RECORD_DTYPE)
+    )
+    hotspots: NDArray[np.float64] = field(
+        default_factory=lambda: np.zeros((0, 2), dtype=HOTSPOT_DTYPE)
+    )
+    malformed: int = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def hotspots_for(self, index: int) -> NDArray[np.float64]:
+        """
+        Returns the hotspots of the given record as an N×2 (lat, lng) array view.
+        """
+        record = self.records[index]
+        offset = int(record["hotspot_offset"])
+        return self.hotspots[offset : offset + int(record["hotspot_count"])]
+
+    def packet(self, index: int):
+        """
+        Returns the given record as a CanSatData object.
+        """
+        return record_to_cansat_data(self.records[index], self.hotspots_for(index))
+
+
+def _split_frames(source: bytes | str | Iterable[bytes | str]):
+    """
+    Splits the source into runs of consecutive frames of the same format:
+    (binary, frames) pairs, where the frames are the bodies (without "#") of text
+    frames or whole binary packets. Also returns the number of lines or packets
+    that are not a valid frame.
+
+    A buffer may contain any number of frames, with anything between them; it is
+    split by the incremental FrameDecoder, which resyncs after a partial or corrupted
+    frame (e.g. a capture that starts in the middle of a frame). In an iterable every
+    item must be one frame, as in CanSatData.parse_from_string().
+    """
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        decoder = FrameDecoder()
+        frames = decoder.feed(bytes(source))
+        return _runs(frames), decoder.framing_errors
+
+    frames: list[bytes] = []
+    malformed = 0
+    for line in source:
+        if isinstance(line, str):
+            line = line.encode("utf-8")
+        if line.startswith(SYNC):
+            # Binary packets are not stripped: their last bytes are the CRC
+            if scan_packet(line) == len(line):
+                frames.append(line)
+            else:
+                malformed += 1
+            continue
+        line = line.strip()
+        if len(line) >= 2 and line.startswith(b"#") and line.endswith(b"#"):
+            frames.append(line)
+        else:
+            malformed += 1
+    return _runs(frames), malformed
+
+
+def _runs(frames: list[bytes]):
+    """
+    Groups whole frames into runs of the same format; text frames lose their "#".
+    """
+    runs: list[tuple[bool, list[bytes]]] = []
+    for frame in frames:
+        binary = frame.startswith(SYNC)
+        if not runs or runs[-1][0] != binary:
+            runs.append((binary, []))
+        runs[-1][1].append(frame if binary else frame[1:-1])
+    return runs
+
+
+def _is_valid(body: bytes):
+    """
+    Checks a frame body with the same rules as CanSatData.parse_from_string().
+    """
+    parts = body.split(b",")
+    if len(parts) < MIN_FIELDS:
+        return False
+    try:
+        for i, value in enumerate(parts):
+            if i == 9:
+                _ = int(value)
+            elif i != 3:
+                _ = float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _convert(bodies: list[bytes], field_counts: list[int]):
+    """
+    Converts frame bodies with at least MIN_FIELDS fields to a TelemetryBatch.
+    Raises ValueError if a numeric field cannot be converted.
+    """
+    counts = np.array(field_counts, dtype=np.int64)
+    starts = np.cumsum(counts) - counts
+
+    # All fields of all frames in one list; the non-numeric gps_time fields are
+    # pulled out and replaced, so that everything else converts in a single pass.
+    fields = b",".join(bodies).split(b",")
+    gps_positions = (starts + 3).tolist()
+    gps_times = [fields[i].strip() for i in gps_positions]
+    for i in gps_positions:
+        fields[i] = b"0"
+    vtx_values = np.fromiter(
+        (int(fields[i]) for i in (starts + 9).tolist()),
+        dtype=np.int64,
+        count=len(bodies),
+    )
+    values = np.fromiter(map(float, fields), dtype=np.float64, count=len(fields))
+
+    records = np.zeros(len(bodies), dtype=RECORD_DTYPE)
+    for field_index, name in zip(_FLOAT_FIELDS, _FLOAT_COLUMNS):
+        records[name] = values[starts + field_index]
+    records["gps_time"] = np.array(gps_times, dtype="S8")
+    records["is_vtx_on"] = vtx_values
+
+    # If the number of remaining fields is odd, the last field is the timestamp.
+    remaining = counts - MIN_FIELDS
+    has_timestamp = remaining % 2 == 1
+    ends = starts + counts
+    records["timestamp"] = np.where(has_timestamp, values[ends - 1], 0.0)
+
+    hotspot_counts = remaining // 2
+    records["hotspot_count"] = hotspot_counts
+    records["hotspot_offset"] = np.cumsum(hotspot_counts) - hotspot_counts
+
+    # Gather the hotspot fields: 2 * hotspot_count fields from field 10 of each frame
+    n_fields = 2 * hotspot_counts
+    total = int(n_fields.sum())
+    field_offsets = np.arange(total) - np.repeat(np.cumsum(n_fields) - n_fields, n_fields)
+    hotspot_index = np.repeat(starts + MIN_FIELDS, n_fields) + field_offsets
+    hotspots = values[hotspot_index].reshape(-1, 2)
+
+    return TelemetryBatch(records=records, hotspots=hotspots)
+
+
+def parse_frames(source: bytes | str | Iterable[bytes | str]) -> TelemetryBatch:
+    """
+    Parses many telemetry frames at once into columnar arrays.
+
+    Accepts either a buffer (bytes or str) containing any number of `#...#` frames
+    and binary packets (see wire_format), e.g. a recorded serial capture, or an
+    iterable of lines with one frame each. The format of every frame is detected
+    from its first bytes.
+    The frame format and rules are the same as CanSatData.parse_from_string(), but
+    the fields of all frames are split and converted in a few bulk calls, and the
+    columns are gathered with NumPy instead of building a CanSatData per packet.
+    Binary packets are decoded column-wise with wire_format.decode_records().
+    Frames that cannot be parsed are counted in TelemetryBatch.malformed and skipped;
+    the others keep their order.
+
+    :param source: A buffer of frames or an iterable of frame lines.
+    :return: A TelemetryBatch.
+    """
+    runs, malformed = _split_frames(source)
+    batches: list[TelemetryBatch] = []
+    for binary, frames in runs:
+        if binary:
+            # Packets were already checked by their CRC
+            records, hotspots = decode_records(frames)
+            batches.append(TelemetryBatch(records=records, hotspots=hotspots))
+        else:
+            malformed += _parse_bodies(frames, batches)
+
+    batch = _concatenate(batches)
+    batch.malformed = malformed
+    return batch
+
+
+def _parse_bodies(bodies: list[bytes], batches: list[TelemetryBatch]):
+    """
+    Converts text frame bodies and appends the batches; returns the number of
+    malformed frames.
+    """
+    malformed = 0
+    # Convert in chunks, so that a corrupted frame only sends its own chunk
+    # through the slower frame-by-frame validation.
+    for chunk_start in range(0, len(bodies), CHUNK_SIZE):
+        chunk = bodies[chunk_start : chunk_start + CHUNK_SIZE]
+        valid: list[bytes] = []
+        counts: list[int] = []
+        for body in chunk:
+            count = body.count(b",") + 1
+            if count >= MIN_FIELDS:
+                valid.append(body)
+                counts.append(count)
+        malformed += len(chunk) - len(valid)
+        if not valid:
+            continue
+        try:
+            batches.append(_convert(valid, counts))
+        except ValueError:
+            checked = [body for body in valid if _is_valid(body)]
+            malformed += len(valid) - len(checked)
+            if checked:
+                counts = [body.count(b",") + 1 for body in checked]
+                batches.append(_convert(checked, counts))
+    return malformed
+
+
+def _concatenate(batches: list[TelemetryBatch]):
+    if not batches:
+        return TelemetryBatch()
+    if len(batches) == 1:
+        return batches[0]
+    records = np.concatenate([batch.records for batch in batches])
+    counts = records["hotspot_count"].astype(np.int64)
+    records["hotspot_offset"] = np.cumsum(counts) - counts
+    hotspots = np.concatenate([batch.hotspots for batch in batches])
+    return TelemetryBatch(records=records, hotspots=hotspots)
+
+
+def parse_file(filename: str) -> TelemetryBatch:
+    """
+    Parses a recorded serial capture (a file with text frames or binary packets).
+    """
+    with open(filename, "rb") as f:
+        return parse_frames(f.read())
@@ -0,0 +1,193 @@
+import bisect
+import csv
+import io
+import math
+import os
+import threading
+from dataclasses import dataclass
+from tasks.CanSatData import CanSatData
+
+
+@dataclass(slots=True)
+class _CSVPosition:
+    """
+    How far a followed CSV file has been read.
+    """
+
+    inode: int = 0
+    offset: int = 0  # bytes read
+    newest: float = -math.inf  # newest timestamp read
+    # Once the file was read again from the start, rows up to this time were
+    # already read and are skipped
+    skip_until: float = -math.inf
+
+
+class TelemetryStore:
+    """
+    In-memory, timestamp-indexed store of CanSatData packets.
+
+    Packets are kept sorted by timestamp in two parallel columns (timestamps and
+    packets), so the packet closest to a given time is found with a binary search
+    instead of rescanning the telemetry log. The store is bounded: once it holds more
+    than `capacity` packets the oldest ones are discarded, like a ring buffer.
+
+    ESP32Task writes into the store as packets arrive; when the CSV log is the only
+    source, follow_csv() incrementally reads the rows appended since the last call.
+    All methods are thread-safe.
+    """
+
+    capacity: int
+
+    def __init__(self, capacity: int = 100_000):
+        """
+        Initializes the TelemetryStore.
+
+        :param capacity: Maximum number of packets kept in memory.
+        """
+        self.capacity = capacity
+        self._timestamps: list[float] = []
+        self._packets: list[CanSatData] = []
+        self._lock = threading.Lock()
+        self._csv_positions: dict[str, _CSVPosition] = {}
+        self._csv_lock = threading.Lock()  # one follow_csv() at a time
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def add(self, data: CanSatData):
+        """
+        Adds a packet to the store, keeping the packets sorted by timestamp.
+        Packets normally arrive in order, so this is usually a plain append.
+        """
+        with self._lock:
+            self._insert(data)
+            self._trim()
+
+    def extend(self, packets: list[CanSatData]):
+        """
+        Adds several packets to the store.
+        """
+        with self._lock:
+            for data in packets:
+                self._insert(data)
+            self._trim()
+
+    def _insert(self, data: CanSatData):
+        if not self._timestamps or data.timestamp >= self._timestamps[-1]:
+            self._timestamps.append(data.timestamp)
+            self._packets.append(data)
+        else:
+            index = bisect.bisect_right(self._timestamps, data.timestamp)
+            self._timestamps.insert(index, data.timestamp)
+            self._packets.insert(index, data)
+
+    def _trim(self):
+        # Trim in chunks so that deleting from the front stays amortized O(1)
+        excess = len(self._timestamps) - self.capacity
+        if excess > self.capacity // 8:
+            del self._timestamps[:excess]
+            del self._packets[:excess]
+
+    def latest(self):
+        """
+        Returns the packet with the largest timestamp, or None if the store is empty.
+        """
+        with self._lock:
+            return self._packets[-1] if self._packets else None
+
+    def closest(self, timestamp: float, interpolate: bool = False):
+        """
+        Returns the packet whose timestamp is closest to the given timestamp.
+
+        :param timestamp: The Unix timestamp (in seconds) to look up.
+        :param interpolate: If True, returns a new CanSatData linearly interpolated between
+                            the two packets that bracket the timestamp (clamped at the ends).
+        :return: A CanSatData object, or None if the store is empty.
+        """
+        with self._lock:
+            if not self._timestamps:
+                return None
+            index = bisect.bisect_left(self._timestamps, timestamp)
+            if index == 0:
+                return self._packets[0]
+            if index == len(self._timestamps):
+                return self._packets[-1]
+            before = self._packets[index - 1]
+            after = self._packets[index]
+
+        if interpolate:
+            return interpolate_cansat_data(before, after, timestamp)
+        if timestamp - before.timestamp <= after.timestamp - timestamp:
+            return before
+        return after
+
+    def follow_csv(self, csv_filename: str):
+        """
+        Reads the rows appended to the telemetry CSV log since the last call and adds
+        them to the store. Incomplete trailing lines are left for the next call. A
+        file that got shorter (truncated) or was replaced is read again from the
+        start, skipping the rows not newer than those already read from it, so the
+        rows it still has are not added twice.
+
+        :param csv_filename: The path to the CSV file containing telemetry data.
+        :return: The number of packets added.
+        :raises FileNotFoundError: If the CSV file does not exist.
+        """
+        with self._csv_lock:
+            position = self._csv_positions.setdefault(csv_filename, _CSVPosition())
+            with open(csv_filename, "rb") as f:
+                size = f.seek(0, io.SEEK_END)
+                inode = os.fstat(f.fileno()).st_ino
+                if size < position.offset or inode != position.inode:
+                    position.inode, position.offset = inode, 0
+                    position.skip_until = position.newest
+                _ = f.seek(position.offset)
+                chunk = f.read()
+
+            end = chunk.rfind(b"\n") + 1
+            position.offset += end
+            lines = chunk[:end].decode("utf-8").splitlines()
+            packets: list[CanSatData] = []
+            for row in csv.reader(lines):
+                data = CanSatData.parse_from_csv_row(row)
+                if data is not None and data.timestamp > position.skip_until:
+                    packets.append(data)
+                    position.newest = max(position.newest, data.timestamp)
+            self.extend(packets)
+            return len(packets)
+
+
+def _lerp(a: float, b: float, fraction: float):
+    return a + (b - a) * fraction
+
+
+def _lerp_angle(a: float, b: float, fraction: float):
+    # Interpolate along the shortest arc, so that e.g. 350° -> 10° passes through 0°
+    delta = (b - a + 180.0) % 360.0 - 180.0
+    return a + delta * fraction
+
+
+def interpolate_cansat_data(before: CanSatData, after: CanSatData, timestamp: float):
+    """
+    Linearly interpolates the numeric fields of two CanSatData packets at the given
+    timestamp. Discrete fields (gps_time, is_vtx_on, hotspots) are taken from the
+    packet closest in time.
+    """
+    span = after.timestamp - before.timestamp
+    fraction = (timestamp - before.timestamp) / span if span > 0 else 0.0
+    fraction = max(0.0, min(1.0, fraction))
+    nearest = before if fraction <= 0.5 else after
+    return CanSatData(
+        altitude=_lerp(before.altitude, after.altitude, fraction),
+        temperature=_lerp(before.temperature, after.temperature, fraction),
+        pressure=_lerp(before.pressure, after.pressure, fraction),
+        gps_time=nearest.gps_time,
+        latitude=_lerp(before.latitude, after.latitude, fraction),
+        longitude=_lerp(before.longitude, after.longitude, fraction),
+        pitch=_lerp_angle(before.pitch, after.pitch, fraction),
+        roll=_lerp_angle(before.roll, after.roll, fraction),
+        yaw=_lerp_angle(before.yaw, after.yaw, fraction),
+        is_vtx_on=nearest.is_vtx_on,
+        hotspots=list(nearest.hotspots),
+        timestamp=timestamp,
+    )
@@ -0,0 +1,455 @@
+"""
+Ground-side processing of full MLX90640 thermal frames.
+
+On the CanSat, ThermalCamera::detectHotSpots reduces every 32×24 frame to its
+hottest few pixels. When the full frames are downlinked or logged, this module
+decodes them into NumPy arrays, finds the hotspots of many frames at once (local
+maxima within a temperature range, refined to sub-pixel positions) and projects
+them to GPS coordinates with the pose of the closest telemetry record:
+
+    python -m tasks.thermal thermal.log capture.bin --csv hotspots.csv
+"""
+
+import argparse
+import csv
+import json
+import struct
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+import numpy as np
+from numpy.typing import NDArray
+from tasks.detection import DetectionMethod, DetectionPoint
+from tasks.projection import records_points_to_world
+from tasks.telemetry_parser import TelemetryBatch, parse_file
+
+THERMAL_WIDTH = 32
+THERMAL_HEIGHT = 24
+THERMAL_PIXELS = THERMAL_WIDTH * THERMAL_HEIGHT
+THERMAL_RESOLUTION = (THERMAL_WIDTH, THERMAL_HEIGHT)
+THERMAL_FOV = 110  # degrees, horizontal (MLX90640BAA; 55 for the BAB variant)
+
+# Encodings of one downlinked frame, told apart by their size: the firmware's
+# float[768] frame buffer, or temperatures in hundredths of a degree
+FLOAT_FRAME_SIZE = THERMAL_PIXELS * 4
+CENTI_FRAME_SIZE = THERMAL_PIXELS * 2
+CENTI_SCALE = 100
+
+# Thermal log: a header, then (timestamp, frame) records
+THERMAL_RECORD_DTYPE = np.dtype(
+    [("timestamp", "<f8"), ("pixels", "<f4", (THERMAL_HEIGHT, THERMAL_WIDTH))]
+)
+THERMAL_MAGIC = b"VGTHERMO"
+VERSION = 1
+# magic, version, item size (as in flight_log)
+_HEADER = struct.Struct("<8sHH4x")
+HEADER_SIZE = _HEADER.size
+
+# Neighbours of a pixel. A pixel is a local maximum if it is hotter than the
+# neighbours before it in raster order and at least as hot as the ones after it,
+# so a plateau of equal pixels gives one maximum.
+_BEFORE = ((-1, -1), (-1, 0), (-1, 1), (0, -1))
+_AFTER = ((0, 1), (1, -1), (1, 0), (1, 1))
+
+
+@dataclass(slots=True)
+class ThermalConfig:
+    """
+    Settings of the thermal hotspot detection. The temperature range and the number
+    of spots have the defaults of ThermalCamera on the CanSat.
+    """
+
+    min_temp: float = 0.0  # °C, as TemperatureRange.minTemp
+    max_temp: float = 100.0  # °C, as TemperatureRange.maxTemp
+    max_spots: int = 3  # hottest spots kept per frame
+    # Keep only local maxima, so that one warm object is one spot. False keeps the
+    # hottest pixels, as the firmware does.
+    local_maxima: bool = True
+    subpixel: bool = True  # refine positions with a parabola through the neighbours
+    horizontal_fov: float = THERMAL_FOV
+
+
+@dataclass(slots=True)
+class ThermalHotspots:
+    """
+    The hotspots of a batch of frames as arrays (one row per hotspot), hottest first
+    within each frame.
+    """
+
+    frame: NDArray[np.intp]  # index of the frame in the batch
+    points: NDArray[np.float64]  # N×2: x, y in thermal pixels
+    temperatures: NDArray[np.float64]  # °C
+
+    def __len__(self):
+        return len(self.frame)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=np.intp), np.empty((0, 2)), np.empty(0))
+
+
+def decode_frame(data: bytes) -> NDArray[np.float32]:
+    """
+    Decodes one downlinked frame into a 24×32 array of °C. The encoding is told
+    from the size: the 768 float32 values of the firmware's frame buffer, or 768
+    int16 values in hundredths of a degree.
+
+    :raises ValueError: If the data has neither size.
+    """
+    if len(data) not in (FLOAT_FRAME_SIZE, CENTI_FRAME_SIZE):
+        raise ValueError(f"{len(data)} bytes is not a thermal frame")
+    return decode_frames(data, centi=len(data) == CENTI_FRAME_SIZE)[0]
+
+
+def decode_frames(data: bytes, centi: bool = False) -> NDArray[np.float32]:
+    """
+    Decodes a buffer of back-to-back frames into an N×24×32 array of °C, in one
+    call.
+
+    :param centi: The frames are int16 hundredths of a degree instead of float32.
+    :raises ValueError: If the buffer does not divide into frames.
+    """
+    frame_size = CENTI_FRAME_SIZE if centi else FLOAT_FRAME_SIZE
+    if len(data) % frame_size:
+        raise ValueError(f"{len(data)} bytes is not a whole number of thermal frames")
+    if centi:
+        frames = np.frombuffer(data, dtype="<i2").astype(np.float32) / CENTI_SCALE
+    else:
+        frames = np.frombuffer(data, dtype="<f4").astype(np.float32)
+    return frames.reshape(-1, THERMAL_HEIGHT, THERMAL_WIDTH)
+
+
+def encode_frames(frames: NDArray[np.floating], centi: bool = False) -> bytes:
+    """
+    Encodes N×24×32 frames for the downlink, as float32 or (centi=True) as int16
+    hundredths of a degree, half the size.
+    """
+    frames = np.asarray(frames).reshape(-1, THERMAL_HEIGHT, THERMAL_WIDTH)
+    if centi:
+        scaled = np.clip(np.rint(frames * CENTI_SCALE), -32768, 32767)
+        return scaled.astype("<i2").tobytes()
+    return frames.astype("<f4").tobytes()
+
+
+def write_log(
+    filename: str, timestamps: NDArray[np.float64], frames: NDArray[np.floating]
+):
+    """
+    Appends timestamped frames to a thermal log.
+    """
+    records = np.empty(len(timestamps), dtype=THERMAL_RECORD_DTYPE)
+    records["timestamp"] = timestamps
+    records["pixels"] = frames
+    with open(filename, "ab") as f:
+        if f.tell() == 0:
+            header = _HEADER.pack(THERMAL_MAGIC, VERSION, THERMAL_RECORD_DTYPE.itemsize)
+            _ = f.write(header)
+        _ = f.write(records.tobytes())
+
+
+def read_log(filename: str) -> NDArray[np.void]:
+    """
+    Memory-maps a thermal log as an array of THERMAL_RECORD_DTYPE records, so the
+    frames are read from disk only as they are used.
+
+    :raises ValueError: If the file is not a thermal log.
+    """
+    with open(filename, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise ValueError(f"Truncated thermal log header: {filename}")
+    magic, version, item_size = _HEADER.unpack(header)
+    if (
+        magic != THERMAL_MAGIC
+        or version != VERSION
+        or item_size != THERMAL_RECORD_DTYPE.itemsize
+    ):
+        raise ValueError(f"Not a version {VERSION} thermal log: {filename}")
+    return np.memmap(
+        filename, dtype=THERMAL_RECORD_DTYPE, mode="r", offset=HEADER_SIZE
+    )
+
+
+@lru_cache(maxsize=4)
+def _interpolation_matrix(size: int, factor: int) -> NDArray[np.float32]:
+    """
+    Returns the (size·factor)×size matrix of bilinear interpolation weights along
+    one axis, with pixel centres aligned as in cv2.resize.
+    """
+    out = np.arange(size * factor)
+    source = np.clip((out + 0.5) / factor - 0.5, 0, size - 1)
+    low = np.floor(source).astype(np.intp)
+    high = np.minimum(low + 1, size - 1)
+    weight = source - low
+    matrix = np.zeros((size * factor, size), dtype=np.float32)
+    np.add.at(matrix, (out, low), 1 - weight)
+    np.add.at(matrix, (out, high), weight)
+    matrix.flags.writeable = False
+    return matrix
+
+
+def upsample(frames: NDArray[np.floating], factor: int = 8) -> NDArray[np.float32]:
+    """
+    Bilinearly upsamples N×24×32 frames by an integer factor, e.g. for a heatmap
+    overlay. All frames are interpolated with two matrix products.
+
+    A point (x, y) in thermal pixels is at ((x + 0.5)·factor - 0.5,
+    (y + 0.5)·factor - 0.5) in the upsampled frame.
+    """
+    frames = np.asarray(frames, dtype=np.float32)
+    rows = _interpolation_matrix(frames.shape[-2], factor)
+    cols = _interpolation_matrix(frames.shape[-1], factor)
+    return rows @ frames @ cols.T
+
+
+def _neighbour(padded: NDArray[np.float32], dy: int, dx: int):
+    """
+    The (dy, dx) neighbour of every pixel of frames padded by one pixel.
+    """
+    height, width = padded.shape[-2] - 2, padded.shape[-1] - 2
+    return padded[:, 1 + dy : 1 + dy + height, 1 + dx : 1 + dx + width]
+
+
+def _subpixel(center, before, after):
+    """
+    Offset (-0.5..0.5) of the vertex of the parabola through three samples;
+    0 at the border or if the samples have no maximum.
+    """
+    curvature = before - 2 * center + after
+    valid = np.isfinite(before) & np.isfinite(after) & (curvature < 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        offset = np.where(valid, 0.5 * (before - after) / curvature, 0.0)
+    return np.clip(offset, -0.5, 0.5)
+
+
+class ThermalDetector:
+    """
+    Finds the hotspots of thermal frames, a whole batch of frames at a time: the
+    masks, local maxima, selection of the hottest spots and sub-pixel refinement are
+    array operations over all frames, with no per-frame Python loop.
+    """
+
+    config: ThermalConfig
+
+    def __init__(self, config: ThermalConfig | None = None):
+        self.config = config if config is not None else ThermalConfig()
+
+    def detect(self, frames: NDArray[np.floating]) -> ThermalHotspots:
+        """
+        Returns the hotspots of N×24×32 frames (or one 24×32 frame): up to max_spots
+        pixels per frame within the temperature range, hottest first.
+        """
+        config = self.config
+        frames = np.asarray(frames, dtype=np.float32)
+        if frames.ndim == 2:
+            frames = frames[None]
+        n, height, width = frames.shape
+        if n == 0 or config.max_spots <= 0:
+            return ThermalHotspots.empty()
+
+        # NaN pixels (e.g. a damaged frame) are never hotspots
+        candidates = (frames >= config.min_temp) & (frames <= config.max_temp)
+        padded = np.pad(frames, ((0, 0), (1, 1), (1, 1)), constant_values=-np.inf)
+        if config.local_maxima:
+            for dy, dx in _BEFORE:
+                candidates &= frames > _neighbour(padded, dy, dx)
+            for dy, dx in _AFTER:
+                candidates &= frames >= _neighbour(padded, dy, dx)
+
+        # The hottest candidates of every frame
+        temps = np.where(candidates, frames, -np.inf).reshape(n, -1)
+        k = min(config.max_spots, height * width)
+        if k < temps.shape[1]:
+            top = np.argpartition(-temps, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(temps.shape[1]), (n, k))
+        top_temps = np.take_along_axis(temps, top, axis=1)
+        order = np.argsort(-top_temps, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_temps = np.take_along_axis(temps, top, axis=1)
+        found = np.isfinite(top_temps)
+
+        frame_index = np.repeat(np.arange(n), k).reshape(n, k)[found]
+        pixel = top[found]
+        ys, xs = np.divmod(pixel, width)
+        points = np.stack((xs, ys), axis=1).astype(np.float64)
+        if config.subpixel and len(pixel):
+            center = frames[frame_index, ys, xs]
+            points[:, 0] += _subpixel(
+                center,
+                padded[frame_index, ys + 1, xs],
+                padded[frame_index, ys + 1, xs + 2],
+            )
+            points[:, 1] += _subpixel(
+                center,
+                padded[frame_index, ys, xs + 1],
+                padded[frame_index, ys + 2, xs + 1],
+            )
+        return ThermalHotspots(
+            frame_index.astype(np.intp), points, top_temps[found].astype(np.float64)
+        )
+
+    def project(
+        self,
+        hotspots: ThermalHotspots,
+        records: NDArray[np.void],
+        frame_records: NDArray[np.intp],
+    ) -> NDArray[np.float64]:
+        """
+        Projects hotspots to GPS coordinates in one batch.
+
+        :param records: Telemetry records (e.g. TelemetryBatch.records).
+        :param frame_records: The index in `records` of the pose of each frame
+                              (see match_records).
+        :return: An N×2 array of (lat, lng) coordinates, one per hotspot.
+        """
+        return records_points_to_world(
+            records,
+            frame_records[hotspots.frame],
+            hotspots.points,
+            THERMAL_RESOLUTION,
+            self.config.horizontal_fov,
+        )
+
+    def scores(self, hotspots: ThermalHotspots) -> NDArray[np.float64]:
+        """
+        Scores hotspots (0-1) by their temperature within the temperature range.
+        """
+        config = self.config
+        span = max(config.max_temp - config.min_temp, 1e-9)
+        return np.clip((hotspots.temperatures - config.min_temp) / span, 0.0, 1.0)
+
+    def detection_points(
+        self, hotspots: ThermalHotspots, world: NDArray[np.float64]
+    ) -> list[DetectionPoint]:
+        """
+        Converts projected hotspots to DetectionPoint objects (CANSAT_HOTSPOTS), to
+        be merged with the VTX detections.
+        """
+        return [
+            DetectionPoint(lat, lng, score, DetectionMethod.CANSAT_HOTSPOTS)
+            for (lat, lng), score in zip(
+                world.tolist(), self.scores(hotspots).tolist()
+            )
+        ]
+
+
+def match_records(
+    timestamps: NDArray[np.float64], record_timestamps: NDArray[np.float64]
+) -> NDArray[np.intp]:
+    """
+    Returns the index of the telemetry record closest in time to each frame.
+
+    :param record_timestamps: The record timestamps, sorted.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    record_timestamps = np.asarray(record_timestamps, dtype=np.float64)
+    if len(record_timestamps) == 0:
+        raise ValueError("No telemetry records to match the frames with")
+    if len(record_timestamps) == 1:
+        return np.zeros(len(timestamps), dtype=np.intp)
+    after = np.searchsorted(record_timestamps, timestamps)
+    after = np.clip(after, 1, len(record_timestamps) - 1)
+    before = after - 1
+    closer_before = (timestamps - record_timestamps[before]) <= (
+        record_timestamps[after] - timestamps
+    )
+    return np.where(closer_before, before, after).astype(np.intp)
+
+
+def process_log(
+    log: NDArray[np.void],
+    telemetry: TelemetryBatch,
+    detector: ThermalDetector | None = None,
+    chunk_size: int = 1024,
+):
+    """
+    Finds and projects the hotspots of every frame of a thermal log, `chunk_size`
+    frames per batch.
+
+    :return: The hotspots (frame indices relative to the log), their (lat, lng)
+             coordinates, and the index in telemetry.records of the record matched
+             with every frame.
+    """
+    detector = detector if detector is not None else ThermalDetector()
+    records = telemetry.records
+    order = np.argsort(records["timestamp"], kind="stable")
+    records = records[order]
+    frame_records = match_records(log["timestamp"], records["timestamp"])
+
+    parts: list[ThermalHotspots] = []
+    worlds: list[NDArray[np.float64]] = []
+    for start in range(0, len(log), chunk_size):
+        chunk = log[start : start + chunk_size]
+        hotspots = detector.detect(chunk["pixels"])
+        chunk_records = frame_records[start : start + len(chunk)]
+        worlds.append(detector.project(hotspots, records, chunk_records))
+        hotspots.frame += start
+        parts.append(hotspots)
+    if not parts:
+        return ThermalHotspots.empty(), np.empty((0, 2)), order[frame_records]
+    hotspots = ThermalHotspots(
+        np.concatenate([part.frame for part in parts]),
+        np.concatenate([part.points for part in parts]),
+        np.concatenate([part.temperatures for part in parts]),
+    )
+    return hotspots, np.concatenate(worlds), order[frame_records]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    defaults = ThermalConfig()
+    _ = parser.add_argument("log", help="thermal log (see write_log)")
+    _ = parser.add_argument("telemetry", help="telemetry serial capture")
+    _ = parser.add_argument("--min-temp", type=float, default=defaults.min_temp)
+    _ = parser.add_argument("--max-temp", type=float, default=defaults.max_temp)
+    _ = parser.add_argument("--max-spots", type=int, default=defaults.max_spots)
+    _ = parser.add_argument(
+        "--fov", type=float, default=THERMAL_FOV, help="horizontal field of view"
+    )
+    _ = parser.add_argument("--csv", help="write the hotspots to this CSV")
+    args = parser.parse_args()
+
+    log = read_log(args.log)
+    telemetry = parse_file(args.telemetry)
+    detector = ThermalDetector(
+        ThermalConfig(
+            min_temp=args.min_temp,
+            max_temp=args.max_temp,
+            max_spots=args.max_spots,
+            horizontal_fov=args.fov,
+        )
+    )
+    start = time.perf_counter()
+    hotspots, world, _ = process_log(log, telemetry, detector)
+    elapsed = time.perf_counter() - start
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ["frame", "timestamp", "x", "y", "temperature", "lat", "lng"]
+            )
+            timestamps = log["timestamp"][hotspots.frame]
+            for row in zip(
+                hotspots.frame.tolist(),
+                timestamps.tolist(),
+                hotspots.points[:, 0].tolist(),
+                hotspots.points[:, 1].tolist(),
+                hotspots.temperatures.tolist(),
+                world[:, 0].tolist(),
+                world[:, 1].tolist(),
+            ):
+                writer.writerow(row)
+
+    stats = {
+        "frames": len(log),
+        "hotspots": len(hotspots),
+        "seconds": elapsed,
+        "frames_per_s": len(log) / elapsed if elapsed > 0 else 0.0,
+    }
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
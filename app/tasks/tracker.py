@@ -0,0 +1,252 @@
+import itertools
+import math
+import threading
+from dataclasses import dataclass, field
+import numpy as np
+from tasks.detection import DetectionMethod, DetectionPoint, RatedDetectionPoint
+from tasks.merge import MERGE_THRESHOLD
+from tasks.projection import METERS_PER_DEGREE
+from tasks.ranking import UNRATED
+
+TRACK_GATE = 2 * MERGE_THRESHOLD  # metres; farther detections never match a track
+
+
+@dataclass(slots=True)
+class Track:
+    """
+    A hot spot followed across frames.
+
+    The position and score are exponentially smoothed over the matched detections.
+    The confidence grows with every matched detection (by its score) and decays on
+    every frame the track is not detected. The methods are the union of the methods
+    that detected it and the rating is the best rating it got.
+    """
+
+    id: int
+    latitude: float
+    longitude: float
+    score: float
+    confidence: float
+    methods: DetectionMethod
+    rating: int
+    first_seen: float
+    last_seen: float
+    hits: int = 1
+    misses: int = 0  # consecutive frames without a matching detection
+    confirmed: bool = False
+
+    def to_dict(self):
+        """
+        Returns the track as a JSON-serializable dictionary, like
+        RatedDetectionPoint.to_dict() plus the track ID and confidence.
+        """
+        return {
+            "id": self.id,
+            "lat": self.latitude,
+            "lng": self.longitude,
+            "score": self.score,
+            "confidence": self.confidence,
+            "methods": [method.name for method in self.methods],
+            "rating": self.rating,
+        }
+
+
+@dataclass(slots=True)
+class TrackUpdate:
+    """
+    The changes made by one HotspotTracker.update() call.
+    """
+
+    created: list[Track] = field(default_factory=list)
+    updated: list[Track] = field(default_factory=list)
+    removed: list[Track] = field(default_factory=list)
+
+
+class HotspotTracker:
+    """
+    Associates the detections of consecutive frames in world coordinates, so that a
+    hot spot keeps the same track ID, a smoothed position and an accumulated
+    confidence instead of being rebuilt from scratch on every frame.
+
+    Association is gated nearest neighbour: the distances (in metres) between all
+    tracks and detections are computed at once, and pairs are matched in order of
+    increasing distance, each track and detection at most once, up to `gate` metres.
+    Unmatched detections start tentative tracks, which are confirmed after
+    `min_hits` detections. A tentative track is dropped as soon as it is missed; a
+    confirmed one after `max_misses` consecutive misses or, if max_age is set, when
+    it has not been detected for max_age seconds.
+    """
+
+    gate: float
+    smoothing: float
+    min_hits: int
+    max_misses: int
+    max_age: float | None
+    decay: float
+
+    def __init__(
+        self,
+        gate: float = TRACK_GATE,
+        smoothing: float = 0.3,
+        min_hits: int = 2,
+        max_misses: int = 5,
+        max_age: float | None = None,
+        decay: float = 0.8,
+    ):
+        """
+        :param gate: Maximum distance in metres between a track and its detection.
+        :param smoothing: Weight of a new detection in the smoothed position and score.
+        :param min_hits: Detections needed to confirm a track.
+        :param max_misses: Consecutive missed frames after which a track is removed.
+        :param max_age: Seconds without detection after which a track is removed.
+        :param decay: Factor applied to the confidence on every missed frame.
+        """
+        self.gate = gate
+        self.smoothing = smoothing
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.max_age = max_age
+        self.decay = decay
+        self._tracks: list[Track] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _distances(self, detections: list[DetectionPoint | RatedDetectionPoint]):
+        """
+        Returns the tracks × detections matrix of distances in metres.
+        """
+        tracks = np.array(
+            [(track.latitude, track.longitude) for track in self._tracks]
+        ).reshape(-1, 2)
+        points = np.array(
+            [(point.latitude, point.longitude) for point in detections]
+        ).reshape(-1, 2)
+        lng_scale = METERS_PER_DEGREE * math.cos(math.radians(float(points[0, 0])))
+        d_lat = (tracks[:, None, 0] - points[None, :, 0]) * METERS_PER_DEGREE
+        d_lng = (tracks[:, None, 1] - points[None, :, 1]) * lng_scale
+        return np.hypot(d_lat, d_lng)
+
+    def _associate(self, detections: list[DetectionPoint | RatedDetectionPoint]):
+        """
+        Returns the (track index, detection index) pairs matched by gated nearest
+        neighbour.
+        """
+        if not self._tracks or not detections:
+            return []
+        distances = self._distances(detections)
+        candidates = np.argwhere(distances <= self.gate)
+        order = np.argsort(distances[candidates[:, 0], candidates[:, 1]], kind="stable")
+        matched_tracks: set[int] = set()
+        matched_detections: set[int] = set()
+        pairs: list[tuple[int, int]] = []
+        for track_index, detection_index in candidates[order].tolist():
+            if track_index in matched_tracks or detection_index in matched_detections:
+                continue
+            matched_tracks.add(track_index)
+            matched_detections.add(detection_index)
+            pairs.append((track_index, detection_index))
+        return pairs
+
+    def update(
+        self,
+        detections: list[DetectionPoint] | list[RatedDetectionPoint],
+        timestamp: float,
+    ):
+        """
+        Updates the tracks with the detections of a frame.
+
+        :param detections: The (merged) points of the frame. Points of the CanSat
+                           itself (THE_CANSAT) are ignored.
+        :param timestamp: The frame timestamp.
+        :return: A TrackUpdate with the created, updated and removed tracks.
+        """
+        points = [
+            point
+            for point in detections
+            if not point.methods & DetectionMethod.THE_CANSAT
+        ]
+        alpha = self.smoothing
+        changes = TrackUpdate()
+        with self._lock:
+            pairs = self._associate(points)
+            matched = {track_index for track_index, _ in pairs}
+            for track_index, detection_index in pairs:
+                track = self._tracks[track_index]
+                point = points[detection_index]
+                track.latitude += alpha * (point.latitude - track.latitude)
+                track.longitude += alpha * (point.longitude - track.longitude)
+                track.score += alpha * (point.score - track.score)
+                track.confidence += point.score * (1 - track.confidence) * alpha
+                track.methods |= point.methods
+                track.rating = min(track.rating, getattr(point, "rating", UNRATED))
+                track.last_seen = timestamp
+                track.hits += 1
+                track.misses = 0
+                if not track.confirmed and track.hits >= self.min_hits:
+                    track.confirmed = True
+                    changes.created.append(track)
+                elif track.confirmed:
+                    changes.updated.append(track)
+
+            kept: list[Track] = []
+            for track_index, track in enumerate(self._tracks):
+                if track_index not in matched:
+                    track.misses += 1
+                    track.confidence *= self.decay
+                    expired = (
+                        not track.confirmed
+                        or track.misses > self.max_misses
+                        or (
+                            self.max_age is not None
+                            and timestamp - track.last_seen > self.max_age
+                        )
+                    )
+                    if expired:
+                        if track.confirmed:
+                            changes.removed.append(track)
+                        continue
+                    changes.updated.append(track)
+                kept.append(track)
+
+            matched_detections = {detection_index for _, detection_index in pairs}
+            for detection_index, point in enumerate(points):
+                if detection_index in matched_detections:
+                    continue
+                track = Track(
+                    id=next(self._ids),
+                    latitude=point.latitude,
+                    longitude=point.longitude,
+                    score=point.score,
+                    confidence=point.score * alpha,
+                    methods=point.methods,
+                    rating=getattr(point, "rating", UNRATED),
+                    first_seen=timestamp,
+                    last_seen=timestamp,
+                )
+                if self.min_hits <= 1:
+                    track.confirmed = True
+                    changes.created.append(track)
+                kept.append(track)
+            self._tracks = kept
+        return changes
+
+    def tracks(self, include_tentative: bool = False):
+        """
+        Returns the tracks, best first: by rating (ascending), then by confidence.
+
+        :param include_tentative: Also return the tracks that are not confirmed yet.
+        """
+        with self._lock:
+            tracks = [
+                track
+                for track in self._tracks
+                if track.confirmed or include_tentative
+            ]
+        return sorted(tracks, key=lambda track: (track.rating, -track.confidence))
+
+    def reset(self):
+        """
+        Removes all tracks (track IDs keep increasing).
+        """
+        with self._lock:
+            self._tracks = []
@@ -0,0 +1,373 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+import cv2
+from tasks import metrics
+from tasks.CanSatData import CanSatData
+from tasks.detection import DetectionPoint, RatedDetectionPoint
+from tasks.ml_detector import MLDetection, MLDetectorProcess
+from tasks.telemetry_hub import INTEREST_POINTS, DropOldestQueue, TelemetryHub
+from tasks.tracker import HotspotTracker, Track
+
+if TYPE_CHECKING:
+    from tasks.live_frame import FramePublisher
+    from tasks.task1_vtx import VTXProcessor
+
+STATS_WINDOW = 5.0  # seconds over which the FPS of each stage is measured
+
+_FRAME_LATENCY = metrics.REGISTRY.histogram(
+    "voyager_frame_latency_seconds", "Time from frame capture to ranked points."
+)
+_DROPPED_BEFORE_DETECT = metrics.counter(
+    "voyager_frames_dropped_total", "Frames dropped between stages.", queue="detect"
+)
+_DROPPED_BEFORE_RANK = metrics.counter(
+    "voyager_frames_dropped_total", "Frames dropped between stages.", queue="rank"
+)
+_NO_TELEMETRY = metrics.counter(
+    "voyager_frames_no_telemetry_total", "Frames skipped for lack of telemetry."
+)
+
+
+@dataclass(slots=True)
+class Frame:
+    """
+    A captured frame travelling through the pipeline.
+    """
+
+    index: int
+    image: cv2.typing.MatLike
+    timestamp: float  # capture time (Unix time), used for the telemetry lookup
+    captured_at: float  # capture time (time.monotonic()), used for latencies
+
+
+@dataclass(slots=True)
+class Detections:
+    frame: Frame
+    cansat_data: CanSatData
+    cv_points: list[DetectionPoint]
+    ml_points: list[DetectionPoint]
+    # Detections queued on an MLDetectorProcess, projected by the rank stage
+    ml_pending: Future[list[MLDetection]] | None = None
+
+
+@dataclass(slots=True)
+class FrameResult:
+    """
+    The ranked interest points of a frame.
+    """
+
+    frame_index: int
+    timestamp: float
+    cansat_data: CanSatData
+    points: list[RatedDetectionPoint]
+    latency: float  # seconds from capture to ranked points
+    tracks: list[Track] | None = None  # confirmed tracks, if the pipeline has a tracker
+
+
+class StageStats:
+    """
+    Per-stage counters: processed frames, achieved FPS and the end-to-end latency
+    (from frame capture to the end of the stage) over the last STATS_WINDOW seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: deque[tuple[float, float]] = deque()
+        self.frames = 0
+
+    def record(self, captured_at: float):
+        now = time.monotonic()
+        with self._lock:
+            self.frames += 1
+            self._samples.append((now, now - captured_at))
+            while now - self._samples[0][0] > STATS_WINDOW:
+                _ = self._samples.popleft()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            samples = [s for s in self._samples if now - s[0] <= STATS_WINDOW]
+            latencies = [latency for _, latency in samples]
+        span = now - samples[0][0] if len(samples) > 1 else 0.0
+        return {
+            "frames": self.frames,
+            "fps": (len(samples) - 1) / span if span > 0 else 0.0,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_max": max(latencies, default=0.0),
+        }
+
+
+class VTXPipeline:
+    """
+    Runs VTX frame processing as a staged pipeline instead of one sequential loop:
+
+      capture -> telemetry lookup + CV/ML detection -> merge and rank
+
+    Each stage runs on its own thread and stages are connected by small bounded
+    queues that drop the oldest frame when the next stage falls behind, so the
+    pipeline always works on the freshest frames and capture never waits for
+    detection. CV and ML detection of a frame run in parallel on a thread pool
+    (OpenCV releases the GIL). With an MLDetectorProcess, the detection stage only
+    queues the frame on the worker and the rank stage waits for its detections, so
+    that the frames in flight are batched by the worker instead of sent one at a
+    time. Results are kept as the latest result, passed to the
+    optional callback and published to the hub. Once a frame is ranked or dropped
+    (and the ML worker is done with it), it is released to the processor's frame
+    source, so that its buffer can be captured into again.
+    """
+
+    processor: "VTXProcessor"
+    telemetry_lookup: Callable[[float], CanSatData | None]
+    on_result: Callable[[FrameResult], None] | None
+    hub: TelemetryHub | None
+    tracker: HotspotTracker | None
+    frame_publisher: "FramePublisher | None"
+    frame_interval: float
+
+    def __init__(
+        self,
+        processor: "VTXProcessor",
+        telemetry_lookup: Callable[[float], CanSatData | None] | None = None,
+        csv_filename: str = "esp32_data.csv",
+        on_result: Callable[[FrameResult], None] | None = None,
+        hub: TelemetryHub | None = None,
+        queue_size: int = 2,
+        detection_workers: int = 2,
+        frame_interval: float = 0.0,
+        tracker: HotspotTracker | None = None,
+        frame_publisher: "FramePublisher | None" = None,
+    ):
+        """
+        :param processor: The VTXProcessor that captures and processes frames.
+        :param telemetry_lookup: Returns the CanSatData for a frame timestamp. Defaults to
+                                 processor.get_closest_cansat_data on csv_filename.
+        :param csv_filename: The telemetry CSV used by the default lookup.
+        :param on_result: Called with every FrameResult (from the ranking thread).
+        :param hub: If given, the ranked points are published as INTEREST_POINTS.
+        :param queue_size: Size of the queues between stages.
+        :param detection_workers: Threads used for the CV and ML detection.
+        :param frame_interval: Minimum time between captures (0 = as fast as possible).
+        :param tracker: If given, the ranked points of every frame update the tracker,
+                        and the hub gets the CanSat's position and the confirmed tracks
+                        (with stable IDs) instead of the points of the latest frame.
+        :param frame_publisher: If given, captured frames are JPEG-encoded and
+                                published for the web view (at most its max_fps).
+        """
+        self.processor = processor
+        if telemetry_lookup is None:
+
+            def telemetry_lookup(timestamp: float):
+                return processor.get_closest_cansat_data(timestamp, csv_filename)
+
+        self.telemetry_lookup = telemetry_lookup
+        self.on_result = on_result
+        self.hub = hub
+        self.frame_interval = frame_interval
+        self.tracker = tracker
+        self.frame_publisher = frame_publisher
+
+        self._detect_queue: DropOldestQueue[Frame] = DropOldestQueue(
+            queue_size, on_drop=self._release
+        )
+        self._rank_queue: DropOldestQueue[Detections] = DropOldestQueue(
+            queue_size, on_drop=self._release_detections
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=detection_workers, thread_name_prefix="vtx-detect"
+        )
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._result_cond = threading.Condition()
+        self._last_result: FrameResult | None = None
+        self._no_telemetry = 0
+        self._next_index = 0
+        self._submit_lock = threading.Lock()
+        self._stats = {
+            "capture": StageStats(),
+            "detect": StageStats(),
+            "rank": StageStats(),
+        }
+
+    def start(self, capture: bool = True):
+        """
+        Starts the stage threads.
+
+        :param capture: If False, no capture thread is started and frames are fed
+                        with submit() instead (e.g. when replaying a recorded flight).
+        """
+        stages = [("detect", self._detect_loop), ("rank", self._rank_loop)]
+        if capture:
+            stages.insert(0, ("capture", self._capture_loop))
+        for name, target in stages:
+            thread = threading.Thread(target=target, name=f"vtx-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = 2.0):
+        """
+        Stops the stage threads and the detection pool.
+        """
+        self._stop.set()
+        self._detect_queue.close()
+        self._rank_queue.close()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, image: cv2.typing.MatLike, timestamp: float):
+        """
+        Feeds a frame captured elsewhere into the pipeline, as the capture stage does.
+
+        :return: The index of the frame.
+        """
+        with self._submit_lock:
+            index = self._next_index
+            self._next_index += 1
+        frame = Frame(index, image, timestamp, time.monotonic())
+        self._stats["capture"].record(frame.captured_at)
+        if self._detect_queue.put(frame):
+            _DROPPED_BEFORE_DETECT.inc()
+        if self.frame_publisher is not None:
+            _ = self.frame_publisher.publish(image, timestamp)
+        return index
+
+    def latest_result(self):
+        return self._last_result
+
+    def wait_for_result(self, after: int = -1, timeout: float | None = None):
+        """
+        Blocks until a result for a frame newer than `after` is available.
+        Returns None on timeout.
+        """
+
+        def newer():
+            result = self._last_result
+            return result if result is not None and result.frame_index > after else None
+
+        with self._result_cond:
+            return self._result_cond.wait_for(newer, timeout)
+
+    def stats(self):
+        """
+        Returns per-stage frames, FPS and end-to-end latency, the frames dropped
+        between stages or skipped for lack of telemetry, and the frame source's
+        counters.
+        """
+        stats: dict[str, object] = {
+            name: stage.snapshot() for name, stage in self._stats.items()
+        }
+        stats["dropped_before_detect"] = self._detect_queue.dropped
+        stats["dropped_before_rank"] = self._rank_queue.dropped
+        stats["no_telemetry"] = self._no_telemetry
+        stats["source"] = self.processor.frame_source.stats()
+        if self.frame_publisher is not None:
+            stats["web_frames"] = self.frame_publisher.stats()
+        return stats
+
+    def _release(self, frame: Frame):
+        self.processor.frame_source.release(frame.image)
+
+    def _release_detections(self, detections: Detections):
+        ml_pending = detections.ml_pending
+        if ml_pending is None:
+            self._release(detections.frame)
+        else:
+            # The worker may not have received the frame yet
+            ml_pending.add_done_callback(lambda _: self._release(detections.frame))
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            image = self.processor.read_image()
+            timestamp = self.processor.last_timestamp
+            if image is not None and timestamp is not None:
+                _ = self.submit(image, timestamp)
+            elif image is None:
+                # Capture failed; avoid spinning on a broken source
+                _ = self._stop.wait(0.01)
+            remaining = self.frame_interval - (time.monotonic() - started)
+            if remaining > 0:
+                _ = self._stop.wait(remaining)
+
+    def _detect_loop(self):
+        while not self._stop.is_set():
+            frame = self._detect_queue.get()
+            if frame is None:
+                break
+            cansat_data = self.telemetry_lookup(frame.timestamp)
+            if cansat_data is None:
+                self._no_telemetry += 1
+                _NO_TELEMETRY.inc()
+                self._release(frame)
+                continue
+            ml_detector = self.processor.ml_detector
+            if isinstance(ml_detector, MLDetectorProcess):
+                ml_pending = ml_detector.submit(frame.image)
+                cv_points = self.processor.detect_cv_points(cansat_data, frame.image)
+                detections = Detections(frame, cansat_data, cv_points, [], ml_pending)
+            else:
+                cv_future = self._executor.submit(
+                    self.processor.detect_cv_points, cansat_data, frame.image
+                )
+                ml_future = self._executor.submit(
+                    self.processor.detect_ml_points, cansat_data, frame.image
+                )
+                detections = Detections(
+                    frame, cansat_data, cv_future.result(), ml_future.result()
+                )
+            self._stats["detect"].record(frame.captured_at)
+            if self._rank_queue.put(detections):
+                _DROPPED_BEFORE_RANK.inc()
+
+    def _rank_loop(self):
+        while not self._stop.is_set():
+            detections = self._rank_queue.get()
+            if detections is None:
+                break
+            cansat_data = detections.cansat_data
+            if detections.ml_pending is not None:
+                detections.ml_points = self.processor.detect_ml_points(
+                    cansat_data, detections.frame.image, detections.ml_pending
+                )
+            points = self.processor.score_and_sort_points(
+                detections.cv_points,
+                detections.ml_points,
+                self.processor.detect_hotspot_points(cansat_data),
+                cansat_data,
+            )
+            frame = detections.frame
+            self._release(frame)
+            tracks = None
+            if self.tracker is not None:
+                _ = self.tracker.update(points, frame.timestamp)
+                tracks = self.tracker.tracks()
+            result = FrameResult(
+                frame.index,
+                frame.timestamp,
+                cansat_data,
+                points,
+                time.monotonic() - frame.captured_at,
+                tracks,
+            )
+            self._stats["rank"].record(frame.captured_at)
+            _FRAME_LATENCY.observe(result.latency)
+            with self._result_cond:
+                self._last_result = result
+                self._result_cond.notify_all()
+            if self.on_result is not None:
+                self.on_result(result)
+            if self.hub is not None:
+                if tracks is None:
+                    published = [pt.to_dict() for pt in points]
+                else:
+                    # The CanSat's position first, as in score_and_sort_points
+                    max_tracks = max(0, self.processor.max_spots - 1)
+                    published = [points[0].to_dict()] + [
+                        track.to_dict() for track in tracks[:max_tracks]
+                    ]
+                self.hub.publish(INTEREST_POINTS, published)
@@ -0,0 +1,251 @@
+import binascii
+import struct
+import numpy as np
+from numpy.typing import NDArray
+from tasks.CanSatData import CanSatData
+from tasks.flight_log import HOTSPOT_DTYPE, RECORD_DTYPE
+
+# Binary telemetry packet, version 1 (little-endian, no padding):
+#
+#   sync          2s   SYNC (non-ASCII, so a packet never looks like a "#...#" frame)
+#   version       u8   VERSION
+#   hotspot_count u8   number of (lat, lng) pairs after the fixed fields
+#   timestamp     u64  milliseconds
+#   altitude      i32  decimetres
+#   temperature   i16  0.1 °C
+#   pressure      u16  0.1 hPa
+#   gps_time      3×u8 hour, minute, second
+#   latitude      i32  1e-7 degrees
+#   longitude     i32  1e-7 degrees
+#   pitch         i16  0.1 degrees
+#   roll          i16  0.1 degrees
+#   yaw           i16  0.1 degrees
+#   is_vtx_on     u8
+#   hotspots      hotspot_count × (i32 lat, i32 lng), 1e-7 degrees
+#   crc           u16  CRC-16/CCITT-FALSE of everything after the sync bytes
+#
+# The resolutions are at least those of CanSatData::toString() on the CanSat, so a
+# packet decodes to the same values as the text frame of the same data. A packet
+# without hotspots is 40 bytes, against about 80 for the text frame.
+SYNC = b"\xa5\x5a"
+VERSION = 1
+MAX_HOTSPOTS = 255
+
+_HEADER = struct.Struct("<2sBB")
+_FIELDS = struct.Struct("<QihH3BiihhhB")
+_HOTSPOT = struct.Struct("<ii")
+_CRC = struct.Struct("<H")
+HEADER_SIZE = _HEADER.size
+FIXED_SIZE = HEADER_SIZE + _FIELDS.size
+MIN_PACKET_SIZE = FIXED_SIZE + _CRC.size
+MAX_PACKET_SIZE = MIN_PACKET_SIZE + MAX_HOTSPOTS * _HOTSPOT.size
+
+TIMESTAMP_SCALE = 1000
+VALUE_SCALE = 10  # altitude, temperature, pressure, pitch, roll, yaw
+DEGREE_SCALE = 10_000_000  # latitude, longitude, hotspots
+
+# The fixed part of a packet, for decoding many packets with NumPy
+PACKET_DTYPE = np.dtype(
+    [
+        ("sync", "S2"),
+        ("version", "u1"),
+        ("hotspot_count", "u1"),
+        ("timestamp", "<u8"),
+        ("altitude", "<i4"),
+        ("temperature", "<i2"),
+        ("pressure", "<u2"),
+        ("gps_time", "u1", (3,)),
+        ("latitude", "<i4"),
+        ("longitude", "<i4"),
+        ("pitch", "<i2"),
+        ("roll", "<i2"),
+        ("yaw", "<i2"),
+        ("is_vtx_on", "u1"),
+    ]
+)
+assert PACKET_DTYPE.itemsize == FIXED_SIZE
+
+_VALUE_COLUMNS = ("altitude", "temperature", "pressure", "pitch", "roll", "yaw")
+_DEGREE_COLUMNS = ("latitude", "longitude")
+
+
+def crc16(data: bytes | bytearray | memoryview):
+    """
+    CRC-16/CCITT-FALSE (polynomial 0x1021, initial value 0xFFFF), as computed by
+    CanSatData::toBinary() on the CanSat.
+    """
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def packet_size(hotspot_count: int):
+    return MIN_PACKET_SIZE + hotspot_count * _HOTSPOT.size
+
+
+def _parse_gps_time(gps_time: str):
+    try:
+        hour, minute, second = (int(part) for part in gps_time.strip().split(":"))
+    except ValueError:
+        raise ValueError(f"gps_time is not HH:MM:SS: {gps_time!r}") from None
+    if not (0 <= hour < 24 and 0 <= minute < 60 and 0 <= second < 61):
+        raise ValueError(f"gps_time is not HH:MM:SS: {gps_time!r}")
+    return hour, minute, second
+
+
+def encode(data: CanSatData) -> bytes:
+    """
+    Encodes a CanSatData object as a binary packet.
+
+    :raises ValueError: If a value does not fit in its field (e.g. a negative
+                        pressure, more than MAX_HOTSPOTS hotspots or a gps_time that
+                        is not "HH:MM:SS").
+    """
+    if len(data.hotspots) > MAX_HOTSPOTS:
+        raise ValueError(f"At most {MAX_HOTSPOTS} hotspots fit in a packet")
+    try:
+        body = _HEADER.pack(SYNC, VERSION, len(data.hotspots)) + _FIELDS.pack(
+            round(data.timestamp * TIMESTAMP_SCALE),
+            round(data.altitude * VALUE_SCALE),
+            round(data.temperature * VALUE_SCALE),
+            round(data.pressure * VALUE_SCALE),
+            *_parse_gps_time(data.gps_time),
+            round(data.latitude * DEGREE_SCALE),
+            round(data.longitude * DEGREE_SCALE),
+            round(data.pitch * VALUE_SCALE),
+            round(data.roll * VALUE_SCALE),
+            round(data.yaw * VALUE_SCALE),
+            data.is_vtx_on,
+        )
+        hotspots = b"".join(
+            _HOTSPOT.pack(round(lat * DEGREE_SCALE), round(lng * DEGREE_SCALE))
+            for lat, lng in data.hotspots
+        )
+    except struct.error as e:
+        raise ValueError(f"Value out of range for the binary format: {e}") from None
+    packet = body + hotspots
+    return packet + _CRC.pack(crc16(memoryview(packet)[len(SYNC) :]))
+
+
+def scan_packet(buffer: bytes | bytearray, start: int = 0) -> int:
+    """
+    Checks the packet that starts at buffer[start] (at its sync bytes).
+
+    :return: The length of the packet if it is complete and valid, 0 if more bytes
+             are needed to tell, or -1 if it is not a valid packet (unknown version
+             or CRC mismatch).
+    """
+    if len(buffer) - start < HEADER_SIZE:
+        return 0
+    sync, version, hotspot_count = _HEADER.unpack_from(buffer, start)
+    if sync != SYNC or version != VERSION:
+        return -1
+    size = packet_size(hotspot_count)
+    if len(buffer) - start < size:
+        return 0
+    end = start + size - _CRC.size
+    (crc,) = _CRC.unpack_from(buffer, end)
+    if crc != crc16(memoryview(buffer)[start + len(SYNC) : end]):
+        return -1
+    return size
+
+
+def decode(packet: bytes) -> CanSatData | None:
+    """
+    Decodes one binary packet. Returns None if it is not a complete, valid packet,
+    as CanSatData.parse_from_string() does for text frames.
+    """
+    if scan_packet(packet) != len(packet):
+        return None
+    hotspot_count = packet[3]
+    (
+        timestamp,
+        altitude,
+        temperature,
+        pressure,
+        hour,
+        minute,
+        second,
+        latitude,
+        longitude,
+        pitch,
+        roll,
+        yaw,
+        is_vtx_on,
+    ) = _FIELDS.unpack_from(packet, HEADER_SIZE)
+    hotspots = [
+        (lat / DEGREE_SCALE, lng / DEGREE_SCALE)
+        for lat, lng in _HOTSPOT.iter_unpack(
+            packet[FIXED_SIZE : FIXED_SIZE + hotspot_count * _HOTSPOT.size]
+        )
+    ]
+    return CanSatData(
+        altitude=altitude / VALUE_SCALE,
+        temperature=temperature / VALUE_SCALE,
+        pressure=pressure / VALUE_SCALE,
+        gps_time=f"{hour:02d}:{minute:02d}:{second:02d}",
+        latitude=latitude / DEGREE_SCALE,
+        longitude=longitude / DEGREE_SCALE,
+        pitch=pitch / VALUE_SCALE,
+        roll=roll / VALUE_SCALE,
+        yaw=yaw / VALUE_SCALE,
+        is_vtx_on=is_vtx_on,
+        hotspots=hotspots,
+        timestamp=timestamp / TIMESTAMP_SCALE,
+    )
+
+
+def is_binary(frame: bytes | str):
+    return isinstance(frame, (bytes, bytearray)) and frame.startswith(SYNC)
+
+
+def parse_packet(frame: bytes | str) -> CanSatData | None:
+    """
+    Parses a telemetry frame in either format: a binary packet (starting with SYNC)
+    or a "#...#" text frame. Returns None if parsing fails.
+    """
+    if is_binary(frame):
+        return decode(bytes(frame))
+    if isinstance(frame, (bytes, bytearray)):
+        frame = frame.decode("ascii", errors="replace")
+    return CanSatData.parse_from_string(frame)
+
+
+def decode_records(
+    packets: list[bytes],
+) -> tuple[NDArray[np.void], NDArray[np.float64]]:
+    """
+    Decodes many valid packets (as returned by scan_packet) at once.
+
+    The fixed parts of all packets are joined and viewed as one PACKET_DTYPE array,
+    and the hotspots as one int32 array, so the scaling is done per column instead
+    of per packet.
+
+    :return: The flight log RECORD_DTYPE records and the N×2 (lat, lng) hotspots
+             array they reference, as in TelemetryBatch.
+    """
+    fixed = np.frombuffer(
+        b"".join(packet[:FIXED_SIZE] for packet in packets), dtype=PACKET_DTYPE
+    )
+    raw_hotspots = np.frombuffer(
+        b"".join(packet[FIXED_SIZE : -_CRC.size] for packet in packets), dtype="<i4"
+    )
+
+    records = np.zeros(len(packets), dtype=RECORD_DTYPE)
+    records["timestamp"] = fixed["timestamp"] / TIMESTAMP_SCALE
+    for name in _VALUE_COLUMNS:
+        records[name] = fixed[name] / VALUE_SCALE
+    for name in _DEGREE_COLUMNS:
+        records[name] = fixed[name] / DEGREE_SCALE
+    records["is_vtx_on"] = fixed["is_vtx_on"]
+
+    # "HH:MM:SS" from the (hour, minute, second) bytes
+    digits = fixed["gps_time"].astype(np.uint8)
+    gps_time = np.full((len(packets), 8), ord(":"), dtype=np.uint8)
+    gps_time[:, 0::3] = digits // 10 + ord("0")
+    gps_time[:, 1::3] = digits % 10 + ord("0")
+    records["gps_time"] = gps_time.view("S8").ravel()
+
+    counts = fixed["hotspot_count"].astype(np.int64)
+    records["hotspot_count"] = counts
+    records["hotspot_offset"] = np.cumsum(counts) - counts
+    hotspots = (raw_hotspots / DEGREE_SCALE).astype(HOTSPOT_DTYPE).reshape(-1, 2)
+    return records, hotspots
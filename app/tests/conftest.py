@@ -0,0 +1,28 @@
+import random
+from collections.abc import Callable, Iterator
+import pytest
+from tasks.CanSatData import CanSatData
+
+type MakePackets = Callable[..., list[CanSatData]]
+
+
+@pytest.fixture
+def make_packets() -> Iterator[MakePackets]:
+    """
+    Makes random packets with the resolutions of the CanSat's text frames:
+    make_packets(count, seed=0). The global RNG is seeded for CanSatData.create_dump
+    and restored afterwards, so other tests' randomness is unaffected.
+    """
+    state = random.getstate()
+
+    def make(count: int, seed: int = 0):
+        random.seed(seed)
+        packets: list[CanSatData] = []
+        for i in range(count):
+            data = CanSatData.create_dump()
+            data.timestamp = 1_700_000_000 + i * 0.125
+            packets.append(data)
+        return packets
+
+    yield make
+    random.setstate(state)
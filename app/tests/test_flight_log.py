@@ -0,0 +1,74 @@
+import os
+import random
+from pathlib import Path
+import pytest
+from tasks.CanSatData import CanSatData
+from tasks.flight_log import HOTSPOTS_SUFFIX, FlightLog, FlightLogWriter
+from tasks.telemetry_store import TelemetryStore
+from tests.conftest import MakePackets
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_closest_matches_the_telemetry_store(
+    tmp_path: Path, shuffle: bool, make_packets: MakePackets
+):
+    packets = make_packets(200)
+    if shuffle:  # e.g. packets logged out of order
+        random.Random(1).shuffle(packets)
+    writer = FlightLogWriter(str(tmp_path / "flight.log"))
+    for data in packets:
+        writer.append(data)
+    writer.close()
+    log = FlightLog(str(tmp_path / "flight.log"))
+    store = TelemetryStore()
+    store.extend(packets)
+
+    timestamps = [data.timestamp for data in packets]
+    rng = random.Random(2)
+    queries = [
+        rng.uniform(min(timestamps) - 5, max(timestamps) + 5) for _ in range(300)
+    ]
+    for timestamp in queries + timestamps[:20]:
+        for interpolate in (False, True):
+            assert log.closest(timestamp, interpolate) == store.closest(
+                timestamp, interpolate
+            )
+
+
+def write_log(path: Path, packets: list[CanSatData]):
+    with FlightLogWriter(str(path)) as writer:
+        writer.append_many(packets)
+
+
+@pytest.mark.parametrize("section", ["records", "hotspots"])
+@pytest.mark.parametrize("cut", [1, 10, 15])  # within the last packet
+def test_reopen_after_a_torn_write(
+    tmp_path: Path, section: str, cut: int, make_packets: MakePackets
+):
+    path = tmp_path / "flight.log"
+    packets = make_packets(4)
+    write_log(path, packets[:2])
+    torn = path if section == "records" else Path(str(path) + HOTSPOTS_SUFFIX)
+    with open(torn, "r+b") as f:
+        _ = f.truncate(f.seek(0, os.SEEK_END) - cut)
+
+    write_log(path, packets[2:])
+    log = FlightLog(str(path))
+    # The torn packet is lost, the others are intact
+    assert [log[i] for i in range(len(log))] == [packets[0], *packets[2:]]
+    last = log.records[-1]
+    assert last["hotspot_offset"] + last["hotspot_count"] == len(log.hotspots)
+
+
+def test_records_without_their_hotspots_are_ignored(
+    tmp_path: Path, make_packets: MakePackets
+):
+    path = tmp_path / "flight.log"
+    packets = make_packets(3)
+    write_log(path, packets)
+    hotspots_path = Path(str(path) + HOTSPOTS_SUFFIX)
+    # As if the last packet's records reached the disk but not its hotspots
+    with open(hotspots_path, "r+b") as f:
+        _ = f.truncate(f.seek(0, os.SEEK_END) - 16 * len(packets[-1].hotspots))
+    log = FlightLog(str(path))
+    assert [log[i] for i in range(len(log))] == packets[:2]
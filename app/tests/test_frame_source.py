@@ -0,0 +1,91 @@
+import threading
+import time
+import numpy as np
+from tasks.CanSatData import CanSatData
+from tasks.frame_source import CaptureSource
+from tasks.task1_vtx import VTXProcessor
+from tasks.vtx_pipeline import VTXPipeline
+
+
+class FakeCamera:
+    """
+    A VideoCapture stand-in that fills the given buffer (or a new one) at up to
+    `fps` frames per second.
+    """
+
+    def __init__(self, shape: tuple[int, int] = (48, 64), fps: float = 500.0):
+        self.shape = (*shape, 3)
+        self.interval = 1 / fps
+        self.frames = 0
+
+    def read(self, image: np.ndarray | None = None):
+        time.sleep(self.interval)
+        if image is None or image.shape != self.shape:
+            image = np.empty(self.shape, np.uint8)
+        self.frames += 1
+        image.fill(self.frames % 256)
+        return True, image
+
+    def release(self):
+        pass
+
+
+def capture_source(ring_size: int, fps: float = 500.0):
+    camera = FakeCamera(fps=fps)
+    return CaptureSource(camera, ring_size)  # pyright: ignore[reportArgumentType]
+
+
+def test_released_frames_are_captured_into_again():
+    source = capture_source(4)
+    try:
+        for _ in range(50):
+            captured = source.read()
+            assert captured is not None
+            source.release(captured[0])
+    finally:
+        source.close()
+    # One buffer per slot, and one for the slot of the frame being held
+    assert source.stats()["allocations"] <= 5
+
+
+def test_frames_are_not_captured_over_until_released():
+    source = capture_source(2)
+    try:
+        held = []
+        for _ in range(5):
+            captured = source.read()
+            assert captured is not None
+            held.append((captured[0], captured[0].copy()))
+        time.sleep(0.05)
+        for frame, copy in held:
+            assert np.array_equal(frame, copy)
+        source.release(held[0][0])
+        source.release(held[0][0])  # a second release is ignored
+        source.release(np.empty((48, 64, 3), np.uint8))  # not from this source
+    finally:
+        source.close()
+
+
+def test_pipeline_releases_ranked_and_dropped_frames():
+    source = capture_source(4, fps=200.0)
+    processor = VTXProcessor(frame_source=source)
+    cansat_data = CanSatData(
+        altitude=300.0, latitude=37.94, longitude=23.70, timestamp=time.time()
+    )
+    ranked = threading.Event()
+    pipeline = VTXPipeline(
+        processor,
+        telemetry_lookup=lambda _: cansat_data,
+        on_result=lambda _: ranked.set(),
+    )
+    pipeline.start()
+    try:
+        assert ranked.wait(10)
+        time.sleep(0.5)
+    finally:
+        pipeline.stop()
+        source.close()
+    stats = source.stats()
+    # Without releasing, every frame read would need a new buffer
+    assert stats["read"] > 20
+    assert stats["allocations"] < stats["read"] // 2
@@ -0,0 +1,181 @@
+import os
+import signal
+import time
+import numpy as np
+import pytest
+from tasks.CanSatData import CanSatData
+from tasks.detection import DetectionMethod
+from tasks.ml_detector import (
+    MLDetection,
+    MLDetector,
+    MLDetectorProcess,
+    StubDetector,
+    WorkerExitedError,
+    create_backend,
+)
+from tasks.task1_vtx import VTXProcessor
+from tasks.vtx_pipeline import VTXPipeline
+
+
+class SlowDetector(StubDetector):
+    """
+    The stub model, taking `delay` seconds per batch.
+    """
+
+    def __init__(self, delay: float = 0.2, **options: object):
+        super().__init__(**options)  # pyright: ignore[reportArgumentType]
+        self.delay = delay
+
+    def detect_batch(self, images: list[np.ndarray]):
+        time.sleep(self.delay)
+        return super().detect_batch(images)
+
+
+SLOW_BACKEND = f"{__name__}:SlowDetector"
+
+
+def make_frames(count: int, shape: tuple[int, int] = (480, 640)):
+    rng = np.random.default_rng(0)
+    return [
+        rng.integers(0, 256, (*shape, 3), dtype=np.uint8) for _ in range(count)
+    ]
+
+
+def as_tuples(detections: list[MLDetection]):
+    return [(d.x, d.y, d.score) for d in detections]
+
+
+def test_stub_is_deterministic():
+    frames = make_frames(3)
+    first = StubDetector().detect_batch(frames)
+    second = create_backend("stub").detect_batch(list(reversed(frames)))[::-1]
+    assert [as_tuples(d) for d in first] == [as_tuples(d) for d in second]
+    assert all(len(detections) == 5 for detections in first)
+
+
+def test_stub_finds_the_brightest_cell():
+    frame = np.zeros((160, 160, 3), dtype=np.uint8)
+    frame[30:40, 110:120] = 255  # cell (row 3, column 11) of the 16×16 grid
+    best = StubDetector().detect_batch([frame])[0][0]
+    assert (best.x, best.y) == (115.0, 35.0)
+    assert best.score > 0
+
+
+def test_in_process_detector_counts_latency():
+    detector = MLDetector(StubDetector())
+    frames = make_frames(4)
+    assert [as_tuples(d) for d in detector.detect_batch(frames)] == [
+        as_tuples(d) for d in StubDetector().detect_batch(frames)
+    ]
+    stats = detector.stats()
+    assert stats["frames"] == 4
+
+
+def test_worker_process_matches_in_process():
+    frames = make_frames(8)
+    expected = [as_tuples(d) for d in StubDetector().detect_batch(frames)]
+    worker = MLDetectorProcess("stub", batch_size=4)
+    try:
+        assert as_tuples(worker.detect(frames[0], timeout=10)) == expected[0]
+        results = worker.detect_batch(frames, timeout=10)
+        stats = worker.stats()
+    finally:
+        worker.close()
+    assert [as_tuples(d) for d in results] == expected
+    assert stats["frames"] == 9
+
+
+def test_worker_batches_frames_in_flight():
+    worker = MLDetectorProcess(SLOW_BACKEND, {"delay": 0.2}, batch_size=4)
+    try:
+        # The first frame occupies the worker, the next ones queue up meanwhile
+        futures = [worker.submit(frame) for frame in make_frames(5)]
+        for future in futures:
+            _ = future.result(10)
+        stats = worker.stats()
+    finally:
+        worker.close()
+    assert stats["batch_size_avg"] > 1
+
+
+def test_downscaled_frames_map_back_to_the_frame():
+    frame = np.zeros((960, 1280, 3), dtype=np.uint8)
+    frame[60:120, 880:960] = 255  # cell (row 1, column 11) of the 16×16 grid
+    worker = MLDetectorProcess("stub", max_side=320)
+    try:
+        best = worker.detect(frame, timeout=10)[0]
+    finally:
+        worker.close()
+    assert (best.x, best.y) == pytest.approx((920.0, 90.0))
+
+
+def test_pending_frames_fail_when_the_worker_dies():
+    worker = MLDetectorProcess(SLOW_BACKEND, {"delay": 5.0})
+    try:
+        future = worker.submit(make_frames(1)[0])
+        os.kill(worker._process.pid, signal.SIGKILL)  # pyright: ignore
+        with pytest.raises(WorkerExitedError):
+            _ = future.result(10)
+        with pytest.raises(WorkerExitedError):
+            _ = worker.detect(make_frames(1)[0], timeout=10)
+    finally:
+        worker.close()
+
+
+def test_detect_times_out():
+    worker = MLDetectorProcess(SLOW_BACKEND, {"delay": 1.0})
+    try:
+        with pytest.raises(TimeoutError):
+            _ = worker.detect(make_frames(1)[0], timeout=0.1)
+    finally:
+        worker.close()
+
+
+def test_cancelled_frames_do_not_stop_the_worker():
+    worker = MLDetectorProcess(SLOW_BACKEND, {"delay": 0.2}, batch_size=1)
+    try:
+        frames = make_frames(6)
+        futures = [worker.submit(frame) for frame in frames]
+        for future in futures[::2]:
+            _ = future.cancel()
+        for future in futures[1::2]:
+            assert len(future.result(10)) == 5
+        assert len(worker.detect(frames[0], timeout=10)) == 5
+    finally:
+        worker.close()
+
+
+def cansat_data():
+    return CanSatData(
+        altitude=300.0, latitude=37.94, longitude=23.70, timestamp=1_700_000_000.0
+    )
+
+
+def test_vtx_processor_skips_ml_points_after_the_timeout():
+    worker = MLDetectorProcess(SLOW_BACKEND, {"delay": 1.0})
+    try:
+        processor = VTXProcessor(debug=True, ml_detector=worker, ml_timeout=0.1)
+        assert processor.detect_ml_points(cansat_data(), make_frames(1)[0]) == []
+        processor.ml_timeout = 10
+        assert len(processor.detect_ml_points(cansat_data(), make_frames(1)[0])) == 5
+    finally:
+        worker.close()
+
+
+def test_pipeline_with_a_worker_process():
+    worker = MLDetectorProcess("stub", batch_size=4)
+    processor = VTXProcessor(debug=True, ml_detector=worker)
+    pipeline = VTXPipeline(processor, telemetry_lookup=lambda _: cansat_data())
+    pipeline.start(capture=False)
+    try:
+        last = -1
+        for frame in make_frames(10):
+            last = pipeline.submit(frame, time.time())
+        result = pipeline.wait_for_result(last - 1, timeout=10)
+    finally:
+        pipeline.stop()
+        worker.close()
+    assert result is not None
+    assert any(
+        DetectionMethod.MACHINE_LEARNING in point.methods for point in result.points
+    )
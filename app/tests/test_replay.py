@@ -0,0 +1,23 @@
+from pathlib import Path
+import pytest
+from tasks.replay import FRAME_INDEX, load_frames
+
+
+def test_frame_index_with_a_header_and_comments(tmp_path: Path):
+    (tmp_path / FRAME_INDEX).write_text(
+        "filename,timestamp\n"
+        "# recorded at the launch site\n"
+        "b.png,1700000000.5\n"
+        "a.png,1700000000.25\n"
+    )
+    frames = load_frames(tmp_path)
+    assert [(frame.path.name, frame.timestamp) for frame in frames] == [
+        ("a.png", 1_700_000_000.25),
+        ("b.png", 1_700_000_000.5),
+    ]
+
+
+def test_frame_index_rejects_a_bad_timestamp(tmp_path: Path):
+    (tmp_path / FRAME_INDEX).write_text("a.png,1700000000.25\nb.png,soon\n")
+    with pytest.raises(ValueError):
+        _ = load_frames(tmp_path)
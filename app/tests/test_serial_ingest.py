@@ -0,0 +1,183 @@
+import itertools
+import os
+import random
+import socket
+import time
+from pathlib import Path
+import pytest
+from tasks import wire_format
+from tasks.CanSatData import CanSatData
+from tasks.serial_ingest import FrameDecoder, SerialIngest, open_serial
+from tasks.task2_esp32 import ESP32Task
+from tasks.telemetry_hub import TELEMETRY, TelemetryHub
+from tasks.telemetry_store import TelemetryStore
+from tests.conftest import MakePackets
+
+
+def mixed_stream(packets: list[CanSatData], seed: int = 0):
+    """
+    The packets as text frames and binary packets in a random mix, with log lines
+    of the base station between some of them.
+    """
+    rng = random.Random(seed)
+    chunks: list[bytes] = []
+    frames: list[bytes] = []
+    for data in packets:
+        if rng.random() < 0.2:
+            chunks.append(b"[base] rssi=-71 dBm\r\n")
+        if rng.random() < 0.5:
+            frame = wire_format.encode(data)
+        else:
+            frame = data.to_string().encode()
+        chunks.append(frame)
+        frames.append(frame)
+    return b"".join(chunks), frames
+
+
+def feed_in_chunks(decoder: FrameDecoder, stream: bytes, seed: int = 0):
+    rng = random.Random(seed)
+    frames: list[bytes] = []
+    pos = 0
+    while pos < len(stream):
+        size = rng.randint(1, 7)
+        frames += decoder.feed(stream[pos : pos + size])
+        pos += size
+    return frames
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_mixed_stream_in_small_chunks(seed: int, make_packets: MakePackets):
+    packets = make_packets(300, seed)
+    stream, expected = mixed_stream(packets, seed)
+    decoder = FrameDecoder()
+    frames = feed_in_chunks(decoder, stream, seed)
+    assert frames == expected
+    assert [wire_format.parse_packet(frame) for frame in frames] == packets
+    assert decoder.framing_errors == 0
+    assert decoder.binary_frames == sum(map(wire_format.is_binary, expected))
+
+
+def test_whole_stream_at_once_matches_chunks(make_packets: MakePackets):
+    stream, expected = mixed_stream(make_packets(300))
+    assert FrameDecoder().feed(stream) == expected
+
+
+def test_corrupted_packet_costs_only_that_packet(make_packets: MakePackets):
+    packets = [wire_format.encode(data) for data in make_packets(10)]
+    corrupted = bytearray(packets[4])
+    corrupted[10] ^= 0xFF
+    stream = b"".join(packets[:4]) + corrupted + b"".join(packets[5:])
+    decoder = FrameDecoder()
+    frames = feed_in_chunks(decoder, stream)
+    assert frames == packets[:4] + packets[5:]
+    assert decoder.framing_errors >= 1
+
+
+def test_truncated_text_frame_costs_only_that_frame(make_packets: MakePackets):
+    frames = [data.to_string().encode() for data in make_packets(5)]
+    stream = frames[0] + frames[1][:20] + b"\r\n" + b"".join(frames[2:])
+    decoder = FrameDecoder()
+    assert feed_in_chunks(decoder, stream) == [frames[0], *frames[2:]]
+    assert decoder.framing_errors == 1
+
+
+def test_crc_ending_with_the_first_sync_byte(make_packets: MakePackets):
+    # A packet whose last CRC byte is the first sync byte: that byte was consumed
+    # by the packet and must not be kept as the start of another one
+    data = make_packets(1)[0]
+    packet = wire_format.encode(data)
+    while packet[-1] != wire_format.SYNC[0]:
+        data.timestamp += 0.001
+        packet = wire_format.encode(data)
+    decoder = FrameDecoder()
+    assert decoder.feed(packet) == [packet]
+    assert decoder.skipped_bytes == 0
+    text = data.to_string().encode()
+    assert decoder.feed(wire_format.SYNC[1:] + text) == [text]
+    assert decoder.framing_errors == 0
+
+
+def read_until(ingest: SerialIngest, count: int, timeout: float = 5.0):
+    frames: list[tuple[bytes, float]] = []
+    deadline = time.monotonic() + timeout
+    while len(frames) < count and time.monotonic() < deadline:
+        frames += ingest.read_frames()
+    return frames
+
+
+def test_ingest_from_a_socket(make_packets: MakePackets):
+    packets = make_packets(50)
+    stream, expected = mixed_stream(packets)
+    reader, writer = socket.socketpair()
+    with reader, writer:
+        reader.settimeout(0.1)
+        ingest = SerialIngest(reader, clock=lambda: 123.0)
+        writer.sendall(stream)
+        frames = read_until(ingest, len(expected))
+        assert [frame for frame, _ in frames] == expected
+        assert {arrival for _, arrival in frames} == {123.0}
+        writer.close()
+        with pytest.raises(EOFError):
+            _ = read_until(ingest, 1)
+    stats = ingest.stats()
+    assert stats["bytes_received"] == len(stream)
+    assert stats["frames"] == len(expected)
+    assert stats["framing_errors"] == 0
+
+
+def test_ingest_from_a_pty(make_packets: MakePackets):
+    _ = pytest.importorskip("serial")
+    master, slave = os.openpty()
+    port = open_serial(os.ttyname(slave), timeout=0.1)
+    try:
+        ingest = SerialIngest(port)
+        packets = make_packets(50)
+        stream, expected = mixed_stream(packets)
+        # Written in pieces, as a serial link delivers them
+        for pos in range(0, len(stream), 64):
+            _ = os.write(master, stream[pos : pos + 64])
+        frames = read_until(ingest, len(expected))
+        assert [frame for frame, _ in frames] == expected
+        assert ingest.read_frames() == []  # nothing more before the timeout
+    finally:
+        port.close()
+        os.close(master)
+        os.close(slave)
+
+
+def test_esp32_task_from_a_socket(tmp_path: Path, make_packets: MakePackets):
+    hub = TelemetryHub()
+    subscription = hub.subscribe([TELEMETRY], maxsize=100)
+    store = TelemetryStore()
+    reader, writer = socket.socketpair()
+    reader.settimeout(0.1)
+    arrivals = itertools.count(1000.0)
+    task = ESP32Task(
+        str(tmp_path / "telemetry.csv"),
+        telemetry_store=store,
+        stream=reader,
+        clock=lambda: next(arrivals),
+        hub=hub,
+    )
+    task.start()
+    packets = make_packets(20)
+    stream, _ = mixed_stream(packets)
+    with writer:
+        writer.sendall(stream + b"#not,a,frame#")
+        assert hub.wait_for_newer(len(packets) - 1, TELEMETRY, timeout=5.0)
+    task.join(5.0)  # the task stops when the stream is closed
+    assert not task.is_alive()
+    reader.close()
+    task.csv_writer.close(5.0)
+    subscription.close()
+
+    received = [snapshot.value for snapshot in subscription]
+    assert len(received) == len(store) == len(packets)
+    for data, packet in zip(received, packets):
+        # Timestamped on arrival
+        assert isinstance(data, CanSatData) and data.timestamp >= 1000.0
+        packet.timestamp = data.timestamp
+        assert data == packet
+    assert task.ingest_stats()["frames"] == len(packets) + 1
+    lines = (tmp_path / "telemetry.csv").read_text().splitlines()
+    assert len(lines) == len(packets) + 1  # and the header
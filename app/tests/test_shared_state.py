@@ -0,0 +1,61 @@
+import os
+import time
+import pytest
+from tasks.CanSatData import CanSatData
+from tasks.shared_state import (
+    CAPACITIES,
+    CODECS,
+    SharedState,
+    StateExporter,
+    StateMirror,
+)
+from tasks.telemetry_hub import TELEMETRY, TelemetryHub
+
+
+def unusual_telemetry():
+    # Outside the ranges of the wire format, which would reject or round it
+    return CanSatData(
+        altitude=-12.345678,
+        temperature=-80.123456,
+        pressure=7000.25,
+        gps_time="N/A",
+        latitude=37.941234567,
+        longitude=23.701234567,
+        pitch=361.5,
+        is_vtx_on=1,
+        hotspots=[(37.9412345678, 23.7012345678)],
+        timestamp=1_700_000_000.123456,
+    )
+
+
+@pytest.mark.parametrize(
+    "data", [unusual_telemetry(), CanSatData(gps_time=""), CanSatData(pressure=-1.0)]
+)
+def test_telemetry_codec_is_lossless(data: CanSatData):
+    codec = CODECS[TELEMETRY]
+    assert codec.decode(codec.encode(data)) == data
+
+
+def test_mirror_republishes_telemetry_unchanged():
+    name = f"voyager-test-{os.getpid()}"
+    # One process: the mirror reads the blocks the exporter writes
+    state = SharedState(name, [TELEMETRY], {TELEMETRY: CAPACITIES[TELEMETRY]})
+    hub, mirror_hub = TelemetryHub(), TelemetryHub()
+    exporter = StateExporter(hub, state)
+    exporter.start()
+    try:
+        data = unusual_telemetry()
+        published = hub.publish(TELEMETRY, data)
+        deadline = time.monotonic() + 5
+        while exporter.exported + exporter.failures == 0:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert exporter.stats() == {"exported": 1, "failures": 0}
+        assert StateMirror(mirror_hub, state).poll() == 1
+        snapshot = mirror_hub.latest(TELEMETRY)
+        assert snapshot is not None
+        assert snapshot.seq == published.seq
+        assert snapshot.value == data
+    finally:
+        exporter.stop()
+        state.close(unlink=True)
@@ -0,0 +1,65 @@
+import pytest
+from tasks import wire_format
+from tasks.CanSatData import CanSatData
+from tasks.flight_log import record_to_cansat_data
+from tasks.telemetry_parser import parse_frames
+from tests.conftest import MakePackets
+
+
+def test_encode_decode_matches_parse_from_string(make_packets: MakePackets):
+    for data in make_packets(200):
+        text = CanSatData.parse_from_string(data.to_string())
+        assert wire_format.decode(wire_format.encode(data)) == text == data
+
+
+def test_parse_packet_detects_the_format(make_packets: MakePackets):
+    data = make_packets(1)[0]
+    packet = wire_format.encode(data)
+    assert wire_format.parse_packet(packet) == data
+    assert wire_format.parse_packet(data.to_string().encode()) == data
+    assert wire_format.parse_packet(data.to_string()) == data
+
+
+def test_encode_rejects_values_out_of_range(make_packets: MakePackets):
+    data = make_packets(1)[0]
+    data.pressure = -1.0
+    with pytest.raises(ValueError):
+        _ = wire_format.encode(data)
+    data = make_packets(1)[0]
+    data.gps_time = "12:34"
+    with pytest.raises(ValueError):
+        _ = wire_format.encode(data)
+
+
+def test_decode_records_matches_decode(make_packets: MakePackets):
+    packets = [wire_format.encode(data) for data in make_packets(300)]
+    packets.append(wire_format.encode(CanSatData(timestamp=1.5)))  # no hotspots
+    records, hotspots = wire_format.decode_records(packets)
+    assert len(records) == len(packets)
+    for record, packet in zip(records, packets):
+        offset = int(record["hotspot_offset"])
+        count = int(record["hotspot_count"])
+        converted = record_to_cansat_data(record, hotspots[offset : offset + count])
+        assert converted == wire_format.decode(packet)
+
+
+def test_parse_frames_matches_decode_for_packets(make_packets: MakePackets):
+    packets = make_packets(100)
+    batch = parse_frames(b"".join(wire_format.encode(data) for data in packets))
+    assert batch.malformed == 0
+    assert [batch.packet(i) for i in range(len(batch))] == packets
+
+
+@pytest.mark.parametrize("index", [0, 2, 4, 20, -3, -1])
+def test_crc_detects_a_flipped_byte(index: int, make_packets: MakePackets):
+    packet = bytearray(wire_format.encode(make_packets(1)[0]))
+    packet[index] ^= 0x10
+    assert wire_format.decode(bytes(packet)) is None
+    assert wire_format.scan_packet(packet) == -1
+
+
+def test_scan_packet_waits_for_the_whole_packet(make_packets: MakePackets):
+    packet = wire_format.encode(make_packets(1)[0])
+    for end in range(len(packet)):
+        assert wire_format.scan_packet(packet[:end]) == 0
+    assert wire_format.scan_packet(packet) == len(packet)
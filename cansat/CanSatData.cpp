@@ -40,6 +40,92 @@ String CanSatData::toString() const {
   return result;
 }
 
+// CRC-16/CCITT-FALSE (πολυώνυμο 0x1021, αρχική τιμή 0xFFFF)
+static uint16_t crc16(const uint8_t *data, size_t length) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < length; i++) {
+    crc ^= (uint16_t) data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+// Βοηθητικές συναρτήσεις για την εγγραφή ακεραίων σε little-endian
+static void putLE(uint8_t *&p, uint64_t value, int bytes) {
+  for (int i = 0; i < bytes; i++) {
+    *p++ = (uint8_t) (value >> (8 * i));
+  }
+}
+
+// Στρογγυλοποιεί value * scale· επιστρέφει false αν δεν χωράει στο [low, high]
+static bool scaled(double value, double scale, double low, double high, int64_t &out) {
+  double v = round(value * scale);
+  if (!(v >= low && v <= high)) return false;
+  out = (int64_t) v;
+  return true;
+}
+
+// toBinary: Γράφει το αντικείμενο σε δυαδικό πακέτο, στη μορφή που περιγράφεται
+// στο app/tasks/wire_format.py (sync, version, πλήθος hotspots, πεδία σε
+// ακέραιους με κλίμακα, hotspots, CRC).
+size_t CanSatData::toBinary(uint8_t *buffer, size_t size) const {
+  size_t count = hotspots.size();
+  size_t length = BINARY_MIN_SIZE + count * BINARY_HOTSPOT_SIZE;
+  if (count > 255 || size < length) return 0;
+
+  int hour, minute, second;
+  if (sscanf(gps_time.c_str(), "%d:%d:%d", &hour, &minute, &second) != 3 ||
+      hour < 0 || hour > 23 || minute < 0 || minute > 59 || second < 0 || second > 60) {
+    return 0;
+  }
+
+  int64_t ts, alt, temp, pres, lat, lng, p, r, y;
+  if (!scaled(timestamp, 1000.0, 0, 1.8e19, ts) ||
+      !scaled(altitude, 10.0, -2147483648.0, 2147483647.0, alt) ||
+      !scaled(temperature, 10.0, -32768, 32767, temp) ||
+      !scaled(pressure, 10.0, 0, 65535, pres) ||
+      !scaled(latitude, 1e7, -2147483648.0, 2147483647.0, lat) ||
+      !scaled(longitude, 1e7, -2147483648.0, 2147483647.0, lng) ||
+      !scaled(pitch, 10.0, -32768, 32767, p) ||
+      !scaled(roll, 10.0, -32768, 32767, r) ||
+      !scaled(yaw, 10.0, -32768, 32767, y)) {
+    return 0;
+  }
+
+  uint8_t *out = buffer;
+  *out++ = 0xA5;
+  *out++ = 0x5A;
+  *out++ = BINARY_VERSION;
+  *out++ = (uint8_t) count;
+  putLE(out, (uint64_t) ts, 8);
+  putLE(out, (uint64_t) alt, 4);
+  putLE(out, (uint64_t) temp, 2);
+  putLE(out, (uint64_t) pres, 2);
+  *out++ = (uint8_t) hour;
+  *out++ = (uint8_t) minute;
+  *out++ = (uint8_t) second;
+  putLE(out, (uint64_t) lat, 4);
+  putLE(out, (uint64_t) lng, 4);
+  putLE(out, (uint64_t) p, 2);
+  putLE(out, (uint64_t) r, 2);
+  putLE(out, (uint64_t) y, 2);
+  *out++ = (uint8_t) is_vtx_on;
+  for (size_t i = 0; i < count; i++) {
+    int64_t h_lat, h_lng;
+    if (!scaled(hotspots[i].first, 1e7, -2147483648.0, 2147483647.0, h_lat) ||
+        !scaled(hotspots[i].second, 1e7, -2147483648.0, 2147483647.0, h_lng)) {
+      return 0;
+    }
+    putLE(out, (uint64_t) h_lat, 4);
+    putLE(out, (uint64_t) h_lng, 4);
+  }
+  // Το CRC καλύπτει ό,τι ακολουθεί τα 2 bytes συγχρονισμού
+  putLE(out, crc16(buffer + 2, out - buffer - 2), 2);
+  return out - buffer;
+}
+
 // Βοηθητική συνάρτηση για "trim" (αφαίρεση κενού στις άκρες)
 static String trim(const String &s) {
   int start = 0;
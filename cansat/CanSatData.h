@@ -31,6 +31,15 @@ public:
   // Μετατρέπει τα δεδομένα σε string (μορφή CSV, περιτριγυρισμένο από #)
   String toString() const;
 
+  // Δυαδική μορφή πακέτου (βλ. app/tasks/wire_format.py): 40 bytes + 8 ανά hotspot
+  static const uint8_t BINARY_VERSION = 1;
+  static const size_t BINARY_MIN_SIZE = 40;
+  static const size_t BINARY_HOTSPOT_SIZE = 8;
+
+  // Γράφει τα δεδομένα σε δυαδικό πακέτο. Επιστρέφει το μήκος του πακέτου,
+  // ή 0 αν δεν χωράει στο buffer ή κάποια τιμή είναι εκτός ορίων.
+  size_t toBinary(uint8_t *buffer, size_t size) const;
+
   // Στατική μέθοδος που προσπαθεί να αναλύσει ένα string και να γεμίσει ένα αντικείμενο CanSatData.
   // Επιστρέφει true αν η ανάλυση ήταν επιτυχής.
   static bool parseFromString(const String &data_str, CanSatData &data);